@@ -7,6 +7,8 @@ import logging
 import json
 
 from core.database import db
+from core.prescreening.plan_cache import prescreening_plan_cache
+from core.prescreening.criterion_rules import compile_trial_rules, stored_rule_is_current
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -120,6 +122,8 @@ async def create_trial_criterion(trial_id: int, criterion: TrialCriterion):
             raise
         
         if result:
+            compile_trial_rules(trial_id)
+            prescreening_plan_cache.invalidate(trial_id)
             return {
                 "message": "Criterion created successfully",
                 "id": result['id'],
@@ -201,9 +205,9 @@ async def update_trial_criterion(criterion_id: int, update: CriterionUpdate):
         # Execute update
         query = f"""
             UPDATE trial_criteria
-            SET {', '.join(update_fields)}
+            SET {', '.join(update_fields)}, updated_at = NOW()
             WHERE id = %s
-            RETURNING id
+            RETURNING id, trial_id, criterion_type, criterion_text, parsed_json, updated_at
         """
         
         logger.info(f"Updating criterion {criterion_id} with fields: {update_fields}")
@@ -217,10 +221,15 @@ async def update_trial_criterion(criterion_id: int, update: CriterionUpdate):
             raise
         
         if result:
+            # Recompile when any field the stored rule was compiled from changed
+            if not stored_rule_is_current(result['criterion_type'], result['criterion_text'],
+                                          result['parsed_json']):
+                compile_trial_rules(result['trial_id'])
+            prescreening_plan_cache.invalidate(result['trial_id'])
             return {
                 "message": "Criterion updated successfully",
-                "id": result[0]['id'],
-                "updated_at": result[0]['updated_at']
+                "id": result['id'],
+                "updated_at": result['updated_at']
             }
         else:
             raise HTTPException(status_code=500, detail="Failed to update criterion")
@@ -250,6 +259,7 @@ async def delete_trial_criterion(criterion_id: int):
         db.execute_update("""
             DELETE FROM trial_criteria WHERE id = %s
         """, (criterion_id,))
+        prescreening_plan_cache.invalidate(existing[0]['trial_id'])
         
         return {
             "message": "Criterion deleted successfully",
@@ -272,7 +282,7 @@ async def quick_update_criterion(criterion_id: int, update: QuickUpdate):
     try:
         # Check if criterion exists
         existing = db.execute_query("""
-            SELECT id FROM trial_criteria WHERE id = %s
+            SELECT id, trial_id FROM trial_criteria WHERE id = %s
         """, (criterion_id,))
         
         if not existing:
@@ -285,6 +295,7 @@ async def quick_update_criterion(criterion_id: int, update: QuickUpdate):
                 updated_at = NOW()
             WHERE id = %s
         """, (update.is_required, criterion_id))
+        prescreening_plan_cache.invalidate(existing[0]['trial_id'])
         
         return {
             "message": "Criterion requirement status updated",
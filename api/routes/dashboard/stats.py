@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
 from core.database import db
+from core.async_database import async_db
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +35,7 @@ async def get_dashboard_stats():
     """Get comprehensive dashboard statistics with accurate calculations"""
     try:
         # Total conversations (all time)
-        total_conversations_result = db.execute_query("""
+        total_conversations_result = await async_db.execute_query("""
             SELECT COUNT(DISTINCT session_id) as count
             FROM chat_logs
             WHERE session_id IS NOT NULL
@@ -42,7 +43,7 @@ async def get_dashboard_stats():
         total_conversations = total_conversations_result[0]["count"] if total_conversations_result else 0
         
         # Active sessions (last 24 hours) - properly filtered
-        active_sessions_result = db.execute_query("""
+        active_sessions_result = await async_db.execute_query("""
             SELECT COUNT(DISTINCT cl.session_id) as count
             FROM chat_logs cl
             WHERE cl.timestamp IS NOT NULL 
@@ -52,7 +53,7 @@ async def get_dashboard_stats():
         active_sessions = active_sessions_result[0]["count"] if active_sessions_result else 0
         
         # All-time prescreening metrics for accurate completion rate
-        all_time_prescreenings_result = db.execute_query("""
+        all_time_prescreenings_result = await async_db.execute_query("""
             SELECT 
                 COUNT(*) as total_started,
                 COUNT(CASE WHEN status = 'completed' THEN 1 END) as total_completed
@@ -70,7 +71,7 @@ async def get_dashboard_stats():
             completion_rate = 0.0
         
         # Weekly prescreening metrics for context
-        weekly_prescreenings_result = db.execute_query("""
+        weekly_prescreenings_result = await async_db.execute_query("""
             SELECT 
                 COUNT(*) as started_weekly,
                 COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_weekly
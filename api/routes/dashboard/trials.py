@@ -5,6 +5,9 @@ from typing import Optional
 import logging
 
 from core.database import db
+from core.services.trial_catalog import trial_catalog
+from core.prescreening.plan_cache import prescreening_plan_cache
+from core.services.trial_site_summary import trial_site_summary
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -205,6 +208,9 @@ async def batch_add_investigators(batch_data: BatchInvestigatorAdd):
             except Exception as e:
                 errors.append(f"Error adding {inv_data}: {str(e)}")
         
+        if added_count:
+            trial_catalog.invalidate()
+        
         return {
             "message": f"Batch add completed: {added_count} added, {skipped_count} skipped",
             "trial_id": batch_data.trial_id,
@@ -254,6 +260,7 @@ async def create_trial_investigator(investigator: TrialInvestigator):
         """, (investigator.trial_id, investigator.investigator_name, investigator.site_location, investigator.site_id))
         
         if result:
+            trial_catalog.invalidate()
             return {
                 "message": "Investigator created successfully",
                 "id": result['id'],
@@ -289,6 +296,7 @@ async def delete_trial_investigator(investigator_id: int):
         db.execute_update("""
             DELETE FROM trial_investigators WHERE id = %s
         """, (investigator_id,))
+        trial_catalog.invalidate()
         
         return {
             "message": "Investigator deleted successfully",
@@ -305,7 +313,7 @@ async def delete_trial_investigator(investigator_id: int):
 async def get_all_trials():
     """Get all trials with basic information."""
     try:
-        trials = db.execute_query("""
+        trials = db.execute_query(f"""
             SELECT 
                 ct.id,
                 ct.trial_name as title,
@@ -317,9 +325,8 @@ async def get_all_trials():
                 CASE WHEN pm.id IS NOT NULL THEN pm.id ELSE null END as has_protocol
             FROM clinical_trials ct
             LEFT JOIN (
-                SELECT trial_id, COUNT(*) as investigator_count 
-                FROM trial_investigators 
-                GROUP BY trial_id
+                SELECT DISTINCT trial_id, total_sites as investigator_count
+                FROM {trial_site_summary.relation()} ts
             ) investigator_counts ON ct.id = investigator_counts.trial_id
             LEFT JOIN (
                 SELECT trial_id, COUNT(*) as criteria_count 
@@ -437,6 +444,7 @@ async def update_trial(trial_id: int, trial_update: TrialUpdate):
         """
         
         db.execute_update(update_query, update_values)
+        trial_catalog.invalidate()
         
         # Get updated trial
         updated_trial = db.execute_query("""
@@ -488,6 +496,7 @@ async def delete_trial(trial_id: int):
         
         # 6. Finally delete the trial itself
         db.execute_update("DELETE FROM clinical_trials WHERE id = %s", (trial_id,))
+        trial_catalog.invalidate()
         
         return {
             "message": "Trial deleted successfully",
@@ -591,6 +600,7 @@ async def update_criteria_order(trial_id: int, order_update: BulkOrderUpdate):
                 WHERE id = %s AND trial_id = %s
             """, (update.sort_order, update.criterion_id, trial_id))
             updated_count += 1
+        prescreening_plan_cache.invalidate(trial_id)
         
         logger.info(f"Updated sort order for {updated_count} criteria in trial {trial_id}")
         
@@ -621,6 +631,7 @@ async def reset_criteria_order(trial_id: int):
             SET sort_order = 0, updated_at = CURRENT_TIMESTAMP
             WHERE trial_id = %s
         """, (trial_id,))
+        prescreening_plan_cache.invalidate(trial_id)
         
         # Get count of criteria that were reset
         criteria_count = db.execute_query("""
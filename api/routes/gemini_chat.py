@@ -319,7 +319,14 @@ async def health_check():
     
     # Get Gemini service cache stats
     from core.services.gemini_service import gemini_service
+    from core.services.trial_catalog import trial_catalog
+    from core.services.analytics_writer import analytics_writer
+    from core.services.trial_site_summary import trial_site_summary
+    from core.services.data_versions import data_versions
+    from core.prescreening.plan_cache import prescreening_plan_cache
+    from core.prescreening.gemini_prescreening_manager import answer_parse_stats
     cache_stats = gemini_service.get_cache_stats()
+    pool_stats = gemini_service.get_pool_stats()
     
     return {
         "status": "healthy",
@@ -330,8 +337,17 @@ async def health_check():
             "cache_size": cache_stats["cache_size"],
             "cache_ttl_seconds": cache_stats["cache_ttl"],
             "request_timeout_seconds": cache_stats["request_timeout"],
-            "max_retries": cache_stats["max_retries"]
-        }
+            "max_retries": cache_stats["max_retries"],
+            "response_cache": cache_stats["response_cache"],
+            "embedding_cache": cache_stats["embedding_cache"]
+        },
+        "connection_pool": pool_stats,
+        "trial_catalog": trial_catalog.get_stats(),
+        "trial_site_summary": trial_site_summary.get_stats(),
+        "data_versions": data_versions.get_stats(),
+        "prescreening_plans": prescreening_plan_cache.get_stats(),
+        "answer_parsing": answer_parse_stats.get_stats(),
+        "analytics_writer": analytics_writer.get_stats()
     }
 
 
@@ -345,11 +361,11 @@ async def submit_message_feedback(request: FeedbackRequest):
     - Which intents fail most often
     - Patterns to avoid or reinforce
     """
-    from core.database import db
+    from core.async_database import async_db
 
     try:
         # Get the message details
-        message = db.execute_query("""
+        message = await async_db.execute_query("""
             SELECT id, user_message, bot_response, intent_detected, processing_time_ms
             FROM chat_logs
             WHERE id = %s AND session_id = %s
@@ -361,7 +377,7 @@ async def submit_message_feedback(request: FeedbackRequest):
         msg = message[0]
 
         # Store feedback with context (question_quality vs response_timing)
-        result = db.execute_insert_returning("""
+        result = await async_db.execute_insert_returning("""
             INSERT INTO message_feedback
             (session_id, chat_log_id, feedback_type, rating_context, intent_type,
              bot_response, user_message, response_time_ms)
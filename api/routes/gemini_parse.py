@@ -13,15 +13,12 @@ import logging
 import json
 import re
 
-from core.services.gemini_service import GeminiService
+from core.services.gemini_service import gemini_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize Gemini service
-gemini_service = GeminiService()
-
 
 class ParseRequest(BaseModel):
     """Simple parse request model"""
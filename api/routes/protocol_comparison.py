@@ -21,6 +21,7 @@ from pydantic import BaseModel
 from difflib import SequenceMatcher
 
 from core.database import db
+from core.services.analytics_writer import analytics_writer
 from core.services.gemini_service import gemini_service
 from core.services.criterion_embedding_service import criterion_embedding_service
 
@@ -536,23 +537,18 @@ async def compare_protocols(request: CompareProtocolsRequest):
                             "matching_decisions": group.get('matching_decisions', [])
                         })
 
-            db.execute_update("""
-                INSERT INTO protocol_comparison_logs
-                (comparison_id, compared_trial_ids, total_criteria_analyzed, groups_created,
-                 ai_calls_made, grouping_decisions, processing_time_ms, restrictiveness_scores)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                comparison_id,
-                request.trial_ids,
-                sum(len(p['all_criteria']) for p in protocols),
-                sum(len(cat_data.get('criteria_groups', [])) for cat_data in comparison["criteria_comparison"].values()),
-                comparison["criteria_comparison"].get('demographics', {}).get('debug_info', {}).get('ai_calls_made', 0),
-                json.dumps(grouping_decisions),
-                processing_time_ms,
-                json.dumps(comparison["restrictiveness_analysis"])
-            ))
-
-            logger.info(f"✅ Logged comparison {comparison_id} to database")
+            analytics_writer.enqueue('protocol_comparison_logs', {
+                'comparison_id': comparison_id,
+                'compared_trial_ids': request.trial_ids,
+                'total_criteria_analyzed': sum(len(p['all_criteria']) for p in protocols),
+                'groups_created': sum(len(cat_data.get('criteria_groups', [])) for cat_data in comparison["criteria_comparison"].values()),
+                'ai_calls_made': comparison["criteria_comparison"].get('demographics', {}).get('debug_info', {}).get('ai_calls_made', 0),
+                'grouping_decisions': grouping_decisions,
+                'processing_time_ms': processing_time_ms,
+                'restrictiveness_scores': comparison["restrictiveness_analysis"]
+            }, json_columns=('grouping_decisions', 'restrictiveness_scores'))
+
+            logger.info(f"✅ Queued comparison {comparison_id} log")
         except Exception as log_error:
             logger.error(f"Failed to log comparison: {log_error}")
 
@@ -1269,7 +1265,7 @@ async def get_feedback_stats():
 # =====================================================
 
 @router.post("/embeddings/generate-batch")
-async def generate_embedding_batch(batch_size: int = 50):
+async def generate_embedding_batch(batch_size: int = 500):
     """
     Generate embeddings for one batch of criteria (synchronous)
 
@@ -1295,26 +1291,12 @@ async def generate_embedding_batch(batch_size: int = 50):
                 "complete": True
             }
 
-        # Process this batch synchronously
-        processed = 0
-        errors = []
-
+        # Process this batch synchronously (batched embedding calls + chunked UPDATE)
         logger.info(f"🔄 Generating embeddings for batch of {len(criteria)} criteria...")
 
-        for criterion in criteria:
-            try:
-                success = await criterion_embedding_service.generate_and_store_embedding(
-                    criterion['id'],
-                    criterion['criterion_text']
-                )
-
-                if success:
-                    processed += 1
-                else:
-                    errors.append(f"Criterion {criterion['id']}: generation failed")
-
-            except Exception as e:
-                errors.append(f"Criterion {criterion['id']}: {str(e)}")
+        batch_result = await criterion_embedding_service.generate_and_store_embeddings(criteria)
+        processed = batch_result["generated"]
+        errors = [f"Criterion {criterion_id}: {message}" for criterion_id, message in batch_result["errors"].items()]
 
         # Get remaining count
         remaining = db.execute_query("""
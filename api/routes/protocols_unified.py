@@ -46,6 +46,8 @@ from pydantic import BaseModel
 
 from core.database import db
 from core.services.gemini_service import gemini_service
+from core.services.trial_catalog import trial_catalog
+from core.prescreening.criterion_rules import compile_trial_rules
 from core.services.production_document_processor import production_document_processor
 try:
     from core.services.intelligent_trial_matching import intelligent_trial_matcher
@@ -158,6 +160,7 @@ async def _find_or_create_trial(protocol_number: str, extracted_data: Dict[str,
             
             # Clear existing trial_criteria for this trial (will be recreated) 
             db.execute_update("DELETE FROM trial_criteria WHERE trial_id = %s", (trial_id,))
+            trial_catalog.invalidate()
             
             logger.info(f"Overwritten existing trial {trial_id} data for protocol {protocol_number}")
         
@@ -196,6 +199,7 @@ async def _find_or_create_trial(protocol_number: str, extracted_data: Dict[str,
     ))
     
     if result:
+        trial_catalog.invalidate()
         logger.info(f"Created new trial {result['id']} for protocol {protocol_number}")
         return result['id']
     
@@ -375,10 +379,14 @@ async def _store_protocol_data(trial_id: int, result: Dict[str, Any], job_id: st
             """
             db.execute_update(update_query, trial_values)
         
+        compile_trial_rules(trial_id)
+        trial_catalog.invalidate()
         logger.info(f"Stored protocol data for trial {trial_id}")
         return True
         
     except Exception as e:
+        # Some rows may already be written
+        trial_catalog.invalidate()
         logger.error(f"Error storing protocol data: {e}")
         logger.error(f"Error type: {type(e)}")
         
@@ -1062,6 +1070,8 @@ async def enrich_missing_data():
                 logger.error(f"❌ Error processing {protocol.get('protocol_number', 'unknown')}: {e}")
                 stats['errors'] += 1
         
+        if stats['fields_updated']:
+            trial_catalog.invalidate()
         logger.info(f"📊 Data enrichment completed: {stats}")
         
         return {
@@ -1116,6 +1126,7 @@ async def reprocess_protocol_summary(trial_id: int):
                 extraction_version = '2.0_enhanced'
             WHERE trial_id = %s
         """, (new_summary, trial_id))
+        trial_catalog.invalidate()
         
         logger.info(f"✅ Successfully updated summary for trial {trial_id}")
         logger.info(f"📝 New summary length: {len(new_summary)} chars")
@@ -1332,6 +1343,7 @@ async def smart_update_protocol(protocol_id: int, request: SmartUpdateRequest):
                     VALUES (%s, 'exclusion', %s, 'general', true)
                 """, (trial_id, criterion))
         
+        compile_trial_rules(trial_id)
         updates_made.append("criteria")
     
     if request.update_type in ["summary", "all"]:
@@ -1352,6 +1364,9 @@ Write a 2-3 paragraph professional summary covering purpose, population, and des
         
         updates_made.append("summary")
     
+    if updates_made:
+        trial_catalog.invalidate()
+    
     return {
         "success": True,
         "protocol_id": protocol_id,
@@ -1638,6 +1653,7 @@ async def update_protocol_metadata(protocol_id: int, data: dict):
                 WHERE id = %s
             """, trial_values)
         
+        trial_catalog.invalidate()
         return {"success": True, "message": "Metadata updated successfully"}
     except Exception as e:
         logger.error(f"Error updating metadata: {e}")
@@ -1686,6 +1702,7 @@ async def update_protocol_summary(protocol_id: int, data: dict):
             SET protocol_summary = %s, updated_at = CURRENT_TIMESTAMP
             WHERE id = %s
         """, (data.get('protocol_summary'), protocol_id))
+        trial_catalog.invalidate()
         
         return {"success": True, "message": "Summary updated successfully"}
     except Exception as e:
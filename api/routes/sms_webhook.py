@@ -254,7 +254,8 @@ async def sms_webhook(request: Request):
             message_text=Body,
             twilio_message_sid=MessageSid,
             status='received',
-            session_id=None  # Will be updated after lookup
+            session_id=None,  # Will be updated after lookup
+            buffered=False  # update_sms_session_id() updates this row below
         )
 
         # Lookup session by phone number
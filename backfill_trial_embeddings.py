@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Store clinical_trials.semantic_embedding for trials that have none.
+
+Searches embed such trials in memory without storing them, so run this after
+adding trials (or from a deploy job) to keep semantic ranking on stored vectors.
+"""
+
+import asyncio
+
+from core.async_database import async_db
+from core.services.gemini_service import gemini_service
+from core.services.trial_search import trial_search
+
+
+async def backfill(batch_size: int):
+    await gemini_service.startup()
+    try:
+        updated = await trial_search.backfill_trial_embeddings(batch_size=batch_size)
+        print(f"✅ Stored semantic embeddings for {updated} trials")
+    finally:
+        await gemini_service.shutdown()
+        await async_db.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and not sys.argv[1].isdigit():
+        print("Usage:")
+        print("  python3 backfill_trial_embeddings.py [batch_size]")
+    else:
+        asyncio.run(backfill(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
@@ -0,0 +1,178 @@
+"""Async database module with native async connection pooling
+
+Async counterpart to ``core.database.Database`` for use inside ``async def``
+routes and services, so a slow Cloud SQL round-trip no longer stalls the
+event loop for every other in-flight conversation.
+
+Migration path:
+    The coroutines take the same SQL (``%s`` placeholders) and return the same
+    shapes (list of dict rows, rowcount, single dict row) as the sync ``db``
+    singleton, so converting a call site is a mechanical change:
+
+        rows = db.execute_query(query, params)
+        rows = await async_db.execute_query(query, params)
+
+    Sync helpers that cannot be converted yet can be awaited from async code
+    through ``async_db.run_sync(func, *args)``, which runs them in a worker
+    thread instead of on the event loop.
+
+If psycopg 3 is not installed, the coroutines fall back to running the sync
+``db`` methods in a worker thread, so callers never need to special-case it.
+"""
+import os
+import asyncio
+import functools
+import logging
+from typing import Optional, Dict, List, Any, Callable
+
+try:
+    import psycopg
+    from psycopg import AsyncClientCursor
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+    HAS_PSYCOPG = True
+except ImportError:
+    HAS_PSYCOPG = False
+
+logger = logging.getLogger(__name__)
+
+if not HAS_PSYCOPG:
+    logger.warning("psycopg 3 not installed - async database calls will run sync queries in worker threads")
+
+
+class AsyncDatabase:
+    """Async database connection manager with connection pooling"""
+
+    def __init__(self):
+        self.connection_params = self._get_connection_params()
+        self.connection_pool = None
+        self._pool_lock = None
+        # Sized separately from the sync pool (max 20), which still serves most
+        # call sites: both count against the DB's max_connections = 50 on every
+        # instance, so keep this small until call sites move over
+        self.min_size = int(os.getenv('ASYNC_DB_POOL_MIN', '1'))
+        self.max_size = int(os.getenv('ASYNC_DB_POOL_MAX', '5'))
+        # Seconds a coroutine waits (without blocking the loop) for a free connection
+        self.pool_timeout = float(os.getenv('ASYNC_DB_POOL_TIMEOUT_SECONDS', '30'))
+
+    def _get_connection_params(self) -> dict:
+        """Get database connection parameters (mirrors Database._get_connection_params)"""
+        return {
+            'dbname': os.getenv('DB_NAME', 'gemini_chatbot_database'),
+            'user': os.getenv('DB_USER', 'postgres'),
+            'password': os.getenv('DB_PASS'),
+            'host': os.getenv('DB_HOST', '34.56.137.172'),  # Production DB IP
+            'port': os.getenv('DB_PORT', '5432'),
+            # Connection timeout: Fail fast if can't connect within 10 seconds
+            'connect_timeout': 10,
+            # Query timeout: Cancel queries taking longer than 30 seconds
+            'options': '-c statement_timeout=30000'
+        }
+
+    async def open(self):
+        """Open the async connection pool (called from the app startup hook)"""
+        if not HAS_PSYCOPG or self.connection_pool is not None:
+            return
+
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+
+        async with self._pool_lock:
+            if self.connection_pool is not None:
+                return
+            try:
+                pool = AsyncConnectionPool(
+                    conninfo="",
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    timeout=self.pool_timeout,
+                    kwargs={
+                        **self.connection_params,
+                        # dict rows to match RealDictCursor
+                        'row_factory': dict_row,
+                        # Client-side binding keeps psycopg2 placeholder semantics
+                        # (list -> ARRAY, ::vector casts). Tuples are NOT expanded
+                        # for "IN %s" as psycopg2 does; pass a list to "= ANY(%s)"
+                        'cursor_factory': AsyncClientCursor,
+                        'autocommit': False,
+                    },
+                    # Validate connections on checkout (handles server-side disconnects)
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                )
+                await pool.open()
+                self.connection_pool = pool
+                logger.info(f"Async database connection pool initialized (min={self.min_size}, max={self.max_size})")
+            except Exception as e:
+                logger.error(f"Failed to initialize async connection pool: {str(e)}")
+                raise
+
+    async def close(self):
+        """Close all connections in the pool (called from the app shutdown hook)"""
+        if self.connection_pool is not None:
+            await self.connection_pool.close()
+            self.connection_pool = None
+            logger.info("All async database connections closed")
+
+    async def run_sync(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking sync helper in a worker thread instead of on the event loop"""
+        return await asyncio.to_thread(functools.partial(func, *args, **kwargs))
+
+    async def _execute(self, fetch: str, query: str, params: Optional[tuple], max_retries: int, label: str):
+        """Run one statement with retry on connection errors (same semantics as Database)"""
+        if not HAS_PSYCOPG:
+            from core.database import db
+            sync_method = {
+                'all': db.execute_query,
+                'rowcount': db.execute_update,
+                'one': db.execute_insert_returning,
+            }[fetch]
+            return await self.run_sync(sync_method, query, params, max_retries)
+
+        if self.connection_pool is None:
+            await self.open()
+
+        last_error = None
+        for attempt in range(max_retries + 1):
+            try:
+                async with self.connection_pool.connection() as conn:
+                    # The pool commits on clean exit and rolls back on error
+                    async with conn.cursor() as cursor:
+                        await cursor.execute(query, params)
+                        if fetch == 'all':
+                            return await cursor.fetchall()
+                        if fetch == 'one':
+                            return await cursor.fetchone()
+                        return cursor.rowcount
+            except (psycopg.OperationalError, psycopg.InterfaceError) as e:
+                last_error = e
+                if attempt < max_retries:
+                    logger.warning(f"{label} failed (attempt {attempt + 1}/{max_retries + 1}), retrying: {str(e)}")
+                    continue
+                raise
+        raise last_error
+
+    async def execute_query(self, query: str, params: Optional[tuple] = None, max_retries: int = 2) -> List[Dict[str, Any]]:
+        """Execute a SELECT query and return results with automatic retry on connection errors"""
+        return await self._execute('all', query, params, max_retries, "Query")
+
+    async def execute_update(self, query: str, params: Optional[tuple] = None, max_retries: int = 2) -> int:
+        """Execute an INSERT/UPDATE/DELETE query with automatic retry on connection errors"""
+        return await self._execute('rowcount', query, params, max_retries, "Update")
+
+    async def execute_insert_returning(self, query: str, params: Optional[tuple] = None, max_retries: int = 2) -> Optional[Dict[str, Any]]:
+        """Execute an INSERT query with RETURNING clause with automatic retry"""
+        return await self._execute('one', query, params, max_retries, "Insert")
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get async pool statistics for health/debug endpoints"""
+        if not HAS_PSYCOPG:
+            return {"backend": "thread_fallback"}
+        if self.connection_pool is None:
+            return {"backend": "psycopg3", "open": False}
+        stats = self.connection_pool.get_stats()
+        return {"backend": "psycopg3", "open": True, **stats}
+
+
+# Create a singleton instance
+async_db = AsyncDatabase()
@@ -142,6 +142,12 @@ class AnswerParser:
         
         # First, check if the text itself might be a condition using the registry
         from core.services.condition_registry import condition_registry
+        from core.services.condition_matcher import condition_matcher, KIND_CONDITION, KIND_SYNONYM
+        
+        # A known condition or synonym mentioned anywhere ("i was diagnosed with gout last year")
+        match = condition_matcher.best_match(text, kinds=(KIND_CONDITION, KIND_SYNONYM))
+        if match:
+            return condition_registry.normalize_condition(match.canonical)
         
         if condition_registry.is_medical_condition(text):
             return condition_registry.normalize_condition(text)
@@ -187,6 +193,8 @@ class AnswerParser:
     
     def parse_location(self, text: str) -> Optional[str]:
         """Extract location from text"""
+        from core.services.location_resolver import location_resolver
+        
         text = text.strip()
         
         # Remove question words and trial-related phrases first
@@ -201,7 +209,7 @@ class AnswerParser:
             location = match.group(1).strip()
             # Remove trailing words like "please"
             location = re.sub(r"\s+(please|thanks|thank you)$", "", location, flags=re.IGNORECASE)
-            return location
+            return location_resolver.resolve(location).display
         
         # Now remove trial-related words for other patterns
         text = re.sub(r"(?:trial|trials|study|studies).*$", "", cleaned, flags=re.IGNORECASE)
@@ -223,16 +231,14 @@ class AnswerParser:
                 location = re.sub(r"\b(for|in)\b", "", location, flags=re.IGNORECASE)
                 location = location.strip()
                 
-                # Normalize capitalization - capitalize first letter of each word
-                location = location.title()
-                
                 # Validate it looks like a location (not too long, contains letters)
                 if location and len(location) < 50 and re.search(r"[a-zA-Z]", location):
-                    return location
+                    # Shared resolver normalizes casing, abbreviations and state names
+                    return location_resolver.resolve(location).display
         
         # If the cleaned text is short and looks like a location name, return it
         if text and len(text) < 30 and re.match(r"^[a-zA-Z][a-zA-Z\s]*$", text):
-            return text.title()
+            return location_resolver.resolve(text).display
         
         return None
     
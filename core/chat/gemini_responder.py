@@ -34,7 +34,7 @@ class GeminiResponder:
         full_prompt = f"{system_prompt}\n\nUser Query: {user_prompt}"
         
         try:
-            response = await self.gemini.generate_text(full_prompt, max_tokens=500)
+            response = await self.gemini.generate_text(full_prompt, max_tokens=500, cache_namespace="chat")
             return response
             
         except Exception as e:
@@ -1,6 +1,7 @@
 """Context management components"""
 
-from .manager import ContextManager, ConversationContext, ContextField
+from .manager import ContextManager, ConversationContext, ContextField, persist_diagnostics
+from .cache import SessionContextCache, session_context_cache
 from .storage import ContextStorage, StorageConfig
 from .validators import ContextValidator, ValidationError
 
@@ -8,6 +9,9 @@ __all__ = [
     'ContextManager',
     'ConversationContext',
     'ContextField',
+    'persist_diagnostics',
+    'SessionContextCache',
+    'session_context_cache',
     'ContextStorage',
     'StorageConfig',
     'ContextValidator',
@@ -0,0 +1,323 @@
+"""
+Bounded in-process cache of session contexts.
+
+Sessions are kept in LRU order and evicted when the cache exceeds its entry or
+byte budget, or when they have been idle longer than the TTL. In write-behind
+mode updated contexts are held as dirty payloads and flushed to the database in
+batches through ContextStorage.batch_save_contexts instead of one upsert per turn,
+by a background thread every flush interval (and inline once a batch is full).
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedContext:
+    """A cached session context and its bookkeeping"""
+    context: Any
+    size_bytes: int
+    last_access: float
+    dirty_payload: Optional[Dict[str, Any]] = None
+
+
+class SessionContextCache:
+    """
+    LRU + idle-TTL cache of ConversationContext objects shared by ContextManagers.
+
+    Dirty entries are never dropped silently: eviction and expiry hand their
+    payloads to flush() so they still reach the database, and payloads a flush
+    fails to save are queued again for the next one unless a newer write for
+    the session arrived meanwhile.
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 idle_ttl_seconds: int = 1800, write_behind: bool = False,
+                 flush_interval_seconds: float = 2.0, flush_batch_size: int = 50):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.write_behind = write_behind
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_batch_size = flush_batch_size
+
+        self._entries: "OrderedDict[str, CachedContext]" = OrderedDict()
+        self._pending: Dict[str, Dict[str, Any]] = {}  # dirty payloads of evicted entries
+        self._inflight: Dict[str, Dict[str, Any]] = {}  # payloads of the flush being written
+        self._total_bytes = 0
+        self._last_flush = time.time()
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._storage = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "flushes": 0,
+            "flushed_contexts": 0,
+            "coalesced_writes": 0,
+            "flush_errors": 0,
+            "requeued_contexts": 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "SessionContextCache":
+        """Build a cache configured from CONTEXT_CACHE_* environment variables"""
+        return cls(
+            max_sessions=int(os.getenv("CONTEXT_CACHE_MAX_SESSIONS", "1000")),
+            max_bytes=int(os.getenv("CONTEXT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            idle_ttl_seconds=int(os.getenv("CONTEXT_CACHE_IDLE_TTL_SECONDS", "1800")),
+            write_behind=os.getenv("CONTEXT_WRITE_BEHIND", "false").lower() == "true",
+            flush_interval_seconds=float(os.getenv("CONTEXT_WRITE_BEHIND_INTERVAL_SECONDS", "2")),
+            flush_batch_size=int(os.getenv("CONTEXT_WRITE_BEHIND_BATCH_SIZE", "50"))
+        )
+
+    def get(self, session_id: str):
+        """Return the cached context, or None if missing or idle past the TTL"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            now = time.time()
+            if now - entry.last_access > self.idle_ttl_seconds:
+                self._drop(session_id)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            entry.last_access = now
+            self._entries.move_to_end(session_id)
+            self._stats["hits"] += 1
+            return entry.context
+
+    def put(self, session_id: str, context, size_bytes: Optional[int] = None,
+            dirty_payload: Optional[Dict[str, Any]] = None):
+        """
+        Cache a context.
+
+        Args:
+            session_id: Session identifier
+            context: ConversationContext to cache
+            size_bytes: Serialized size, if known (otherwise the previous estimate is kept)
+            dirty_payload: Storage payload awaiting write-behind; None means the
+                context is already persisted
+        """
+        with self._lock:
+            previous = self._entries.pop(session_id, None)
+            if previous is not None:
+                self._total_bytes -= previous.size_bytes
+                if size_bytes is None:
+                    size_bytes = previous.size_bytes
+                if dirty_payload is not None and previous.dirty_payload is not None:
+                    self._stats["coalesced_writes"] += 1
+
+            if dirty_payload is None:
+                # Persisted synchronously, so nothing older is pending either
+                self._pending.pop(session_id, None)
+            # Newer than anything an in-progress flush is writing for the session
+            self._inflight.pop(session_id, None)
+
+            entry = CachedContext(
+                context=context,
+                size_bytes=size_bytes or 0,
+                last_access=time.time(),
+                dirty_payload=dirty_payload
+            )
+            self._entries[session_id] = entry
+            self._total_bytes += entry.size_bytes
+            self._enforce_bounds()
+
+        if dirty_payload is not None:
+            self._ensure_started()
+
+    def write_through(self, session_id: str, context, persist: Callable[[], int]):
+        """
+        Persist a context synchronously, then cache it as clean.
+
+        Runs under the flush lock, so a flush already writing an older payload
+        for the session commits first and cannot overwrite this write.
+
+        Args:
+            session_id: Session identifier
+            context: ConversationContext being saved
+            persist: Writes the context and returns its serialized size
+        """
+        with self._flush_lock:
+            size_bytes = persist()
+            self.put(session_id, context, size_bytes=size_bytes)
+
+    def discard(self, session_id: str):
+        """Forget a session, including any unflushed changes"""
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is not None:
+                self._total_bytes -= entry.size_bytes
+            self._pending.pop(session_id, None)
+            self._inflight.pop(session_id, None)
+
+    def has_pending(self, session_id: str) -> bool:
+        """Whether an evicted or expired session still has unflushed changes"""
+        with self._lock:
+            return session_id in self._pending
+
+    def flush_due(self) -> bool:
+        """Whether enough dirty contexts or time have accumulated to flush"""
+        with self._lock:
+            dirty = len(self._pending) + sum(
+                1 for entry in self._entries.values() if entry.dirty_payload is not None
+            )
+            if not dirty:
+                return False
+            return (dirty >= self.flush_batch_size or
+                    time.time() - self._last_flush >= self.flush_interval_seconds)
+
+    def flush(self) -> int:
+        """
+        Write all dirty contexts to the database in one batch. Payloads that
+        fail to save are put back for the next flush.
+
+        Returns:
+            Number of contexts saved
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = dict(self._pending)
+                self._pending.clear()
+                for session_id, entry in self._entries.items():
+                    if entry.dirty_payload is not None:
+                        batch[session_id] = entry.dirty_payload
+                        entry.dirty_payload = None
+                self._inflight = dict(batch)
+                self._last_flush = time.time()
+
+            if not batch:
+                return 0
+
+            failed = []
+            try:
+                if self._storage is None:
+                    from core.conversation.context.storage import ContextStorage
+                    self._storage = ContextStorage()
+                saved = self._storage.batch_save_contexts(list(batch.items()), failed=failed)
+            except Exception as e:
+                logger.error(f"Context write-behind flush failed: {str(e)}")
+                saved = 0
+                failed = list(batch)
+
+            with self._lock:
+                requeued = self._requeue(failed)
+                self._inflight = {}
+                self._stats["flushes"] += 1
+                self._stats["flushed_contexts"] += saved
+                self._stats["flush_errors"] += len(set(failed))
+                self._stats["requeued_contexts"] += requeued
+            if failed:
+                logger.error(f"Context write-behind flush saved {saved}/{len(batch)} sessions, "
+                             f"{requeued} queued for retry")
+            return saved
+
+    def close(self, timeout: float = 5.0) -> int:
+        """Stop the background flusher and write out remaining dirty contexts (app shutdown)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache size, memory and write-behind counters"""
+        with self._lock:
+            dirty = len(self._pending) + sum(
+                1 for entry in self._entries.values() if entry.dirty_payload is not None
+            )
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "sessions": len(self._entries),
+                "max_sessions": self.max_sessions,
+                "approx_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "write_behind": self.write_behind,
+                "dirty_sessions": dirty,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                **self._stats
+            }
+
+    def _requeue(self, session_ids) -> int:
+        """Put back failed payloads that no newer write or discard has superseded"""
+        requeued = 0
+        for session_id in set(session_ids):
+            payload = self._inflight.get(session_id)
+            if payload is None:
+                continue
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                if entry.dirty_payload is None:
+                    entry.dirty_payload = payload
+                    requeued += 1
+            elif session_id not in self._pending:
+                self._pending[session_id] = payload
+                requeued += 1
+        return requeued
+
+    def _ensure_started(self):
+        if self._thread is not None or self._stop.is_set():
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="context-write-behind", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval_seconds):
+            try:
+                if self.flush_due():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Context write-behind background flush failed: {str(e)}")
+
+    def _drop(self, session_id: str):
+        """Remove an entry, keeping its unflushed payload for the next flush"""
+        entry = self._entries.pop(session_id)
+        self._total_bytes -= entry.size_bytes
+        if entry.dirty_payload is not None:
+            self._pending[session_id] = entry.dirty_payload
+
+    def _enforce_bounds(self):
+        """Expire idle entries, then evict least recently used past the budgets"""
+        now = time.time()
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if now - entry.last_access <= self.idle_ttl_seconds:
+                break
+            self._drop(session_id)
+            self._stats["expirations"] += 1
+
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_sessions or self._total_bytes > self.max_bytes
+        ):
+            session_id = next(iter(self._entries))
+            self._drop(session_id)
+            self._stats["evictions"] += 1
+
+
+def payload_size(payload: Dict[str, Any]) -> int:
+    """Approximate footprint of a context from its serialized storage payload"""
+    return len(json.dumps(payload, default=str))
+
+
+# Shared by every ContextManager in the process
+session_context_cache = SessionContextCache.from_env()
@@ -6,19 +6,90 @@ validation, enrichment, and persistence. It manages both session context
 and conversation memory.
 """
 
+import os
 import json
+import random
 import logging
 import re
+import threading
 from typing import Dict, Any, List, Optional, Set
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass, field
 from enum import Enum
 
 from core.database import db
+from core.conversation.context.cache import SessionContextCache, session_context_cache, payload_size
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 logger = logging.getLogger(__name__)
 
 
+def encode_context(context_dict: Dict[str, Any]) -> str:
+    """Serialize a context payload to JSON, using orjson when installed"""
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(context_dict, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(context_dict, default=str, separators=(",", ":"))
+
+
+class PersistDiagnostics:
+    """
+    Decides which context saves run the verbose diagnostics path.
+
+    Diagnostics (payload logging plus a read-back of the saved row) run for
+    sessions explicitly enabled, or for a random sample of saves set by
+    CONTEXT_DIAGNOSTICS_SAMPLE_RATE (0.0-1.0, default off).
+    """
+
+    def __init__(self, sample_rate: float = 0.0):
+        self.sample_rate = sample_rate
+        self._sessions: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stats = {"persisted": 0, "verified": 0}
+
+    def enable(self, session_id: str):
+        """Turn diagnostics on for a session"""
+        with self._lock:
+            self._sessions.add(session_id)
+
+    def disable(self, session_id: str):
+        """Turn diagnostics off for a session"""
+        with self._lock:
+            self._sessions.discard(session_id)
+
+    def should_verify(self, session_id: str) -> bool:
+        """Count a save and decide whether it runs in diagnostics mode"""
+        with self._lock:
+            self._stats["persisted"] += 1
+            verify = session_id in self._sessions or (
+                self.sample_rate > 0 and random.random() < self.sample_rate
+            )
+            if verify:
+                self._stats["verified"] += 1
+            return verify
+
+    def get_stats(self) -> Dict[str, Any]:
+        """How often saves ran with verification"""
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "diagnostic_sessions": len(self._sessions),
+                **self._stats
+            }
+
+
+persist_diagnostics = PersistDiagnostics(
+    sample_rate=float(os.getenv("CONTEXT_DIAGNOSTICS_SAMPLE_RATE", "0"))
+)
+
+
 class ContextField(str, Enum):
     """Standard context fields"""
     SESSION_ID = "session_id"
@@ -181,11 +252,22 @@ class ContextManager:
     
     This class consolidates all context operations including retrieval,
     updates, validation, enrichment, and persistence.
+
+    Full conversation history lives append-only in chat_logs; the persisted
+    context blob only carries the most recent ``history_window`` turns.
+    Contexts are cached in a bounded SessionContextCache which, in write-behind
+    mode, batches persistence except for states in WRITE_THROUGH_STATES.
     """
+
+    # States whose context must reach the database before the turn returns
+    WRITE_THROUGH_STATES = ("booking", "complete")
     
-    def __init__(self, max_context_age: timedelta = timedelta(hours=24)):
+    def __init__(self, max_context_age: timedelta = timedelta(hours=24),
+                 history_window: int = 10,
+                 cache: Optional[SessionContextCache] = None):
         self.max_context_age = max_context_age
-        self._context_cache: Dict[str, ConversationContext] = {}
+        self.history_window = history_window
+        self.cache = cache or session_context_cache
         
     def get_context(self, session_id: str, include_history: bool = True) -> ConversationContext:
         """
@@ -199,23 +281,31 @@ class ContextManager:
             Complete conversation context
         """
         # Check cache first
-        if session_id in self._context_cache:
-            cached = self._context_cache[session_id]
-            if self._is_context_fresh(cached):
-                return cached
+        cached = self.cache.get(session_id)
+        if cached is not None and self._is_context_fresh(cached):
+            return cached
         
+        # Make sure unflushed writes for an evicted session land before reloading
+        if self.cache.has_pending(session_id):
+            self.cache.flush()
+
         # Load from database
         context = self._load_context_from_db(session_id)
         
-        # Add conversation history if requested
+        # chat_logs is the source of truth for history: turns logged by the
+        # ConversationProcessor path never reach the blob's window, so always
+        # refresh the tail (the blob window only covers sessions without logs)
         if include_history:
-            context.conversation_history = self._get_conversation_history(session_id)
+            history = self._get_conversation_history(session_id, limit=self.history_window)
+            if history:
+                context.conversation_history = history
+        self.trim_history(context)
             
         # Enrich context with derived information
         self._enrich_context(context)
         
         # Cache the context
-        self._context_cache[session_id] = context
+        self.cache.put(session_id, context, size_bytes=payload_size(self._storage_payload(context)))
         
         return context
     
@@ -251,19 +341,48 @@ class ContextManager:
         # Update timestamp
         context.last_updated = datetime.now(timezone.utc)
         
-        # Persist to database
-        self._persist_context(context)
-        
-        # Update cache
-        self._context_cache[session_id] = context
+        # Persist (or queue for write-behind) and cache
+        self.save_context(session_id, context)
         
         return context
+
+    def save_context(self, session_id: str, context: ConversationContext, flush: bool = False):
+        """
+        Persist a context and cache it.
+
+        In write-behind mode the write is deferred and batched, unless flush is
+        set or the context is in a state listed in WRITE_THROUGH_STATES.
+
+        Args:
+            session_id: Session identifier
+            context: Context to save
+            flush: Force a synchronous write
+        """
+        if self.cache.write_behind and not flush and not self._requires_write_through(context):
+            payload = self._storage_payload(context)
+            self.cache.put(session_id, context, size_bytes=payload_size(payload),
+                           dirty_payload=payload)
+            if self.cache.flush_due():
+                self.cache.flush()
+            return
+
+        self.cache.write_through(session_id, context, lambda: self._persist_context(context))
+
+    def _requires_write_through(self, context: ConversationContext) -> bool:
+        """Whether the context's state must be persisted synchronously"""
+        state = (context.conversation_state or "").lower()
+        return any(marker in state for marker in self.WRITE_THROUGH_STATES)
+
+    def _storage_payload(self, context: ConversationContext) -> Dict[str, Any]:
+        """Context as stored in conversation_context.context_data"""
+        payload = context.to_dict()
+        payload["conversation_history"] = self._history_window(context.conversation_history)
+        return payload
     
     def clear_context(self, session_id: str):
         """Clear context for a session"""
         # Remove from cache
-        if session_id in self._context_cache:
-            del self._context_cache[session_id]
+        self.cache.discard(session_id)
             
         # Mark as inactive in database
         db.execute_update("""
@@ -356,50 +475,23 @@ class ContextManager:
                 last_updated=datetime.now(timezone.utc)
             )
     
-    def _persist_context(self, context: ConversationContext):
-        """Persist context to database"""
-        context_dict = context.to_dict()
-
-        # 🐛 DEBUG: Log booking attributes before persisting
-        logger.error(f"💾 _persist_context called for session: {context.session_id}")
-        logger.error(f"   booking_data: {context.booking_data}")
-        logger.error(f"   presented_slots: {len(context.presented_slots)} slots")
-        logger.error(f"   selected_slot: {'Present' if context.selected_slot else 'None'}")
-        logger.error(f"   booking_site_info: {'Present' if context.booking_site_info else 'None'}")
-        logger.error(f"   booking_trial_id: {context.booking_trial_id}")
-
-        # 🐛 DEBUG: Log what we're about to persist
-        if "prescreening_data" in context_dict:
-            p_data = context_dict["prescreening_data"]
-            if p_data and isinstance(p_data, dict):
-                logger.error(f"💿 _persist_context - prescreening_data in to_dict(): {len(p_data)} keys")
-                logger.error(f"   Index: {p_data.get('current_question_index', 'N/A')}")
-            else:
-                logger.error(f"💿 _persist_context - prescreening_data is EMPTY in to_dict()")
-        else:
-            logger.error(f"💿 _persist_context - NO prescreening_data key in to_dict()")
+    def _persist_context(self, context: ConversationContext) -> int:
+        """Persist context to database, returning the serialized size"""
+        session_id = context.session_id
+        diagnostics = persist_diagnostics.should_verify(session_id)
+        context_dict = self._storage_payload(context)
+
+        if diagnostics:
+            self._log_persist_diagnostics(context, context_dict)
 
         # Extract fields stored as columns
         focus_condition = context_dict.pop("focus_condition", None)
         focus_location = context_dict.pop("focus_location", None)
         user_id = context_dict.pop("user_id", "anonymous")
-        session_id = context_dict.pop("session_id")
+        context_dict.pop("session_id")
 
-        # Convert to JSON
-        context_json = json.dumps(context_dict)
-
-        # 🐛 DEBUG: Check if booking attributes survived JSON serialization
-        check_dict = json.loads(context_json)
-        logger.error(f"📋 JSON KEYS BEING SAVED: {list(check_dict.keys())}")
-        logger.error(f"   booking_data in JSON: {check_dict.get('booking_data')}")
-        logger.error(f"   presented_slots in JSON: {len(check_dict.get('presented_slots', []))} slots")
-        logger.error(f"   selected_slot in JSON: {'Present' if check_dict.get('selected_slot') else 'None'}")
-        logger.error(f"   booking_site_info in JSON: {'Present' if check_dict.get('booking_site_info') else 'None'}")
-
-        if "prescreening_data" in check_dict and check_dict["prescreening_data"]:
-            logger.error(f"✅ prescreening_data IN JSON being saved to DB")
-        else:
-            logger.error(f"❌ prescreening_data NOT in JSON or is empty!")
+        # Convert to JSON (once)
+        context_json = encode_context(context_dict)
         
         # Upsert to database with enhanced error handling
         try:
@@ -416,14 +508,8 @@ class ContextManager:
                     updated_at = NOW()
             """, (session_id, user_id, context_json, focus_condition, focus_location))
 
-            # 🐛 DEBUG: Verify what was actually saved
-            verify = db.execute_query("SELECT context_data FROM conversation_context WHERE session_id = %s", (session_id,))
-            if verify:
-                saved_data = verify[0]['context_data'] if isinstance(verify[0]['context_data'], dict) else json.loads(verify[0]['context_data'])
-                logger.error(f"📀 VERIFIED IN DB IMMEDIATELY AFTER SAVE:")
-                logger.error(f"   presented_slots: {len(saved_data.get('presented_slots', []))} slots")
-                logger.error(f"   booking_site_info: {'Present' if saved_data.get('booking_site_info') else 'MISSING!'}")
-                logger.error(f"   booking_data: {saved_data.get('booking_data')}")
+            if diagnostics:
+                self._verify_persisted_context(session_id)
         except Exception as e:
             logger.error(f"Database constraint error saving context for session {session_id}: {e}")
             # Try a simpler update query as fallback
@@ -438,7 +524,53 @@ class ContextManager:
             except Exception as e2:
                 logger.error(f"Fallback update also failed for session {session_id}: {e2}")
                 raise
+
+        return len(context_json)
+
+    def _log_persist_diagnostics(self, context: ConversationContext, context_dict: Dict[str, Any]):
+        """Log booking and prescreening state about to be persisted (diagnostics mode)"""
+        logger.info(f"💾 _persist_context called for session: {context.session_id}")
+        logger.info(f"   booking_data: {context.booking_data}")
+        logger.info(f"   presented_slots: {len(context.presented_slots)} slots")
+        logger.info(f"   selected_slot: {'Present' if context.selected_slot else 'None'}")
+        logger.info(f"   booking_site_info: {'Present' if context.booking_site_info else 'None'}")
+        logger.info(f"   booking_trial_id: {context.booking_trial_id}")
+
+        p_data = context_dict.get("prescreening_data")
+        if p_data and isinstance(p_data, dict):
+            logger.info(f"💿 _persist_context - prescreening_data: {len(p_data)} keys, "
+                        f"index {p_data.get('current_question_index', 'N/A')}")
+        else:
+            logger.info(f"💿 _persist_context - prescreening_data is EMPTY")
+        logger.info(f"📋 JSON KEYS BEING SAVED: {list(context_dict.keys())}")
+
+    def _verify_persisted_context(self, session_id: str):
+        """Read the context back after saving and log what landed (diagnostics mode)"""
+        verify = db.execute_query("SELECT context_data FROM conversation_context WHERE session_id = %s", (session_id,))
+        if verify:
+            saved_data = verify[0]['context_data'] if isinstance(verify[0]['context_data'], dict) else json.loads(verify[0]['context_data'])
+            logger.info(f"📀 VERIFIED IN DB IMMEDIATELY AFTER SAVE:")
+            logger.info(f"   presented_slots: {len(saved_data.get('presented_slots', []))} slots")
+            logger.info(f"   booking_site_info: {'Present' if saved_data.get('booking_site_info') else 'MISSING!'}")
+            logger.info(f"   booking_data: {saved_data.get('booking_data')}")
+        else:
+            logger.error(f"❌ VERIFICATION FAILED: no context row for session {session_id} after save")
         
+    def trim_history(self, context: ConversationContext):
+        """Drop in-memory history turns older than the persisted window"""
+        if len(context.conversation_history) > self.history_window:
+            context.conversation_history = context.conversation_history[-self.history_window:]
+
+    def _history_window(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Most recent history turns, with timestamps made JSON-serializable"""
+        window = []
+        for turn in (history or [])[-self.history_window:]:
+            turn = dict(turn)
+            if hasattr(turn.get("timestamp"), "isoformat"):
+                turn["timestamp"] = turn["timestamp"].isoformat()
+            window.append(turn)
+        return window
+
     def _get_conversation_history(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent conversation history"""
         results = db.execute_query("""
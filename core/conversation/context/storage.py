@@ -350,12 +350,14 @@ class ContextStorage:
             logger.error(f"Failed to get active session count: {str(e)}")
             return 0
     
-    def batch_save_contexts(self, contexts: List[Tuple[str, Dict[str, Any]]]) -> int:
+    def batch_save_contexts(self, contexts: List[Tuple[str, Dict[str, Any]]],
+                            failed: Optional[List[str]] = None) -> int:
         """
         Batch save multiple contexts.
         
         Args:
             contexts: List of (session_id, context_data) tuples
+            failed: If given, session ids that could not be saved are appended to it
             
         Returns:
             Number of contexts saved
@@ -364,45 +366,64 @@ class ContextStorage:
             return 0
             
         try:
-            # Prepare batch data
-            values = []
+            # Prepare batch data (last write per session wins)
+            values = {}
             for session_id, context_data in contexts:
                 user_id = context_data.get("user_id", "anonymous")
                 focus_condition = context_data.get("focus_condition")
                 focus_location = context_data.get("focus_location")
-                context_json = json.dumps(context_data)
+                context_json = json.dumps(context_data, default=str)
                 
-                values.append((
+                values[session_id] = (
                     session_id, user_id, context_json, 
                     focus_condition, focus_location
-                ))
+                )
+            values = list(values.values())
             
-            # Execute batch insert/update
-            # Note: This is a simplified version. In production, you'd want
-            # to use proper batch operations or COPY for better performance
+            upsert_sql = """
+                INSERT INTO conversation_context 
+                (session_id, user_id, context_data, focus_condition, focus_location, active)
+                VALUES {rows}
+                ON CONFLICT (session_id)
+                DO UPDATE SET 
+                    context_data = EXCLUDED.context_data,
+                    focus_condition = EXCLUDED.focus_condition,
+                    focus_location = EXCLUDED.focus_location,
+                    active = EXCLUDED.active,
+                    updated_at = NOW()
+            """
+            
+            # One multi-row upsert per chunk; fall back to row-by-row if a chunk fails
             saved = 0
-            for value in values:
+            chunk_size = 100
+            for i in range(0, len(values), chunk_size):
+                chunk = values[i:i + chunk_size]
                 try:
-                    db.execute_update("""
-                        INSERT INTO conversation_context 
-                        (session_id, user_id, context_data, focus_condition, focus_location, active)
-                        VALUES (%s, %s, %s, %s, %s, true)
-                        ON CONFLICT (session_id)
-                        DO UPDATE SET 
-                            context_data = EXCLUDED.context_data,
-                            focus_condition = EXCLUDED.focus_condition,
-                            focus_location = EXCLUDED.focus_location,
-                            active = EXCLUDED.active,
-                            updated_at = NOW()
-                    """, value)
-                    saved += 1
+                    rows_sql = ", ".join(["(%s, %s, %s::jsonb, %s, %s, true)"] * len(chunk))
+                    params = tuple(field for value in chunk for field in value)
+                    db.execute_update(upsert_sql.format(rows=rows_sql), params)
+                    saved += len(chunk)
+                    continue
                 except Exception as e:
-                    logger.error(f"Failed to save context in batch: {str(e)}")
+                    logger.error(f"Batch context upsert failed, saving individually: {str(e)}")
+                
+                for value in chunk:
+                    try:
+                        db.execute_update(
+                            upsert_sql.format(rows="(%s, %s, %s::jsonb, %s, %s, true)"), value
+                        )
+                        saved += 1
+                    except Exception as e:
+                        logger.error(f"Failed to save context in batch: {str(e)}")
+                        if failed is not None:
+                            failed.append(value[0])
             
             return saved
             
         except Exception as e:
             logger.error(f"Failed to batch save contexts: {str(e)}")
+            if failed is not None:
+                failed.extend(session_id for session_id, _ in contexts)
             return 0
     
     def start_background_cleanup(self):
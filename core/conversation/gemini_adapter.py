@@ -224,6 +224,8 @@ class GeminiConversationAdapter:
             if not context.conversation_history:
                 context.conversation_history = []
             context.conversation_history.append(turn)
+            # chat_logs keeps the full history; the context only holds the recent window
+            self.context_manager.trim_history(context)
             
             # Update state data
             context.state_data.update({
@@ -246,16 +248,6 @@ class GeminiConversationAdapter:
                     context.metadata = {}
                 context.metadata.update(result_metadata)
             
-            # Save context - use update_context which exists
-            # Serialize datetime objects in conversation history
-            serializable_history = []
-            if context.conversation_history:
-                for turn in context.conversation_history:
-                    serializable_turn = dict(turn)
-                    if 'timestamp' in serializable_turn and hasattr(serializable_turn['timestamp'], 'isoformat'):
-                        serializable_turn['timestamp'] = serializable_turn['timestamp'].isoformat()
-                    serializable_history.append(serializable_turn)
-            
             # Save the conversation turn to chat_logs table
             context_data = {
                 "focus_condition": context.focus_condition,
@@ -284,7 +276,6 @@ class GeminiConversationAdapter:
                 "focus_condition": context.focus_condition,
                 "focus_location": context.focus_location,
                 "conversation_state": context.conversation_state,
-                "conversation_history": serializable_history,
                 "state_data": context.state_data,
                 "metadata": getattr(context, 'metadata', {})
             }
@@ -311,8 +302,6 @@ class GeminiConversationAdapter:
             # Apply any additional updates from context_updates
             if 'conversation_state' in context_updates:
                 context.conversation_state = context_updates['conversation_state']
-            if 'conversation_history' in context_updates:
-                context.conversation_history = context_updates['conversation_history']
             if 'state_data' in context_updates:
                 context.state_data.update(context_updates['state_data'])
             if 'metadata' in context_updates:
@@ -326,10 +315,8 @@ class GeminiConversationAdapter:
             logger.error(f"💾 PERSISTING MODIFIED CONTEXT - Prescreening_data has {len(context.prescreening_data)} keys")
 
             # Persist the MODIFIED context object (preserves all changes from process_message)
-            self.context_manager._persist_context(context)
-
-            # DON'T clear cache - update it with the modified context
-            self.context_manager._context_cache[session_id] = context
+            # and keep it cached - don't reload it from the DB
+            self.context_manager.save_context(session_id, context)
 
             logger.error(f"✅ Context persisted and cached")
 
@@ -16,6 +16,7 @@ from datetime import datetime
 from core.conversation.context import ConversationContext
 from core.conversation.understanding.gemini_intent_detector import GeminiIntentDetector, GeminiDetectedIntent
 from core.database import db
+from core.async_database import async_db
 from models.schemas import ConversationState
 from core.prescreening.gemini_prescreening_manager import GeminiPrescreeningManager
 from core.services.gemini_service import gemini_service
@@ -46,7 +47,7 @@ class GeminiConversationManager:
         self.prescreening_manager = GeminiPrescreeningManager()
         self.conversation_functions = self._define_conversation_functions()
 
-    def _check_existing_prescreening_session(self, session_id: str, condition: str = None, trial_id: int = None) -> Dict[str, Any]:
+    async def _check_existing_prescreening_session(self, session_id: str, condition: str = None, trial_id: int = None) -> Dict[str, Any]:
         """
         Check if there's already a prescreening session for this conversation.
 
@@ -70,7 +71,7 @@ class GeminiConversationManager:
                 ORDER BY ps.started_at DESC
                 LIMIT 1
             """
-            results = db.execute_query(query, (session_id, trial_id, trial_id))
+            results = await async_db.execute_query(query, (session_id, trial_id, trial_id))
 
             if results and len(results) > 0:
                 session = results[0]
@@ -113,7 +114,7 @@ class GeminiConversationManager:
             logger.error(f"Error checking existing prescreening session: {str(e)}")
             return None
     
-    def _handle_existing_prescreening_session(self, existing_session: Dict[str, Any], context: ConversationContext) -> Dict[str, Any]:
+    async def _handle_existing_prescreening_session(self, existing_session: Dict[str, Any], context: ConversationContext) -> Dict[str, Any]:
         """Handle the case where a prescreening session already exists"""
         try:
             # Get current progress
@@ -123,7 +124,7 @@ class GeminiConversationManager:
             status = existing_session.get('status')
 
             # Get answered questions count
-            answered_count = db.execute_query("""
+            answered_count = await async_db.execute_query("""
                 SELECT COUNT(*) as count
                 FROM prescreening_answers
                 WHERE session_id = %s
@@ -345,12 +346,14 @@ class GeminiConversationManager:
 
         try:
             # Start prescreening session
+            session_state = {}
             questions, trial_name = self.prescreening_manager.start_prescreening(
                 trial_id=trial_id,
                 session_id=context.session_id,
                 user_id=context.user_id,
                 condition=context.focus_condition,
-                location=context.focus_location
+                location=context.focus_location,
+                session_state=session_state
             )
 
             if not questions:
@@ -368,7 +371,8 @@ class GeminiConversationManager:
                 'questions': [self._serialize_question(q) for q in questions],
                 'current_question_index': 0,
                 'total_questions': len(questions),
-                'answers': []
+                'answers': [],
+                'prescreening_session_id': session_state.get('prescreening_session_id')
             }
 
             # Get first question
@@ -1002,22 +1006,13 @@ Provide a specific action, parameters, and a warm, helpful response that moves t
             # Import the trial search service here to avoid circular imports
             from core.services.trial_search import trial_search
 
-            # First try direct search
+            # Hybrid search falls back to metro area expansion when the location has no trials
             results = await trial_search.search_trials_hybrid(condition, location)
 
             if results:
                 logger.info(f"Found {len(results)} trials for {condition} in {location}")
                 return results
 
-            # If no results, try metro area expansion
-            # This allows "St. Louis" to find trials in Wildwood, Town and Country, etc.
-            logger.info(f"No direct results for {condition} in {location}, trying metro area expansion...")
-            results = await trial_search.search_trials_hybrid(condition, location)
-
-            if results:
-                logger.info(f"Metro expansion found {len(results)} trials for {condition} near {location}")
-                return results
-
             return []
 
         except Exception as e:
@@ -1193,7 +1188,7 @@ Respond with a JSON object containing these assessments."""
 
             analysis_text = await self.gemini.generate_text(f"""You are an expert in communication analysis. Analyze user messages to understand their communication style, emotional state, and preferences to help personalize responses.
 
-{analysis_prompt}""", max_tokens=500)
+{analysis_prompt}""", max_tokens=500, cache_namespace="communication_analysis")
             
             # Try to parse as JSON, fallback to text analysis
             try:
@@ -1315,30 +1310,30 @@ Respond with a JSON object containing these assessments."""
             condition_trials = await self._find_trials_in_database(condition, location)
 
             if not condition_trials or not condition_embedding:
-                # Fallback to keyword search
-                return await self._find_trials_in_database(condition, location)
-            
-            # Calculate semantic similarity for each trial
+                # Nothing to rank - the keyword/hybrid results are the answer
+                return condition_trials
+
+            # Rank candidates against stored trial vectors (one DB read, missing
+            # vectors backfilled in one batch) instead of embedding each trial
+            from core.services.trial_search import trial_search
+            trial_embeddings = await trial_search.get_trial_embeddings(condition_trials)
+
+            ranked_trials = [trial for trial in condition_trials if trial.get('id') in trial_embeddings]
+            if not ranked_trials:
+                return []
+
+            # Vectorized cosine similarity: one matrix product over all candidates
+            matrix = np.array([trial_embeddings[trial['id']] for trial in ranked_trials], dtype=np.float32)
+            query = np.array(condition_embedding, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            similarities = np.divide(matrix @ query, norms, out=np.zeros(len(ranked_trials), dtype=np.float32), where=norms > 0)
+
             semantic_trials = []
-            for trial in condition_trials:
-                trial_text = f"{trial.get('conditions', '')} {trial.get('trial_name', '')}"
-                
-                try:
-                    # Get embedding for trial
-                    trial_embeddings = await self.gemini.generate_embeddings([f"Clinical trial: {trial_text}"])
-                    trial_embedding = trial_embeddings[0]
-                    
-                    # Calculate cosine similarity
-                    similarity = self._cosine_similarity(condition_embedding, trial_embedding)
-                    
-                    if similarity > 0.7:  # Similarity threshold
-                        trial["similarity_score"] = similarity
-                        semantic_trials.append(trial)
-                        
-                except Exception as e:
-                    logger.error(f"Error processing trial embedding: {str(e)}")
-                    continue
-            
+            for trial, similarity in zip(ranked_trials, similarities):
+                if similarity > 0.7:  # Similarity threshold
+                    trial["similarity_score"] = float(similarity)
+                    semantic_trials.append(trial)
+
             # Sort by similarity and return top results
             semantic_trials.sort(key=lambda x: x.get("similarity_score", 0), reverse=True)
             return semantic_trials[:5]
@@ -1484,14 +1479,14 @@ Respond with a JSON object containing these assessments."""
 
             # Check for existing prescreening sessions AFTER determining trial_id
             # This prevents duplicate prescreening for the SAME trial
-            existing_session = self._check_existing_prescreening_session(
+            existing_session = await self._check_existing_prescreening_session(
                 context.session_id,
                 context.focus_condition,
                 trial_id  # Pass trial_id for specific deduplication
             )
             if existing_session:
                 logger.info(f"Found existing prescreening session for trial {existing_session.get('trial_id')}")
-                return self._handle_existing_prescreening_session(existing_session, context)
+                return await self._handle_existing_prescreening_session(existing_session, context)
             else:
                 if not trial_id:
                     logger.warning(f"No matching trial found in last_shown_trials for condition: {focus_condition}")
@@ -1555,8 +1550,9 @@ Respond with a JSON object containing these assessments."""
             location = detected_intent.entities.location or context.focus_location
 
             # 🔥 PASS DATABASE PARAMETERS TO PRESCREENING MANAGER
+            session_state = {}
             questions, trial_name = self.prescreening_manager.start_prescreening(
-                trial_id, session_id, user_id, condition, location
+                trial_id, session_id, user_id, condition, location, session_state=session_state
             )
 
             # CRITICAL VALIDATION: Log trial details to verify correct trial is being used
@@ -1595,7 +1591,8 @@ Respond with a JSON object containing these assessments."""
                 "trial_name": trial_name,
                 "questions": serializable_questions,
                 "current_question_index": 0,
-                "answers": []
+                "answers": [],
+                "prescreening_session_id": session_state.get("prescreening_session_id")
             })
             
             # Get the first question
@@ -1707,7 +1704,7 @@ Keep it supportive and informative, not intimidating."""
 
             return await self.gemini.generate_text(f"""You are a helpful clinical trials coordinator who explains eligibility criteria in an accessible, reassuring way.
 
-{explanation_prompt}""", max_tokens=600)
+{explanation_prompt}""", max_tokens=600, cache_namespace="criteria_explanation")
             
         except Exception as e:
             logger.error(f"Error generating eligibility explanation: {str(e)}")
@@ -2764,7 +2761,8 @@ Keep it supportive and informative, not intimidating."""
                 
                 # 🔥 CALL THE NEW PRESCREENING MANAGER METHOD
                 self.prescreening_manager.save_prescreening_answer(
-                    context.session_id, user_id, current_question, user_response, parsed_answer
+                    context.session_id, user_id, current_question, user_response, parsed_answer,
+                    prescreening_session_id=prescreening_data.get("prescreening_session_id")
                 )
                 
                 logger.info("✅ Successfully saved prescreening answer to database")
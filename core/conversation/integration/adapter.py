@@ -6,8 +6,12 @@ to be used in place of the existing chat handling logic while maintaining
 backward compatibility.
 """
 
+import os
+import asyncio
 import logging
 import uuid
+import concurrent.futures
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional, Tuple, List
 from datetime import datetime
 
@@ -20,13 +24,45 @@ from core.conversation.pipeline import (
     MetricsMiddleware,
     ErrorHandlingMiddleware
 )
-from core.conversation.context import ContextStorage
+from core.conversation.context import ContextStorage, persist_diagnostics
 from core.database import db
 from core.services.gemini_service import gemini_service
 
 logger = logging.getLogger(__name__)
 
 
+class SessionLockRegistry:
+    """
+    Keyed asyncio locks so requests for the same session run one at a time.
+
+    Locks are created on demand and dropped once no request holds or waits
+    on them, so the registry only grows with concurrently active sessions.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: str):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if self._users[key] == 0:
+                del self._users[key]
+                del self._locks[key]
+
+    def active_sessions(self) -> int:
+        """Number of sessions with a request running or queued"""
+        return len(self._locks)
+
+
 class ConversationSystemAdapter:
     """
     Adapter for integrating the new conversation system with existing code.
@@ -35,13 +71,16 @@ class ConversationSystemAdapter:
     replacement for the existing chat handling logic.
     """
     
-    def __init__(self, use_middleware: bool = True, enable_metrics: bool = True):
+    def __init__(self, use_middleware: bool = True, enable_metrics: bool = True,
+                 pipeline_workers: Optional[int] = None):
         """
         Initialize the adapter.
         
         Args:
             use_middleware: Whether to use middleware pipeline
             enable_metrics: Whether to enable metrics collection
+            pipeline_workers: Worker threads for the sync pipeline
+                (default: CONVERSATION_PIPELINE_WORKERS env var)
         """
         self.processor = ConversationProcessor()
         self.context_storage = ContextStorage()
@@ -59,7 +98,19 @@ class ConversationSystemAdapter:
             "use_new_system": True,
             "parallel_execution": False,  # For comparing old vs new
             "log_differences": True,
+            "offload_pipeline": True,  # Run the sync pipeline off the event loop
         }
+
+        # The pipeline is synchronous (DB calls, SyncGeminiResponder), so it runs
+        # in a bounded worker pool while requests are serialized per session.
+        # ConversationProcessor keeps its state machine request-scoped, so
+        # different sessions can be processed in parallel.
+        self.pipeline_workers = pipeline_workers or int(os.getenv("CONVERSATION_PIPELINE_WORKERS", "8"))
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.pipeline_workers,
+            thread_name_prefix="conversation-pipeline"
+        )
+        self._session_locks = SessionLockRegistry()
     
     def _setup_middleware(self) -> MiddlewarePipeline:
         """Set up middleware pipeline"""
@@ -113,10 +164,18 @@ class ConversationSystemAdapter:
         if self.middleware_pipeline:
             # Build pipeline with processor as final handler
             handler = self.middleware_pipeline.build(self._process_with_new_system)
-            result = handler(request_data)
         else:
             # Process directly
-            result = self._process_with_new_system(request_data)
+            handler = self._process_with_new_system
+
+        if self.feature_flags.get("offload_pipeline"):
+            # Two messages for one session must not interleave; other sessions
+            # keep progressing while this one waits on Gemini or Postgres
+            async with self._session_locks.hold(session_id):
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor, handler, request_data)
+        else:
+            result = handler(request_data)
         
         # Convert to API response format
         return self._convert_to_api_response(result, session_id)
@@ -216,6 +275,14 @@ class ConversationSystemAdapter:
         
         if hasattr(self, "metrics_middleware"):
             metrics["middleware_metrics"] = self.metrics_middleware.get_metrics()
+
+        metrics["pipeline"] = {
+            "offload_enabled": self.feature_flags.get("offload_pipeline", False),
+            "workers": self.pipeline_workers,
+            "active_sessions": self._session_locks.active_sessions()
+        }
+        metrics["context_cache"] = self.processor.context_manager.cache.get_stats()
+        metrics["context_persistence"] = persist_diagnostics.get_stats()
             
         return metrics
     
@@ -247,7 +314,7 @@ class ConversationSystemAdapter:
         """
         
         try:
-            response = await self.gemini.generate_text(prompt, max_tokens=50)
+            response = await self.gemini.generate_text(prompt, max_tokens=50, cache_namespace="intent")
             detected_intent = response.strip().lower()
             
             return detected_intent if detected_intent in intents else 'general_question'
@@ -273,7 +340,7 @@ class ConversationSystemAdapter:
         """
         
         try:
-            return await self.gemini.generate_text(system_prompt, max_tokens=500)
+            return await self.gemini.generate_text(system_prompt, max_tokens=500, cache_namespace="chat")
         except Exception as e:
             logger.error(f"Error generating Gemini response: {str(e)}")
             return "I apologize, but I'm having trouble processing your request right now. Please try again."
@@ -6,6 +6,7 @@ context management, state transitions, and response generation.
 """
 
 import logging
+import threading
 import time
 from typing import Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass
@@ -32,6 +33,20 @@ class ProcessingResult:
     error: Optional[str] = None
 
 
+@dataclass
+class RequestState:
+    """
+    Per-request processing state.
+
+    Carries the session's state machine through the pipeline stages so a single
+    ConversationProcessor can serve concurrent requests without sharing it.
+    """
+    session_id: str
+    context: ConversationContext
+    state_manager: ConversationStateManager
+    flow_controller: ConversationFlowController
+
+
 class ConversationProcessor:
     """
     Main conversation processing pipeline.
@@ -50,15 +65,14 @@ class ConversationProcessor:
         self.intent_detector = IntentDetector()
         self.entity_extractor = EntityExtractor()
         self.context_analyzer = ContextAnalyzer()
-        self.state_manager = ConversationStateManager()
-        self.flow_controller = ConversationFlowController(self.state_manager)
         self.handler_registry = HandlerRegistry()
         self.gemini_responder = SyncGeminiResponder()
         
         # Register handlers
         self._register_handlers()
         
-        # Processing metrics
+        # Processing metrics (updated from concurrent requests)
+        self._metrics_lock = threading.Lock()
         self.metrics = {
             "total_processed": 0,
             "successful": 0,
@@ -128,7 +142,8 @@ class ConversationProcessor:
         
         try:
             # Stage 1: Context retrieval and enrichment
-            context = self._retrieve_context(session_id, user_id)
+            request = self._retrieve_context(session_id, user_id)
+            context = request.context
             
             # Stage 2: Understanding - Intent and Entity extraction
             understanding_result = self._understand_message(message, context)
@@ -142,10 +157,10 @@ class ConversationProcessor:
             logger.info(f"Context has trial info: {context.just_showed_trial_info}")
             
             # Stage 3: State management
-            flow_result = self._manage_flow(intent, context)
+            flow_result = self._manage_flow(intent, request)
             
             # Stage 4: Handler execution
-            handler_result = self._execute_handler(message, intent, entities, context)
+            handler_result = self._execute_handler(message, intent, entities, request)
             
             # Stage 4.5: Process handler actions
             if handler_result.get("actions"):
@@ -155,7 +170,7 @@ class ConversationProcessor:
             response = self._generate_response(handler_result, context)
             
             # Stage 6: Context update
-            self._update_context(session_id, handler_result, intent, entities)
+            self._update_context(request, handler_result, intent, entities)
             
             # Calculate processing time
             processing_time = (time.time() - start_time) * 1000
@@ -171,7 +186,7 @@ class ConversationProcessor:
                 entities=self._serialize_entities(entities),
                 metadata={
                     "session_id": session_id,
-                    "current_state": self.state_manager.current_state.value,
+                    "current_state": request.state_manager.current_state.value,
                     "handler_used": handler_result.get("handler_name"),
                     "contextual_clues": len(contextual_clues),
                     **handler_result.get("metadata", {})
@@ -199,8 +214,8 @@ class ConversationProcessor:
                 error=str(e)
             )
     
-    def _retrieve_context(self, session_id: str, user_id: Optional[str]) -> ConversationContext:
-        """Retrieve and enrich conversation context"""
+    def _retrieve_context(self, session_id: str, user_id: Optional[str]) -> RequestState:
+        """Retrieve and enrich conversation context, restoring its state machine"""
         logger.debug(f"Retrieving context for session {session_id}")
         
         # Get context with history
@@ -210,7 +225,8 @@ class ConversationProcessor:
         if user_id and context.user_id == "anonymous":
             context.user_id = user_id
         
-        # Sync with state manager
+        # Restore a request-scoped state manager from context
+        state_manager = ConversationStateManager()
         if context.conversation_state:
             try:
                 # Restore state manager from context
@@ -220,12 +236,17 @@ class ConversationProcessor:
                     "state_entered_at": context.last_updated.isoformat() if context.last_updated else None,
                     "state_history": []
                 }
-                self.state_manager = ConversationStateManager.deserialize(state_data)
+                state_manager = ConversationStateManager.deserialize(state_data)
             except:
                 # Reset if deserialization fails
-                self.state_manager = ConversationStateManager()
+                state_manager = ConversationStateManager()
         
-        return context
+        return RequestState(
+            session_id=session_id,
+            context=context,
+            state_manager=state_manager,
+            flow_controller=ConversationFlowController(state_manager)
+        )
     
     def _understand_message(self, message: str, 
                           context: ConversationContext) -> Dict[str, Any]:
@@ -260,15 +281,13 @@ class ConversationProcessor:
             "inferred": inferred_info
         }
     
-    def _manage_flow(self, intent, context: ConversationContext) -> Dict[str, Any]:
+    def _manage_flow(self, intent, request: RequestState) -> Dict[str, Any]:
         """Manage conversation flow and state transitions"""
         logger.debug(f"Managing flow for intent {intent.intent_type}")
+        context = request.context
         
-        # Sync state manager with current context BEFORE flow control
-        self.flow_controller.state_manager = self.state_manager
-        
-        # Handle intent through flow controller
-        flow_result = self.flow_controller.handle_intent(
+        # Handle intent through the request's flow controller
+        flow_result = request.flow_controller.handle_intent(
             intent_type=intent.intent_type.value,
             context=context.to_dict()
         )
@@ -280,9 +299,10 @@ class ConversationProcessor:
         return flow_result
     
     def _execute_handler(self, message: str, intent, entities, 
-                        context: ConversationContext) -> Dict[str, Any]:
+                        request: RequestState) -> Dict[str, Any]:
         """Execute appropriate handler for the intent"""
         logger.debug(f"Executing handler for intent {intent.intent_type}")
+        context = request.context
         
         # Get appropriate handler
         handler = self.handler_registry.get_handler(intent, context)
@@ -293,7 +313,7 @@ class ConversationProcessor:
             return self._handle_with_openai(message, intent, entities, context)
         
         # Execute handler
-        handler_response = handler.handle(intent, entities, context, self.state_manager)
+        handler_response = handler.handle(intent, entities, context, request.state_manager)
         
         # Process handler actions
         if handler_response.actions:
@@ -377,14 +397,15 @@ class ConversationProcessor:
         
         return response
     
-    def _update_context(self, session_id: str, handler_result: Dict[str, Any],
+    def _update_context(self, request: RequestState, handler_result: Dict[str, Any],
                        intent, entities):
         """Update context after processing"""
         updates = {}
+        state_manager = request.state_manager
         
         # Update state data from state manager
-        updates["conversation_state"] = self.state_manager.current_state.value
-        updates["state_data"] = self.state_manager.state_data
+        updates["conversation_state"] = state_manager.current_state.value
+        updates["state_data"] = state_manager.state_data
         
         # Add intent and entities to context
         updates["last_intent"] = {
@@ -402,8 +423,8 @@ class ConversationProcessor:
         # Apply updates from context state_data (which includes action updates)
         # This ensures all updates from handler actions are persisted
         for key in ["focus_location", "focus_condition", "trial_id", "trial_name"]:
-            if key in self.state_manager.state_data:
-                updates[key] = self.state_manager.state_data[key]
+            if key in state_manager.state_data:
+                updates[key] = state_manager.state_data[key]
         
         # Apply any handler-specific updates
         if handler_result.get("metadata"):
@@ -412,7 +433,7 @@ class ConversationProcessor:
                     updates[key] = value
         
         # Save updated context
-        self.context_manager.update_context(session_id, updates)
+        self.context_manager.update_context(request.session_id, updates)
     
     def _process_handler_actions(self, actions: List[Dict[str, Any]], 
                                context: ConversationContext):
@@ -544,19 +565,20 @@ class ConversationProcessor:
     
     def _update_metrics(self, success: bool, processing_time: float):
         """Update processing metrics"""
-        self.metrics["total_processed"] += 1
-        
-        if success:
-            self.metrics["successful"] += 1
-        else:
-            self.metrics["failed"] += 1
-        
-        # Update average processing time
-        current_avg = self.metrics["avg_processing_time"]
-        total = self.metrics["total_processed"]
-        self.metrics["avg_processing_time"] = (
-            (current_avg * (total - 1) + processing_time) / total
-        )
+        with self._metrics_lock:
+            self.metrics["total_processed"] += 1
+            
+            if success:
+                self.metrics["successful"] += 1
+            else:
+                self.metrics["failed"] += 1
+            
+            # Update average processing time
+            current_avg = self.metrics["avg_processing_time"]
+            total = self.metrics["total_processed"]
+            self.metrics["avg_processing_time"] = (
+                (current_avg * (total - 1) + processing_time) / total
+            )
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get processing metrics"""
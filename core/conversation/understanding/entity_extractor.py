@@ -13,6 +13,8 @@ from enum import Enum
 
 from core.services.condition_normalizer import condition_normalizer
 from core.services.condition_registry import condition_registry
+from core.services.condition_matcher import condition_matcher, KIND_CONDITION, KIND_SYNONYM
+from core.services.location_resolver import location_resolver
 from .intent_detector import IntentType, DetectedIntent
 from core.conversation.context import ConversationContext
 
@@ -398,8 +400,33 @@ class EntityExtractor:
                     metadata={"method": "short_message"}
                 )
         
+        # Otherwise look for a known condition mentioned anywhere in the message
+        # (abbreviations like "ra" or "add" are too ambiguous inside a sentence)
+        if not entities:
+            match = condition_matcher.best_match(message, kinds=(KIND_CONDITION, KIND_SYNONYM))
+            if match and not self._is_negated_mention(message, match.start):
+                entities[EntityType.CONDITION] = ExtractedEntity(
+                    entity_type=EntityType.CONDITION,
+                    value=match.matched,
+                    normalized_value=condition_normalizer.normalize_condition(match.matched),
+                    confidence=0.75,
+                    source="inferred",
+                    metadata={"method": "condition_matcher", "span": (match.start, match.end)}
+                )
+        
         return entities
     
+    def _is_negated_mention(self, message: str, start: int) -> bool:
+        """Whether the mention starting at start is negated ("I don't have diabetes")"""
+        # Only the clause the mention is in, up to a few words back
+        clause = re.split(r"[.,;!?]|\bbut\b", message[:start].lower())[-1]
+        preceding = clause.split()[-5:]
+        return bool(re.search(
+            r"\b(?:no|not|never|without|don'?t|doesn'?t|didn'?t|haven'?t|hasn'?t|"
+            r"isn'?t|aren'?t|wasn'?t|deny|denies|free of|ruled out)\b",
+            " ".join(preceding)
+        ))
+    
     def _extract_condition_answer(self, message: str, context: ConversationContext) -> Dict[EntityType, ExtractedEntity]:
         """Extract condition from a contextual answer"""
         entities = {}
@@ -595,25 +622,8 @@ class EntityExtractor:
         return entities
     
     def _normalize_location(self, location: str) -> str:
-        """Normalize location name"""
-        # Capitalize each word
-        words = location.split()
-        normalized = " ".join(word.capitalize() for word in words)
-        
-        # Handle common abbreviations
-        abbreviations = {
-            "Ny": "New York",
-            "Nyc": "New York City",
-            "La": "Los Angeles",
-            "Sf": "San Francisco",
-            "Dc": "Washington DC",
-        }
-        
-        for abbr, full in abbreviations.items():
-            if normalized == abbr:
-                return full
-        
-        return normalized
+        """Normalize location name ("tulsa ok" → "Tulsa, OK", "nyc" → "New York City")"""
+        return location_resolver.resolve(location).display
     
     def _is_likely_condition(self, text: str) -> bool:
         """Check if text is likely a medical condition"""
@@ -623,6 +633,11 @@ class EntityExtractor:
         if condition_registry.is_medical_condition(text_lower):
             return True
         
+        # Any known condition or synonym mentioned as a whole word (abbreviations
+        # like "ms" or "in" would reject locations such as "Jackson, MS")
+        if condition_matcher.contains_condition(text_lower, kinds=(KIND_CONDITION, KIND_SYNONYM)):
+            return True
+        
         # Check if normalization changes it (indicates it's a known condition)
         normalized = condition_normalizer.normalize_condition(text_lower)
         if normalized != text_lower:
@@ -15,6 +15,7 @@ from enum import Enum
 from core.conversation.context import ConversationContext
 from models.schemas import ConversationState
 from core.services.gemini_service import gemini_service
+from core.services.location_resolver import location_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -326,7 +327,7 @@ Return a JSON object with:
                 location = match.group(group_idx).strip()
                 # Basic validation - not a medical condition or generic phrase
                 if location.lower() not in ['trials', 'studies', 'research', 'available']:
-                    entities['location'] = location.title()
+                    entities['location'] = location_resolver.resolve(location).display
                     break
         
         # Age extraction
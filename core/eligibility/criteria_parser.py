@@ -32,7 +32,7 @@ class CriteriaParser:
             FROM trial_criteria
             WHERE trial_id = %s 
             AND is_required = true
-            AND parsed_json != '{"field": "unparsed"}'::jsonb
+            AND parsed_json - 'rule' != '{"field": "unparsed"}'::jsonb
             ORDER BY 
                 CASE category 
                     WHEN 'demographic' THEN 1
@@ -4,6 +4,7 @@ import json
 from typing import Dict, Any, Optional, Tuple, List
 from datetime import datetime
 from core.database import db
+from core.services.analytics_writer import analytics_writer
 from core.chat.answer_parser import AnswerParser
 from core.eligibility.question_templates import QuestionTemplates
 from core.eligibility.criteria_parser import CriteriaParser
@@ -499,7 +500,7 @@ class PrescreeningController:
             FROM trial_criteria
             WHERE trial_id = %s 
             AND is_required = true
-            AND parsed_json != '{"field": "unparsed"}'::jsonb
+            AND parsed_json - 'rule' != '{"field": "unparsed"}'::jsonb
         """, (trial_id,))
         
         # Evaluate each criterion
@@ -795,14 +796,16 @@ class PrescreeningController:
                 numeric_value = 0.0
                 calculation_method = 'manual_entry'
             
-            # Store in health_metrics table
-            db.execute_update("""
-                INSERT INTO health_metrics 
-                (session_id, user_id, metric_type, calculated_value, input_text, 
-                 units, calculation_method)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (session_id, user_id, metric_type, numeric_value, 
-                  input_text, units, calculation_method))
+            # Store in health_metrics table (buffered, off the answer path)
+            analytics_writer.enqueue('health_metrics', {
+                'session_id': session_id,
+                'user_id': user_id,
+                'metric_type': metric_type,
+                'calculated_value': numeric_value,
+                'input_text': input_text,
+                'units': units,
+                'calculation_method': calculation_method
+            })
                   
         except Exception as e:
             logger.warning(f"Failed to log health metric: {str(e)}")
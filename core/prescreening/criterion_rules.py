@@ -0,0 +1,232 @@
+"""
+Compiled Criterion Rules
+
+Deterministic prescreening evaluation reads numeric bounds, BMI, medication
+classes and washout windows out of criterion_text with regexes. A CriterionRule
+holds everything those evaluations need from a criterion, compiled once per
+criterion rather than once per answer:
+
+- auto_kinds: auto-evaluations tried first ("bmi", "numeric")
+- bound: numeric range / minimum / maximum stated in the text
+- bmi, numeric: whether the BMI and flare/count evaluations apply
+- medication: trial medications, class examples and washout window
+- washout: whether the washout-willingness evaluation applies
+- age_range, presence: parsed_json age bounds and yes/no presence checks
+  (confirmed diagnosis for inclusion, excluded condition for exclusion)
+
+Rules are compiled by GeminiPrescreeningManager.compile_criterion_rule and
+stored in trial_criteria.parsed_json under "rule" when criteria are ingested
+or edited (compile_trial_rules). Each stored rule carries a hash of the
+criterion it was compiled from; a stored rule whose criterion changed since,
+or that predates RULE_VERSION, is ignored and compiled again in memory.
+"""
+
+import re
+import json
+import hashlib
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, Tuple, FrozenSet
+
+from core.database import db
+
+logger = logging.getLogger(__name__)
+
+RULE_VERSION = 1
+
+# Ranges take precedence over minimums, minimums over maximums
+_RANGE_PATTERNS = [
+    re.compile(r'between\s+(\d+\.?\d*)\s+(?:and|to)\s+(\d+\.?\d*)'),
+    re.compile(r'(\d+\.?\d*)\s*(?:to|-)\s*(\d+\.?\d*)'),
+    re.compile(r'≥\s*(\d+\.?\d*)\s*(?:and|to)\s*≤\s*(\d+\.?\d*)'),
+]
+_MIN_PATTERNS = [
+    (re.compile(r'≥\s*(\d+\.?\d*)'), "≥"),
+    (re.compile(r'at least\s+(\d+\.?\d*)'), "≥"),
+    (re.compile(r'minimum\s+(\d+\.?\d*)'), "≥"),
+    (re.compile(r'>\s*(\d+\.?\d*)'), ">"),
+]
+_MAX_PATTERNS = [
+    (re.compile(r'≤\s*(\d+\.?\d*)'), "≤"),
+    (re.compile(r'no more than\s+(\d+\.?\d*)'), "≤"),
+    (re.compile(r'maximum\s+(\d+\.?\d*)'), "≤"),
+    (re.compile(r'<\s*(\d+\.?\d*)'), "<"),
+]
+
+
+@dataclass(frozen=True)
+class NumericBound:
+    """A range ("range"), minimum (">=", ">") or maximum ("<=", "<") from criterion text"""
+    operator: str   # "range", "≥", ">", "≤", "<"
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+    def check(self, value: float) -> Dict[str, Any]:
+        """{eligible, explanation} for a patient value"""
+        if self.operator == "range":
+            if self.min_value <= value <= self.max_value:
+                return {"eligible": True,
+                        "explanation": f"Value {value} is within required range {self.min_value}-{self.max_value}"}
+            return {"eligible": False,
+                    "explanation": f"Value {value} is outside required range {self.min_value}-{self.max_value}"}
+
+        if self.operator in ("≥", ">"):
+            met = value >= self.min_value if self.operator == "≥" else value > self.min_value
+            if met:
+                return {"eligible": True,
+                        "explanation": f"{value} meets minimum requirement of {self.operator}{self.min_value}"}
+            return {"eligible": False,
+                    "explanation": f"{value} does not meet minimum requirement of {self.operator}{self.min_value}"}
+
+        met = value <= self.max_value if self.operator == "≤" else value < self.max_value
+        if met:
+            return {"eligible": True,
+                    "explanation": f"{value} meets maximum requirement of {self.operator}{self.max_value}"}
+        return {"eligible": False,
+                "explanation": f"{value} exceeds maximum requirement of {self.operator}{self.max_value}"}
+
+
+@dataclass(frozen=True)
+class MedicationRule:
+    """Medication/washout details of a criterion"""
+    medications: Tuple[str, ...]   # medications named in the criterion
+    examples: Tuple[str, ...]      # class examples shown to patients, e.g. "Omeprazole (Prilosec)"
+    medication_class: str          # e.g. "proton pump inhibitors", "medications" when unknown
+    washout_period: str            # e.g. "14 days", '' when not stated
+    is_washout_criterion: bool     # mentions washout, naive or willing
+    naive: bool                    # medication-naive criterion
+
+
+@dataclass(frozen=True)
+class CriterionRule:
+    """Everything deterministic evaluation needs from one criterion"""
+    source_hash: str
+    auto_kinds: FrozenSet[str]
+    bound: Optional[NumericBound]
+    bmi: bool
+    numeric: bool
+    medication: Optional[MedicationRule]
+    washout: bool
+    age_range: Optional[Tuple[float, float]]
+    presence: str                  # "diagnosis", "excluded_condition" or ''
+    unparsed: bool
+
+
+def parse_numeric_bound(criterion_text: str) -> Optional[NumericBound]:
+    """The numeric bound stated in a criterion, or None"""
+    text = criterion_text.lower()
+
+    for pattern in _RANGE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return NumericBound("range", float(match.group(1)), float(match.group(2)))
+
+    for pattern, operator in _MIN_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return NumericBound(operator, min_value=float(match.group(1)))
+
+    for pattern, operator in _MAX_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return NumericBound(operator, max_value=float(match.group(1)))
+
+    return None
+
+
+def criterion_source_hash(criterion_type: str, criterion_text: str,
+                          parsed_json: Optional[Dict[str, Any]]) -> str:
+    """Hash of the criterion fields a rule is compiled from (parsed_json minus the rule)"""
+    parsed = {k: v for k, v in (parsed_json or {}).items() if k != "rule"}
+    source = json.dumps([RULE_VERSION, criterion_type, criterion_text, parsed], sort_keys=True, default=str)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def rule_to_json(rule: CriterionRule) -> Dict[str, Any]:
+    data = asdict(rule)
+    data["version"] = RULE_VERSION
+    data["auto_kinds"] = sorted(rule.auto_kinds)
+    return data
+
+
+def rule_from_json(data: Any, source_hash: str) -> Optional[CriterionRule]:
+    """Stored rule, or None when missing, from another version or compiled from a different criterion"""
+    if not isinstance(data, dict) or data.get("version") != RULE_VERSION:
+        return None
+    if data.get("source_hash") != source_hash:
+        return None
+    try:
+        bound = data.get("bound")
+        medication = data.get("medication")
+        age_range = data.get("age_range")
+        return CriterionRule(
+            source_hash=data["source_hash"],
+            auto_kinds=frozenset(data.get("auto_kinds") or ()),
+            bound=NumericBound(**bound) if bound else None,
+            bmi=bool(data.get("bmi")),
+            numeric=bool(data.get("numeric")),
+            medication=MedicationRule(
+                medications=tuple(medication["medications"]),
+                examples=tuple(medication["examples"]),
+                medication_class=medication["medication_class"],
+                washout_period=medication["washout_period"],
+                is_washout_criterion=medication["is_washout_criterion"],
+                naive=medication["naive"]
+            ) if medication else None,
+            washout=bool(data.get("washout")),
+            age_range=tuple(age_range) if age_range else None,
+            presence=data.get("presence") or '',
+            unparsed=bool(data.get("unparsed"))
+        )
+    except (KeyError, TypeError) as e:
+        logger.warning(f"Ignoring malformed stored criterion rule: {e}")
+        return None
+
+
+def stored_rule_is_current(criterion_type: str, criterion_text: str,
+                           parsed_json: Optional[Dict[str, Any]]) -> bool:
+    """Whether parsed_json holds a rule compiled from exactly these criterion fields"""
+    parsed = parsed_json or {}
+    source_hash = criterion_source_hash(criterion_type, criterion_text, parsed)
+    return rule_from_json(parsed.get("rule"), source_hash) is not None
+
+
+def store_rules(rules: Dict[int, CriterionRule]) -> int:
+    """Write compiled rules into trial_criteria.parsed_json["rule"] (one statement)"""
+    if not rules:
+        return 0
+    criterion_ids = list(rules.keys())
+    payloads = [json.dumps(rule_to_json(rules[criterion_id])) for criterion_id in criterion_ids]
+    return db.execute_update("""
+        UPDATE trial_criteria tc
+        SET parsed_json = jsonb_set(COALESCE(tc.parsed_json, '{}'::jsonb), '{rule}', r.rule::jsonb)
+        FROM unnest(%s::int[], %s::text[]) AS r(criterion_id, rule)
+        WHERE tc.id = r.criterion_id
+    """, (criterion_ids, payloads))
+
+
+_compiler = None
+
+
+def compile_trial_rules(trial_id: int) -> int:
+    """
+    Compile and store the rules of every criterion of a trial. Called after
+    criteria are ingested or edited; failures are logged, since evaluation
+    compiles missing or stale rules in memory anyway.
+
+    Returns:
+        Number of criteria updated
+    """
+    global _compiler
+    try:
+        if _compiler is None:
+            from core.prescreening.gemini_prescreening_manager import GeminiPrescreeningManager
+            _compiler = GeminiPrescreeningManager()
+        criteria = _compiler._get_trial_criteria(trial_id, required_only=False)
+        rules = {criterion.id: _compiler.compile_criterion_rule(criterion) for criterion in criteria}
+        updated = store_rules(rules)
+        logger.info(f"Compiled {updated} criterion rules for trial {trial_id}")
+        return updated
+    except Exception as e:
+        logger.error(f"Failed to compile criterion rules for trial {trial_id}: {e}")
+        return 0
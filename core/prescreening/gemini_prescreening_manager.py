@@ -5,15 +5,24 @@ This system uses Gemini to generate natural questions from database criteria,
 parse user responses flexibly, and evaluate eligibility intelligently.
 """
 
+import os
 import json
+import asyncio
 import logging
 import re
-from typing import Dict, List, Any, Optional, Tuple
+import time
+import threading
+from typing import Dict, List, Any, Optional, Tuple, FrozenSet
 from dataclasses import dataclass
 from datetime import datetime
 
 from core.database import db
 from core.services.gemini_service import gemini_service
+from core.chat.answer_parser import AnswerParser
+from core.prescreening.plan_cache import prescreening_plan_cache, PrescreeningPlan
+from core.prescreening.criterion_rules import (
+    CriterionRule, MedicationRule, parse_numeric_bound, criterion_source_hash, rule_from_json
+)
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +75,68 @@ class EligibilityResult:
     summary_text: str
 
 
+class AnswerParseStats:
+    """
+    Counts how prescreening answers were parsed: locally by the deterministic
+    parsers or by Gemini. The latency saved is estimated from the moving
+    average latency of the Gemini parses.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local_by_kind: Dict[str, int] = {}
+        self._gemini = 0
+        self._gemini_latency_ms = 0.0  # exponential moving average
+
+    def record_local(self, kind: str):
+        with self._lock:
+            self._local_by_kind[kind] = self._local_by_kind.get(kind, 0) + 1
+
+    def record_gemini(self, latency_ms: float):
+        with self._lock:
+            self._gemini += 1
+            if self._gemini == 1:
+                self._gemini_latency_ms = latency_ms
+            else:
+                self._gemini_latency_ms += 0.1 * (latency_ms - self._gemini_latency_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            local = sum(self._local_by_kind.values())
+            total = local + self._gemini
+            return {
+                "answers": total,
+                "local": local,
+                "local_by_kind": dict(self._local_by_kind),
+                "gemini": self._gemini,
+                "local_share": round(local / total, 3) if total else 0.0,
+                "avg_gemini_latency_ms": round(self._gemini_latency_ms, 1),
+                "estimated_latency_saved_ms": round(local * self._gemini_latency_ms)
+            }
+
+
+# Singleton instance
+answer_parse_stats = AnswerParseStats()
+
+# Replies that qualify a yes/no ("yes but only once", "no, not sure") go to Gemini
+# Replies that qualify a number ("less than 2", "5+", "like 4 i guess") go to Gemini too
+_HEDGE_PATTERN = re.compile(
+    r"\b(?:but|except|maybe|perhaps|probably|possibly|unsure|not sure|don'?t know|"
+    r"do not know|no idea|yes and no|guess|can'?t remember|kind of|sort of|sometimes|"
+    r"used to|although|though|less than|more than|fewer than|at least|at most|over|under|"
+    r"above|below|or so|like)\b|[?+~<>≥≤-]"
+)
+
+# A yes/no reply accepted locally: one yes/no word plus filler ("yes please", "nope.")
+_YES_NO_REPLY_PATTERN = re.compile(
+    r"^(?:(?:oh|um+|uh+|well|ok|okay)[,\s]+)?"
+    r"(?:yes|yeah|yep|yup|no|nope|nah)"
+    r"(?:[,\s]+(?:thanks|thank you|please|sir|ma'?am))?[.!\s]*$"
+)
+
+_HEIGHT_WEIGHT_PATTERN = re.compile(r"\b(?:bmi|body mass index|height|weight|tall|weigh)\b")
+
+
 class GeminiPrescreeningManager:
     """
     Gemini-powered prescreening manager for clinical trials.
@@ -78,8 +149,15 @@ class GeminiPrescreeningManager:
     
     def __init__(self, api_key: str = None):
         self.gemini = gemini_service
-        
-    def start_prescreening(self, trial_id: int, session_id: str = None, user_id: str = None, condition: str = None, location: str = None) -> Tuple[List[PrescreeningQuestion], str]:
+        # Final-step eligibility: concurrent Gemini evaluations and per-call timeout
+        self._evaluation_concurrency = int(os.getenv("PRESCREENING_EVAL_CONCURRENCY", "4"))
+        self._evaluation_timeout_seconds = float(os.getenv("PRESCREENING_EVAL_TIMEOUT_SECONDS", "20"))
+        # Answer parsing: unambiguous replies are parsed locally, the rest by Gemini
+        self._fast_parse_enabled = os.getenv("PRESCREENING_FAST_PARSE", "true").lower() == "true"
+        self.answer_parser = AnswerParser()
+        
+    def start_prescreening(self, trial_id: int, session_id: str = None, user_id: str = None, condition: str = None, location: str = None,
+                           session_state: Optional[Dict[str, Any]] = None) -> Tuple[List[PrescreeningQuestion], str]:
         """
         Start prescreening for a specific trial and create database session.
         
@@ -89,23 +167,23 @@ class GeminiPrescreeningManager:
             user_id: User identifier
             condition: Medical condition
             location: User location
+            session_state: Optional dict that receives "prescreening_session_id"
+                (the prescreening_sessions.id) for the conversation's prescreening
+                context, so answers can be saved without looking the session up
             
         Returns:
             Tuple of (questions_list, trial_name)
         """
         try:
-            # Get trial info
-            trial_info = self._get_trial_info(trial_id)
-            if not trial_info:
-                raise ValueError(f"Trial {trial_id} not found")
-            
-            # Get required criteria
-            criteria = self._get_trial_criteria(trial_id)
-            if not criteria:
+            # Compiled trial info, criteria and questions (shared across patients)
+            plan = self._get_plan(trial_id)
+            if not plan:
+                if not self._get_trial_info(trial_id):
+                    raise ValueError(f"Trial {trial_id} not found")
                 raise ValueError(f"No criteria found for trial {trial_id}")
             
-            # Generate questions using OpenAI
-            questions = self._generate_questions(criteria, trial_info)
+            trial_info = plan.trial_info
+            questions = list(plan.questions)
             
             # 🔥 CREATE PRESCREENING SESSION IN DATABASE (with duplicate prevention)
             if session_id and user_id:
@@ -139,6 +217,9 @@ class GeminiPrescreeningManager:
                             logger.error(f"Parameters: trial_id={trial_id}, questions={len(questions)}")
                             raise
                     
+                    if session_state is not None:
+                        session_state["prescreening_session_id"] = prescreening_session_id
+                    
                 except Exception as e:
                     logger.error(f"❌ Failed to create/check prescreening session: {str(e)}")
             else:
@@ -153,6 +234,34 @@ class GeminiPrescreeningManager:
             logger.error(f"Error starting prescreening for trial {trial_id}: {str(e)}")
             raise
     
+    def _get_plan(self, trial_id: int) -> Optional[PrescreeningPlan]:
+        """Cached prescreening plan for a trial (None if the trial or its criteria are missing)"""
+        return prescreening_plan_cache.get(trial_id, self._compile_plan)
+    
+    def _compile_plan(self, trial_id: int, generation: int) -> Optional[PrescreeningPlan]:
+        """Load a trial's criteria and generate its questions once for all patients"""
+        trial_info = self._get_trial_info(trial_id)
+        if not trial_info:
+            return None
+        
+        criteria = self._get_trial_criteria(trial_id)
+        if not criteria:
+            return None
+        
+        # Generate questions using OpenAI
+        questions = self._generate_questions(criteria, trial_info)
+        
+        return PrescreeningPlan(
+            trial_id=trial_id,
+            trial_info=trial_info,
+            criteria=tuple(criteria),
+            criteria_by_id={c.id: c for c in criteria},
+            questions=tuple(questions),
+            rules={c.id: self._get_rule(c) for c in criteria},
+            generation=generation,
+            compiled_at=time.time()
+        )
+    
     def _get_trial_info(self, trial_id: int) -> Optional[Dict[str, Any]]:
         """Get basic trial information"""
         try:
@@ -168,15 +277,15 @@ class GeminiPrescreeningManager:
             logger.error(f"Error fetching trial info: {str(e)}")
             return None
     
-    def _get_trial_criteria(self, trial_id: int) -> List[TrialCriterion]:
-        """Get required criteria for a trial with smart ordering"""
+    def _get_trial_criteria(self, trial_id: int, required_only: bool = True) -> List[TrialCriterion]:
+        """Get required (or, with required_only=False, all) criteria for a trial with smart ordering"""
         try:
             logger.info(f"[CRITERIA_FETCH] Fetching required criteria for trial_id={trial_id}")
 
             results = db.execute_query("""
                 SELECT id, trial_id, criterion_type, criterion_text, category, parsed_json, is_required, sort_order
                 FROM trial_criteria
-                WHERE trial_id = %s AND is_required = true
+                WHERE trial_id = %s AND (is_required = true OR NOT %s)
                 ORDER BY 
                     CASE WHEN sort_order > 0 THEN sort_order ELSE 9999 END,
                     CASE 
@@ -198,7 +307,7 @@ class GeminiPrescreeningManager:
                         ELSE 10
                     END,
                     id
-            """, (trial_id,))
+            """, (trial_id, required_only))
 
             logger.info(f"[CRITERIA_FETCH] Found {len(results)} required criteria for trial_id={trial_id}")
 
@@ -438,66 +547,95 @@ For each criterion, determine:
             logger.error(f"Error validating session state: {e}")
             return False
     
-    def save_prescreening_answer(self, session_id: str, user_id: str, question: PrescreeningQuestion, user_answer: str, parsed_answer: PrescreeningAnswer) -> None:
+    def save_prescreening_answer(self, session_id: str, user_id: str, question: PrescreeningQuestion, user_answer: str, parsed_answer: PrescreeningAnswer,
+                                 prescreening_session_id: Optional[int] = None) -> None:
         """
         Save a prescreening answer to the database.
         
+        The answer insert and the answered_questions bump are one statement.
+        
         Args:
             session_id: Conversation session ID
             user_id: User identifier  
             question: The prescreening question that was asked
             user_answer: Raw user response
             parsed_answer: Parsed answer with interpretation
+            prescreening_session_id: prescreening_sessions.id from start_prescreening;
+                looked up by session_id/user_id when not given
         """
         try:
-            # Get trial and condition info from prescreening session
-            session_info = db.execute_query("""
-                SELECT id, trial_id, condition, location FROM prescreening_sessions
-                WHERE session_id = %s AND user_id = %s
-                ORDER BY started_at DESC LIMIT 1
-            """, (session_id, user_id))
-
-            if not session_info:
+            saved = self._insert_prescreening_answers(session_id, user_id, [parsed_answer], prescreening_session_id)
+            if not saved:
                 logger.error(f"❌ No prescreening session found for session {session_id}")
                 return
-
-            prescreening_session_id = session_info[0]['id']
-            trial_id = session_info[0]['trial_id']
-            condition = session_info[0]['condition']
-            location = session_info[0]['location']
-
-            # Save the answer WITH criterion_id and prescreening_session_id
-            db.execute_update("""
-                INSERT INTO prescreening_answers
-                (session_id, prescreening_session_id, criterion_id, trial_id,
-                 question_id, question_text, user_answer, parsed_value,
-                 condition, location)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                session_id,
-                prescreening_session_id,
-                parsed_answer.criterion_id,
-                trial_id,
-                str(parsed_answer.criterion_id),
-                parsed_answer.question_text,
-                parsed_answer.user_response,
-                str(parsed_answer.parsed_value),
-                condition,
-                location
-            ))
-            
-            # Update questions answered count
-            db.execute_update("""
-                UPDATE prescreening_sessions 
-                SET answered_questions = answered_questions + 1
-                WHERE session_id = %s
-            """, (session_id,))
             
             logger.info(f"✅ Saved prescreening answer for session {session_id}: {question.question_text[:50]}...")
             
         except Exception as e:
             logger.error(f"❌ Failed to save prescreening answer: {str(e)}")
     
+    def save_prescreening_answers(self, session_id: str, user_id: str, answers: List[PrescreeningAnswer],
+                                  prescreening_session_id: Optional[int] = None) -> int:
+        """
+        Save several answers of one prescreening session in a single statement
+        (bulk imports, replayed test simulations).
+        
+        Returns:
+            Number of answers saved (0 if the session was not found or on error)
+        """
+        if not answers:
+            return 0
+        try:
+            saved = self._insert_prescreening_answers(session_id, user_id, answers, prescreening_session_id)
+            if not saved:
+                logger.error(f"❌ No prescreening session found for session {session_id}")
+            else:
+                logger.info(f"✅ Saved {saved} prescreening answers for session {session_id}")
+            return saved
+        except Exception as e:
+            logger.error(f"❌ Failed to save prescreening answers: {str(e)}")
+            return 0
+    
+    def _insert_prescreening_answers(self, session_id: str, user_id: str, answers: List[PrescreeningAnswer],
+                                     prescreening_session_id: Optional[int]) -> int:
+        """
+        Insert answers and bump answered_questions of their prescreening session
+        atomically. The session's trial, condition and location are taken from
+        the UPDATE ... RETURNING, so nothing is read beforehand.
+        """
+        return db.execute_update("""
+            WITH ps AS (
+                UPDATE prescreening_sessions
+                SET answered_questions = answered_questions + %s
+                WHERE id = COALESCE(%s, (
+                    SELECT id FROM prescreening_sessions
+                    WHERE session_id = %s AND user_id = %s
+                    ORDER BY started_at DESC LIMIT 1
+                ))
+                RETURNING id, trial_id, condition, location
+            )
+            INSERT INTO prescreening_answers
+            (session_id, prescreening_session_id, criterion_id, trial_id,
+             question_id, question_text, user_answer, parsed_value,
+             condition, location)
+            SELECT %s, ps.id, a.criterion_id, ps.trial_id,
+                   a.criterion_id::text, a.question_text, a.user_answer, a.parsed_value,
+                   ps.condition, ps.location
+            FROM ps
+            CROSS JOIN unnest(%s::int[], %s::text[], %s::text[], %s::text[])
+                AS a(criterion_id, question_text, user_answer, parsed_value)
+        """, (
+            len(answers),
+            prescreening_session_id,
+            session_id,
+            user_id,
+            session_id,
+            [answer.criterion_id for answer in answers],
+            [answer.question_text for answer in answers],
+            [answer.user_response for answer in answers],
+            [str(answer.parsed_value) for answer in answers]
+        ))
+    
     def complete_prescreening_session(self, session_id: str, user_id: str, eligibility_result: str = None) -> None:
         """
         Mark prescreening session as completed.
@@ -1863,84 +2001,8 @@ For each criterion, determine:
     
     def _evaluate_numeric_criterion(self, criterion_text: str, user_value: float) -> Dict[str, Any]:
         """Evaluate numeric criteria like ranges, minimums, maximums"""
-        
-        text = criterion_text.lower()
-        
-        # Range patterns: "between X and Y", "X to Y", "X-Y"
-        range_patterns = [
-            r'between\s+(\d+\.?\d*)\s+(?:and|to)\s+(\d+\.?\d*)',
-            r'(\d+\.?\d*)\s*(?:to|-)\s*(\d+\.?\d*)',
-            r'≥\s*(\d+\.?\d*)\s*(?:and|to)\s*≤\s*(\d+\.?\d*)',
-        ]
-        
-        for pattern in range_patterns:
-            match = re.search(pattern, text)
-            if match:
-                min_val = float(match.group(1))
-                max_val = float(match.group(2))
-                
-                if min_val <= user_value <= max_val:
-                    return {
-                        "eligible": True,
-                        "explanation": f"Value {user_value} is within required range {min_val}-{max_val}"
-                    }
-                else:
-                    return {
-                        "eligible": False,
-                        "explanation": f"Value {user_value} is outside required range {min_val}-{max_val}"
-                    }
-        
-        # Minimum patterns: "≥ X", "at least X", "minimum X"
-        min_patterns = [
-            r'≥\s*(\d+\.?\d*)',
-            r'at least\s+(\d+\.?\d*)',
-            r'minimum\s+(\d+\.?\d*)',
-            r'>\s*(\d+\.?\d*)',
-        ]
-        
-        for pattern in min_patterns:
-            match = re.search(pattern, text)
-            if match:
-                min_val = float(match.group(1))
-                operator = "≥" if "≥" in pattern or "at least" in pattern or "minimum" in pattern else ">"
-                
-                if (operator == "≥" and user_value >= min_val) or (operator == ">" and user_value > min_val):
-                    return {
-                        "eligible": True,
-                        "explanation": f"{user_value} meets minimum requirement of {operator}{min_val}"
-                    }
-                else:
-                    return {
-                        "eligible": False,
-                        "explanation": f"{user_value} does not meet minimum requirement of {operator}{min_val}"
-                    }
-        
-        # Maximum patterns: "≤ X", "no more than X", "maximum X"
-        max_patterns = [
-            r'≤\s*(\d+\.?\d*)',
-            r'no more than\s+(\d+\.?\d*)',
-            r'maximum\s+(\d+\.?\d*)',
-            r'<\s*(\d+\.?\d*)',
-        ]
-        
-        for pattern in max_patterns:
-            match = re.search(pattern, text)
-            if match:
-                max_val = float(match.group(1))
-                operator = "≤" if "≤" in pattern or "no more than" in pattern or "maximum" in pattern else "<"
-                
-                if (operator == "≤" and user_value <= max_val) or (operator == "<" and user_value < max_val):
-                    return {
-                        "eligible": True,
-                        "explanation": f"{user_value} meets maximum requirement of {operator}{max_val}"
-                    }
-                else:
-                    return {
-                        "eligible": False,
-                        "explanation": f"{user_value} exceeds maximum requirement of {operator}{max_val}"
-                    }
-        
-        return None
+        bound = parse_numeric_bound(criterion_text)
+        return bound.check(user_value) if bound else None
     
     def _determine_answer_type(self, criterion: TrialCriterion) -> str:
         """Enhanced answer type detection with better logic"""
@@ -2040,7 +2102,13 @@ For each criterion, determine:
         return ""  # No mismatch
 
     async def parse_answer(self, question: PrescreeningQuestion, user_response: str) -> PrescreeningAnswer:
-        """Parse user response using Gemini"""
+        """Parse user response, locally when unambiguous and otherwise using Gemini"""
+        if self._fast_parse_enabled:
+            fast_answer = self._parse_answer_fast(question, user_response)
+            if fast_answer is not None:
+                return fast_answer
+
+        start = time.time()
         try:
             # Build prompt for Gemini
             prompt = f"""{self._get_answer_parsing_prompt(question)}
@@ -2055,6 +2123,7 @@ Return a JSON object with:
             
             # Use Gemini to parse the response
             result = await self.gemini.extract_json(prompt, "")
+            answer_parse_stats.record_gemini((time.time() - start) * 1000)
             
             if result and "interpretation" in result:
                 return PrescreeningAnswer(
@@ -2073,6 +2142,62 @@ Return a JSON object with:
             logger.error(f"Error parsing answer with Gemini: {str(e)}")
             return self._parse_answer_simple(question, user_response)
     
+    def _parse_answer_fast(self, question: PrescreeningQuestion, user_response: str) -> Optional[PrescreeningAnswer]:
+        """
+        Deterministic parse for unambiguous answers, or None to escalate to Gemini.
+
+        Yes/no answers are accepted only when the reply is a single yes/no word
+        (plus filler), the strict AnswerParser patterns and the loose
+        _validate_yes_no_response check agree, and the reply has no hedging. Numbers are accepted when the reply holds a single number
+        that AnswerParser and _extract_numeric_value both read the same way.
+        Height/weight replies are accepted when both values parse.
+        """
+        text = (user_response or "").lower().strip()
+        if not text or len(text) > 120:
+            return None
+
+        def answer(parsed_value: Any, interpretation: str, confidence: float, kind: str) -> PrescreeningAnswer:
+            answer_parse_stats.record_local(kind)
+            logger.debug(f"ANSWER_PARSE: Local {kind} parse of '{user_response}' -> {parsed_value}")
+            return PrescreeningAnswer(
+                criterion_id=question.criterion_id,
+                question_text=question.question_text,
+                user_response=user_response,
+                parsed_value=parsed_value,
+                interpretation=interpretation,
+                confidence=confidence
+            )
+
+        if question.expected_answer_type == "yes_no":
+            if _HEDGE_PATTERN.search(text) or not _YES_NO_REPLY_PATTERN.match(text):
+                return None
+            strict = self.answer_parser.parse_yes_no(text)
+            if strict is None:
+                return None
+            loose = self._validate_yes_no_response(text, {"is_valid": True}).get("parsed_data") or {}
+            if loose.get("answer") != ("yes" if strict else "no"):
+                return None
+            return answer(strict, "yes" if strict else "no", 0.95, "yes_no")
+
+        if _HEIGHT_WEIGHT_PATTERN.search(question.question_text.lower()):
+            measurements = self._parse_height_weight(user_response)
+            if not (measurements.get("height_cm") and measurements.get("weight_kg")):
+                return None
+            bmi = self._calculate_bmi(measurements["height_cm"], measurements["weight_kg"])
+            if 15 <= bmi <= 60:
+                return answer(round(bmi, 1), "number", 0.9, "height_weight")
+            return None
+
+        if question.expected_answer_type == "number":
+            if _HEDGE_PATTERN.search(text) or len(re.findall(r'\d+(?:\.\d+)?', text)) != 1:
+                return None
+            value = self.answer_parser.parse_number(text)
+            if value is None or value != self._extract_numeric_value(text):
+                return None
+            return answer(int(value) if value.is_integer() else value, "number", 0.9, "number")
+
+        return None
+
     def _get_answer_parsing_prompt(self, question: PrescreeningQuestion) -> str:
         """Get system prompt for answer parsing"""
         return f"""You are parsing user responses to clinical trial prescreening questions.
@@ -2152,32 +2277,33 @@ Be flexible with natural language but confident in your interpretation.
         logger.info(f"ELIGIBILITY_EVAL: Starting evaluation for trial_id={trial_id} with {len(answers)} answers")
         
         try:
-            # Get trial info and criteria
-            trial_info = self._get_trial_info(trial_id)
-            criteria = self._get_trial_criteria(trial_id)
+            # Get trial info and criteria from the compiled plan
+            plan = self._get_plan(trial_id)
+            trial_info = plan.trial_info if plan else (self._get_trial_info(trial_id) or {})
+            criteria_lookup = plan.criteria_by_id if plan else {}
+            rules = plan.rules if plan else {}
+            
+            logger.info(f"ELIGIBILITY_EVAL: Trial info - Name: {trial_info.get('trial_name', 'Unknown')}, Total criteria: {len(criteria_lookup)}")
             
-            logger.info(f"ELIGIBILITY_EVAL: Trial info - Name: {trial_info.get('trial_name', 'Unknown')}, Total criteria: {len(criteria)}")
+            # Pair answers with their criteria (answer order)
+            evaluations = []
+            for answer in answers:
+                criterion = criteria_lookup.get(answer.criterion_id)
+                if not criterion:
+                    logger.warning(f"ELIGIBILITY_EVAL: Criterion {answer.criterion_id} not found for answer: {answer.user_response}")
+                    continue
+                evaluations.append((criterion, answer))
             
-            # Create criteria lookup
-            criteria_lookup = {c.id: c for c in criteria}
+            # Evaluate all answers (Gemini calls run concurrently)
+            results = await self._evaluate_answers(evaluations, rules)
             
-            # Evaluate each answer
             detailed_results = []
             inclusion_met = 0
             inclusion_total = 0
             exclusion_met = 0
             exclusion_total = 0
             
-            for answer in answers:
-                criterion = criteria_lookup.get(answer.criterion_id)
-                if not criterion:
-                    logger.warning(f"ELIGIBILITY_EVAL: Criterion {answer.criterion_id} not found for answer: {answer.user_response}")
-                    continue
-                
-                logger.debug(f"ELIGIBILITY_EVAL: Evaluating {criterion.criterion_type} criterion {criterion.id}: {criterion.criterion_text[:100]}...")
-                
-                # Evaluate this specific answer
-                result = await self._evaluate_single_answer(criterion, answer)
+            for (criterion, answer), result in zip(evaluations, results):
                 detailed_results.append(result)
                 
                 logger.info(f"ELIGIBILITY_EVAL: Criterion {criterion.id} result - Eligible: {result['eligible']}, Status: {result['status']}")
@@ -2233,45 +2359,264 @@ Be flexible with natural language but confident in your interpretation.
             logger.error(f"Error evaluating eligibility: {str(e)}")
             raise
     
-    async def _evaluate_single_answer(self, criterion: TrialCriterion, answer: PrescreeningAnswer) -> Dict[str, Any]:
-        """Evaluate a single answer against a criterion with enhanced auto-evaluation"""
-        try:
-            # Try auto-evaluation first for all criteria types
-            auto_result = self._try_auto_evaluation(criterion, answer)
-            if auto_result:
-                return auto_result
-            
-            # Use Gemini for complex evaluation if auto-evaluation fails
-            if criterion.parsed_json.get("field") == "unparsed":
-                return await self._evaluate_with_gemini(criterion, answer)
-            
-            # Simple evaluation for structured criteria
-            return self._evaluate_simple(criterion, answer)
+    async def _evaluate_answers(self, evaluations: List[Tuple[TrialCriterion, PrescreeningAnswer]],
+                                rules: Optional[Dict[int, CriterionRule]] = None) -> List[Dict[str, Any]]:
+        """
+        Evaluate (criterion, answer) pairs, returning results in the same order.
+        
+        Deterministic evaluations run first; the criteria that need Gemini are
+        then evaluated concurrently (bounded by _evaluation_concurrency), so the
+        final step costs about one LLM round-trip instead of one per criterion.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(evaluations)
+        needs_gemini = []
+        
+        for index, (criterion, answer) in enumerate(evaluations):
+            logger.debug(f"ELIGIBILITY_EVAL: Evaluating {criterion.criterion_type} criterion {criterion.id}: {criterion.criterion_text[:100]}...")
+            try:
+                result = self._evaluate_deterministic(criterion, answer, (rules or {}).get(criterion.id))
+            except Exception as e:
+                logger.error(f"Error evaluating answer: {str(e)}")
+                result = self._evaluation_error_result(criterion, answer, e)
+            if result is None:
+                needs_gemini.append(index)
+            else:
+                results[index] = result
+        
+        if needs_gemini:
+            logger.info(f"ELIGIBILITY_EVAL: {len(evaluations) - len(needs_gemini)} criteria evaluated locally, {len(needs_gemini)} sent to Gemini")
+            semaphore = asyncio.Semaphore(self._evaluation_concurrency)
             
-        except Exception as e:
-            logger.error(f"Error evaluating answer: {str(e)}")
-            return {
-                "criterion_id": criterion.id,
-                "criterion_text": criterion.criterion_text,
-                "user_answer": answer.user_response,
-                "eligible": None,
-                "status": "error",
-                "explanation": f"Error evaluating: {str(e)}"
-            }
+            async def evaluate(index: int):
+                criterion, answer = evaluations[index]
+                async with semaphore:
+                    try:
+                        results[index] = await asyncio.wait_for(
+                            self._evaluate_with_gemini(criterion, answer),
+                            timeout=self._evaluation_timeout_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        logger.warning(f"ELIGIBILITY_EVAL: Gemini evaluation of criterion {criterion.id} timed out after {self._evaluation_timeout_seconds}s")
+                        results[index] = self._needs_review_result(criterion, answer)
+                    except Exception as e:
+                        logger.error(f"Error evaluating answer: {str(e)}")
+                        results[index] = self._evaluation_error_result(criterion, answer, e)
+            
+            await asyncio.gather(*(evaluate(index) for index in needs_gemini))
+        
+        return results
     
-    def _try_auto_evaluation(self, criterion: TrialCriterion, answer: PrescreeningAnswer) -> Dict[str, Any]:
-        """Try to auto-evaluate before falling back to complex logic"""
+    def _evaluate_deterministic(self, criterion: TrialCriterion, answer: PrescreeningAnswer,
+                                rule: Optional[CriterionRule] = None) -> Optional[Dict[str, Any]]:
+        """Evaluate without Gemini; None means the criterion needs Gemini"""
+        if rule is None:
+            rule = self._get_rule(criterion)
+        
+        # Try auto-evaluation first for all criteria types
+        auto_result = self._try_auto_evaluation(criterion, answer, rule)
+        if auto_result:
+            return auto_result
+        
+        # Use Gemini for complex evaluation if auto-evaluation fails
+        if rule.unparsed:
+            return None
+        
+        # Simple evaluation for structured criteria
+        return self._evaluate_simple(criterion, answer, rule)
+    
+    def score_answer_sets(self, trial_id: int, answer_sets: Dict[Any, List[PrescreeningAnswer]]) -> Dict[Any, Dict[str, Any]]:
+        """
+        Deterministically score many answer sets of one trial in one pass, e.g.
+        to re-score historical answers after its criteria change.
+        
+        Rules are compiled once for the trial and identical (criterion, answer)
+        pairs, mostly plain yes/no replies, are evaluated once across all sets.
+        Criteria that would need Gemini count as needs_review.
+        
+        Returns:
+            key -> {overall_status, inclusion_met, inclusion_total,
+                    exclusion_met, exclusion_total, needs_review}
+        """
+        criteria = {c.id: c for c in self._get_trial_criteria(trial_id)}
+        rules = {criterion_id: self._get_rule(c) for criterion_id, c in criteria.items()}
+        evaluated: Dict[Tuple, Dict[str, Any]] = {}
+        
+        scores = {}
+        for key, answers in answer_sets.items():
+            counts = {"inclusion_met": 0, "inclusion_total": 0,
+                      "exclusion_met": 0, "exclusion_total": 0, "needs_review": 0}
+            for answer in answers:
+                criterion = criteria.get(answer.criterion_id)
+                if not criterion:
+                    continue
+                
+                pair = (criterion.id, answer.user_response, answer.interpretation, repr(answer.parsed_value))
+                result = evaluated.get(pair)
+                if result is None:
+                    try:
+                        result = (self._evaluate_deterministic(criterion, answer, rules[criterion.id])
+                                  or self._needs_review_result(criterion, answer))
+                    except Exception as e:
+                        result = self._evaluation_error_result(criterion, answer, e)
+                    evaluated[pair] = result
+                
+                prefix = "inclusion" if criterion.criterion_type == "inclusion" else "exclusion"
+                counts[f"{prefix}_total"] += 1
+                if result["eligible"]:
+                    counts[f"{prefix}_met"] += 1
+                elif result["eligible"] is None:
+                    counts["needs_review"] += 1
+            
+            counts["overall_status"] = self._determine_overall_status(
+                counts["inclusion_met"], counts["inclusion_total"],
+                counts["exclusion_met"], counts["exclusion_total"]
+            )
+            scores[key] = counts
+        
+        logger.info(f"ELIGIBILITY_EVAL: Scored {len(answer_sets)} answer sets for trial {trial_id} ({len(evaluated)} distinct answers evaluated)")
+        return scores
+    
+    def score_historical_answers(self, trial_id: int) -> Dict[int, Dict[str, Any]]:
+        """
+        Re-score every stored prescreening session of a trial against its
+        current criteria, without Gemini. Stored replies are re-parsed with
+        the deterministic answer parsers.
+        
+        Returns:
+            prescreening_session_id -> score (see score_answer_sets), plus the
+            session's stored eligibility_result
+        """
+        rows = db.execute_query("""
+            SELECT pa.prescreening_session_id, pa.criterion_id, pa.question_text,
+                   pa.user_answer, ps.eligibility_result
+            FROM prescreening_answers pa
+            JOIN prescreening_sessions ps ON ps.id = pa.prescreening_session_id
+            WHERE ps.trial_id = %s AND pa.criterion_id IS NOT NULL
+            ORDER BY pa.prescreening_session_id, pa.id
+        """, (trial_id,))
+        
+        criteria = {c.id: c for c in self._get_trial_criteria(trial_id)}
+        answer_types = {criterion_id: self._determine_answer_type(c) for criterion_id, c in criteria.items()}
+        
+        answer_sets: Dict[int, List[PrescreeningAnswer]] = {}
+        stored_results: Dict[int, Optional[str]] = {}
+        for row in rows or []:
+            criterion = criteria.get(row['criterion_id'])
+            if not criterion:
+                continue
+            question = PrescreeningQuestion(
+                criterion_id=criterion.id,
+                question_text=row['question_text'] or criterion.criterion_text,
+                criterion_type=criterion.criterion_type,
+                category=criterion.category,
+                expected_answer_type=answer_types[criterion.id],
+                evaluation_hint=""
+            )
+            user_answer = row['user_answer'] or ""
+            answer = self._parse_answer_fast(question, user_answer) or self._parse_answer_simple(question, user_answer)
+            answer_sets.setdefault(row['prescreening_session_id'], []).append(answer)
+            stored_results[row['prescreening_session_id']] = row['eligibility_result']
+        
+        scores = self.score_answer_sets(trial_id, answer_sets)
+        for session_id, score in scores.items():
+            score["stored_eligibility_result"] = stored_results.get(session_id)
+        return scores
+    
+    def _evaluation_error_result(self, criterion: TrialCriterion, answer: PrescreeningAnswer, error: Exception) -> Dict[str, Any]:
+        return {
+            "criterion_id": criterion.id,
+            "criterion_text": criterion.criterion_text,
+            "user_answer": answer.user_response,
+            "eligible": None,
+            "status": "error",
+            "explanation": f"Error evaluating: {str(error)}"
+        }
+    
+    def _needs_review_result(self, criterion: TrialCriterion, answer: PrescreeningAnswer) -> Dict[str, Any]:
+        return {
+            "criterion_id": criterion.id,
+            "criterion_text": criterion.criterion_text,
+            "user_answer": answer.user_response,
+            "eligible": None,
+            "status": "needs_review",
+            "explanation": f"Answer '{answer.user_response}' for criterion '{criterion.criterion_text}' requires manual review by study staff"
+        }
+    
+    def _get_rule(self, criterion: TrialCriterion) -> CriterionRule:
+        """Stored compiled rule of a criterion, compiling it when missing or stale"""
+        parsed = criterion.parsed_json or {}
+        source_hash = criterion_source_hash(criterion.criterion_type, criterion.criterion_text, parsed)
+        return rule_from_json(parsed.get("rule"), source_hash) or self.compile_criterion_rule(criterion, source_hash)
+    
+    def compile_criterion_rule(self, criterion: TrialCriterion, source_hash: Optional[str] = None) -> CriterionRule:
+        """Compile the deterministic evaluation rule of a criterion (see criterion_rules)"""
+        parsed = criterion.parsed_json or {}
         text = criterion.criterion_text.lower()
         
-        # BMI/Weight auto-evaluation
+        medication = None
+        if any(keyword in text for keyword in ["medication", "therapy", "washout", "naive", "agents"]):
+            medication_class = self._extract_medication_type_from_text(text)
+            medication = MedicationRule(
+                medications=tuple(self._extract_specific_medications_from_text(text)),
+                examples=tuple(self._get_medication_class_examples(medication_class)),
+                medication_class=medication_class,
+                washout_period=self._extract_washout_period_from_text(text),
+                is_washout_criterion=bool(re.search(r'washout|naive|willing', text, re.IGNORECASE)),
+                naive='naive' in text
+            )
+        
+        age_range = None
+        if parsed.get("field") == "age":
+            value = parsed.get("value", [18, 85])
+            if isinstance(value, (list, tuple)) and len(value) == 2:
+                age_range = (value[0], value[1])
+        
+        presence = ''
+        if parsed.get("field") == "diagnosis" and criterion.criterion_type == "inclusion":
+            presence = "diagnosis"
+        elif criterion.criterion_type == "exclusion":
+            presence = "excluded_condition"
+        
+        return CriterionRule(
+            source_hash=source_hash or criterion_source_hash(criterion.criterion_type, criterion.criterion_text, parsed),
+            auto_kinds=self._auto_evaluation_kinds(criterion),
+            bound=parse_numeric_bound(criterion.criterion_text),
+            bmi="bmi" in text or "body mass index" in text or "body weight" in text,
+            numeric=any(keyword in text for keyword in ["flare", "occurrence", "episode", "≥", "≤", "between", "minimum", "maximum"]),
+            medication=medication,
+            washout="washout" in text or "wash-out" in text,
+            age_range=age_range,
+            presence=presence,
+            unparsed=parsed.get("field") == "unparsed"
+        )
+    
+    def _auto_evaluation_kinds(self, criterion: TrialCriterion) -> FrozenSet[str]:
+        """Which auto-evaluations apply to a criterion ("bmi", "numeric")"""
+        text = criterion.criterion_text.lower()
+        kinds = set()
         if "bmi" in text or "body mass index" in text or "body weight" in text:
+            kinds.add("bmi")
+        if any(keyword in text for keyword in ["flare", "occurrence", "episode", "≥", "≤", "between", "minimum", "maximum", "age", "years"]):
+            kinds.add("numeric")
+        return frozenset(kinds)
+    
+    def _try_auto_evaluation(self, criterion: TrialCriterion, answer: PrescreeningAnswer,
+                             rule: Optional[CriterionRule] = None) -> Dict[str, Any]:
+        """Try to auto-evaluate before falling back to complex logic"""
+        if rule is None:
+            rule = self._get_rule(criterion)
+        if not rule.bound:
+            return None  # Both auto-evaluations need a numeric bound
+        
+        # BMI/Weight auto-evaluation
+        if "bmi" in rule.auto_kinds:
             hw_data = self._parse_height_weight(answer.user_response)
             
             if hw_data["height_cm"] and hw_data["weight_kg"]:
                 bmi = self._calculate_bmi(hw_data["height_cm"], hw_data["weight_kg"])
                 
                 if bmi:
-                    bmi_eval = self._evaluate_numeric_criterion(criterion.criterion_text, bmi)
+                    bmi_eval = rule.bound.check(bmi)
                     
                     if bmi_eval:
                         return {
@@ -2284,11 +2629,11 @@ Be flexible with natural language but confident in your interpretation.
                         }
         
         # Numeric auto-evaluation for counts, ranges, ages, etc.
-        if any(keyword in text for keyword in ["flare", "occurrence", "episode", "≥", "≤", "between", "minimum", "maximum", "age", "years"]):
+        if "numeric" in rule.auto_kinds:
             user_value = self._extract_numeric_value(answer.user_response)
             
             if user_value is not None:
-                numeric_eval = self._evaluate_numeric_criterion(criterion.criterion_text, user_value)
+                numeric_eval = rule.bound.check(user_value)
                 
                 if numeric_eval:
                     return {
@@ -2302,13 +2647,14 @@ Be flexible with natural language but confident in your interpretation.
         
         return None  # No auto-evaluation possible
     
-    def _evaluate_simple(self, criterion: TrialCriterion, answer: PrescreeningAnswer) -> Dict[str, Any]:
+    def _evaluate_simple(self, criterion: TrialCriterion, answer: PrescreeningAnswer,
+                         rule: Optional[CriterionRule] = None) -> Dict[str, Any]:
         """Enhanced evaluation for structured criteria with auto-evaluation"""
-        parsed = criterion.parsed_json
-        text = criterion.criterion_text.lower()
+        if rule is None:
+            rule = self._get_rule(criterion)
         
         # Enhanced BMI/Weight evaluation
-        if "bmi" in text or "body mass index" in text or "body weight" in text:
+        if rule.bmi and rule.bound:
             # Try to parse height and weight from user response
             hw_data = self._parse_height_weight(answer.user_response)
             
@@ -2317,7 +2663,7 @@ Be flexible with natural language but confident in your interpretation.
                 
                 if bmi:
                     # Evaluate BMI against criterion
-                    bmi_eval = self._evaluate_numeric_criterion(criterion.criterion_text, bmi)
+                    bmi_eval = rule.bound.check(bmi)
                     
                     if bmi_eval:
                         # Add validation confirmation for edge cases
@@ -2341,22 +2687,18 @@ Be flexible with natural language but confident in your interpretation.
                         }
         
         # Enhanced dynamic medication evaluation based on actual trial criteria
-        if any(keyword in text.lower() for keyword in ["medication", "therapy", "washout", "naive", "agents"]):
+        if rule.medication:
             user_response = answer.user_response.lower().strip()
-            
-            # Extract the medications mentioned in the trial criteria
-            trial_medications = self._extract_specific_medications_from_text(text)
-            medication_class = self._extract_medication_type_from_text(text)
+            medication_class = rule.medication.medication_class
             
             # Check if user mentioned any of the trial-specific medications
             mentioned_trial_meds = []
-            for med in trial_medications:
+            for med in rule.medication.medications:
                 if med.lower() in user_response:
                     mentioned_trial_meds.append(med)
             
             # Also check if user mentioned medications from the examples we showed them
-            medication_examples = self._get_medication_class_examples(medication_class)
-            for example in medication_examples:
+            for example in rule.medication.examples:
                 # Check both the full name and just the drug name (before parentheses)
                 drug_name = example.split('(')[0].strip()
                 if (drug_name.lower() in user_response or 
@@ -2394,8 +2736,8 @@ Be flexible with natural language but confident in your interpretation.
                 }
             elif mentioned_trial_meds and not is_willing and not is_not_willing:
                 # Check if this is a multi-turn medication question scenario
-                washout_period = self._extract_washout_period_from_text(text)
-                is_washout_criterion = bool(washout_period or re.search(r'washout|naive|willing', text, re.IGNORECASE))
+                washout_period = rule.medication.washout_period
+                is_washout_criterion = bool(washout_period or rule.medication.is_washout_criterion)
                 
                 if is_washout_criterion and washout_period:
                     # Generate follow-up question for willingness to stop
@@ -2451,9 +2793,8 @@ Be flexible with natural language but confident in your interpretation.
                 }
             elif any(phrase in user_response for phrase in ["no", "none", "not taking", "don't take"]):
                 # Check if this is a medication naive criterion (good outcome)
-                is_washout_criterion = bool(re.search(r'washout|naive|willing', text, re.IGNORECASE))
-                if is_washout_criterion:
-                    if 'naive' in text.lower():
+                if rule.medication.is_washout_criterion:
+                    if rule.medication.naive:
                         explanation = f"User is not taking {medication_class} (medication-naive)"
                     else:
                         explanation = f"User is not taking {medication_class} - no washout required"
@@ -2471,9 +2812,9 @@ Be flexible with natural language but confident in your interpretation.
                 }
         
         # Enhanced washout evaluation for any medication type
-        if "washout" in text or "wash-out" in text:
+        if rule.washout:
             user_response = answer.user_response.lower().strip()
-            medication_type = self._extract_medication_type_from_text(text)
+            medication_type = rule.medication.medication_class if rule.medication else self._extract_medication_type_from_text(criterion.criterion_text.lower())
             
             # More nuanced evaluation for washout questions
             if any(phrase in user_response for phrase in ["yes, willing", "yes willing", "will stop", "can stop", "yes, i would", "yes i would"]):
@@ -2495,7 +2836,7 @@ Be flexible with natural language but confident in your interpretation.
                     "explanation": f"User is not willing to undergo required washout period for {medication_type}"
                 }
             elif user_response == "yes":
-                washout_period = self._extract_washout_period_from_text(text)
+                washout_period = rule.medication.washout_period if rule.medication else self._extract_washout_period_from_text(criterion.criterion_text.lower())
                 return {
                     "criterion_id": criterion.id,
                     "criterion_text": criterion.criterion_text,
@@ -2506,11 +2847,11 @@ Be flexible with natural language but confident in your interpretation.
                 }
         
         # Enhanced numeric evaluation for flares, counts, ranges
-        if any(keyword in text for keyword in ["flare", "occurrence", "episode", "≥", "≤", "between", "minimum", "maximum"]):
+        if rule.numeric and rule.bound:
             user_value = self._extract_numeric_value(answer.user_response)
             
             if user_value is not None:
-                numeric_eval = self._evaluate_numeric_criterion(criterion.criterion_text, user_value)
+                numeric_eval = rule.bound.check(user_value)
                 
                 if numeric_eval:
                     return {
@@ -2523,8 +2864,8 @@ Be flexible with natural language but confident in your interpretation.
                     }
         
         # Age evaluation (existing logic)
-        if parsed.get("field") == "age" and answer.interpretation == "number":
-            age_range = parsed.get("value", [18, 85])
+        if rule.age_range and answer.interpretation == "number":
+            age_range = rule.age_range
             user_age = answer.parsed_value
             
             if isinstance(user_age, int) and age_range[0] <= user_age <= age_range[1]:
@@ -2547,7 +2888,7 @@ Be flexible with natural language but confident in your interpretation.
                 }
         
         # Diagnosis evaluation
-        if parsed.get("field") == "diagnosis" and criterion.criterion_type == "inclusion":
+        if rule.presence == "diagnosis":
             if answer.interpretation == "yes":
                 return {
                     "criterion_id": criterion.id,
@@ -2568,7 +2909,7 @@ Be flexible with natural language but confident in your interpretation.
                 }
         
         # Exclusion criteria evaluation
-        if criterion.criterion_type == "exclusion":
+        if rule.presence == "excluded_condition":
             if answer.interpretation == "yes":
                 return {
                     "criterion_id": criterion.id,
@@ -2644,14 +2985,7 @@ Return a JSON object with:
             logger.error(f"Error in Gemini evaluation: {str(e)}")
         
         # Fallback with more descriptive explanation
-        return {
-            "criterion_id": criterion.id,
-            "criterion_text": criterion.criterion_text,
-            "user_answer": answer.user_response,
-            "eligible": None,
-            "status": "needs_review",
-            "explanation": f"Answer '{answer.user_response}' for criterion '{criterion.criterion_text}' requires manual review by study staff"
-        }
+        return self._needs_review_result(criterion, answer)
     
     def _determine_overall_status(self, inclusion_met: int, inclusion_total: int, 
                                  exclusion_met: int, exclusion_total: int) -> str:
@@ -0,0 +1,141 @@
+"""
+Prescreening Plan Cache
+
+A prescreening plan is everything about a trial that prescreening needs and
+that does not depend on the patient: trial info, the ordered required
+criteria, the generated questions (with answer types) and the compiled
+evaluation rule of each criterion (core/prescreening/criterion_rules.py).
+Compiling it costs a trial query, the ordered trial_criteria query and the
+regex-heavy question generation, so plans are compiled once per trial and
+shared by every patient who screens for it.
+
+Each plan is stamped with the plan cache generation it was compiled under.
+The generation moves when the trial catalog generation does (trial edits and
+protocol uploads call trial_catalog.invalidate()) and when the
+prescreening_plans data version does (core/services/data_versions.py, bumped
+by triggers on clinical_trials and trial_criteria), so trial and criteria
+edits made by any worker take effect within the version check interval.
+Criteria editors also call invalidate(trial_id) for an immediate local
+effect. The TTL bounds staleness before the data_versions migration is applied.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, Callable
+
+from core.services.trial_catalog import trial_catalog
+from core.services.data_versions import data_versions, PRESCREENING_PLANS_SCOPE
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PrescreeningPlan:
+    """Compiled, patient-independent prescreening data for one trial"""
+    trial_id: int
+    trial_info: Dict[str, Any]
+    criteria: Tuple[Any, ...]               # TrialCriterion, in question order
+    criteria_by_id: Dict[int, Any]
+    questions: Tuple[Any, ...]              # PrescreeningQuestion
+    rules: Dict[int, Any]                   # criterion_id -> CriterionRule
+    generation: int                         # PrescreeningPlanCache.generation
+    compiled_at: float
+
+
+class PrescreeningPlanCache:
+    """LRU of compiled plans keyed by trial id, validated by generation and TTL"""
+
+    def __init__(self, max_plans: int = 200, ttl_seconds: int = 600):
+        self.max_plans = max_plans
+        self.ttl_seconds = ttl_seconds
+        self._plans: "OrderedDict[int, PrescreeningPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._sources: Optional[Tuple[int, int]] = None  # (catalog generation, data version)
+        self._generation_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "compiles": 0, "compile_errors": 0, "stale": 0}
+
+    @property
+    def generation(self) -> int:
+        """Bumped when trial data or criteria changed in this or any other worker"""
+        sources = (trial_catalog.generation, data_versions.get(PRESCREENING_PLANS_SCOPE))
+        with self._generation_lock:
+            if sources != self._sources:
+                self._sources = sources
+                self._generation += 1
+            return self._generation
+
+    def _is_fresh(self, plan: PrescreeningPlan, generation: int) -> bool:
+        return (plan.generation == generation and
+                time.time() - plan.compiled_at < self.ttl_seconds)
+
+    def get(self, trial_id: int,
+            compile_plan: Callable[[int, int], Optional[PrescreeningPlan]]) -> Optional[PrescreeningPlan]:
+        """
+        Cached plan for trial_id, compiling it when missing or stale.
+
+        Args:
+            trial_id: Trial to get the plan for
+            compile_plan: (trial_id, generation) -> plan, or None if the trial
+                has no usable criteria (not cached)
+        """
+        # Captured before compiling so an edit during the compile is not masked
+        generation = self.generation
+        with self._lock:
+            plan = self._plans.get(trial_id)
+            if plan is not None:
+                if self._is_fresh(plan, generation):
+                    self._plans.move_to_end(trial_id)
+                    self._stats["hits"] += 1
+                    return plan
+                del self._plans[trial_id]
+                self._stats["stale"] += 1
+            self._stats["misses"] += 1
+
+        try:
+            plan = compile_plan(trial_id, generation)
+        except Exception as e:
+            self._stats["compile_errors"] += 1
+            logger.error(f"Failed to compile prescreening plan for trial {trial_id}: {e}")
+            return None
+        if plan is None:
+            return None
+
+        self._stats["compiles"] += 1
+        with self._lock:
+            self._plans[trial_id] = plan
+            self._plans.move_to_end(trial_id)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        logger.info(f"Compiled prescreening plan for trial {trial_id}: {len(plan.criteria)} criteria, {len(plan.questions)} questions")
+        return plan
+
+    def invalidate(self, trial_id: Optional[int] = None):
+        """Drop one trial's plan (or all plans)"""
+        with self._lock:
+            if trial_id is None:
+                self._plans.clear()
+            else:
+                self._plans.pop(trial_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "plans": len(self._plans),
+            "max_plans": self.max_plans,
+            "ttl_seconds": self.ttl_seconds,
+            "generation": self._generation,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self._stats
+        }
+
+
+# Singleton instance
+prescreening_plan_cache = PrescreeningPlanCache(
+    max_plans=int(os.getenv("PRESCREENING_PLAN_CACHE_MAX", "200")),
+    ttl_seconds=int(os.getenv("PRESCREENING_PLAN_TTL_SECONDS", "600"))
+)
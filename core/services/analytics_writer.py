@@ -0,0 +1,198 @@
+"""
+Buffered Analytics Writer
+
+Background sink for fire-and-forget inserts (search analytics, health metrics,
+outbound SMS logs, protocol comparison logs) so they stay off the request path:
+
+- enqueue() only appends to a bounded in-memory queue and never blocks; when
+  the queue is full the event is dropped and counted
+- a daemon thread drains the queue every flush interval or once a batch is
+  full, writing one multi-row INSERT per table
+- flush() / close() write out whatever is queued (called on app shutdown)
+
+Rows that need JSON encoding can name json_columns; they are serialized on
+the writer thread rather than by the caller.
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+from core.database import db
+
+logger = logging.getLogger(__name__)
+
+# (table, columns, json_columns) -> rows share one INSERT statement
+_BatchKey = Tuple[str, Tuple[str, ...], Tuple[str, ...]]
+
+
+class AnalyticsWriter:
+    """Bounded queue drained by a background thread with multi-row inserts"""
+
+    def __init__(self, max_queue: int = 10000, flush_interval_seconds: float = 0.5,
+                 batch_size: int = 200, enabled: bool = True):
+        self.max_queue = max_queue
+        self.flush_interval_seconds = flush_interval_seconds
+        self.batch_size = batch_size
+        self.enabled = enabled
+
+        self._queue: "queue.Queue[Tuple[_BatchKey, tuple]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "written": 0,
+            "batches": 0,
+            "write_errors": 0
+        }
+
+    def enqueue(self, table: str, row: Dict[str, Any], json_columns: Iterable[str] = ()) -> bool:
+        """
+        Queue one row for insertion.
+
+        Args:
+            table: Target table
+            row: Column -> value
+            json_columns: Columns whose values are JSON-encoded before insert
+
+        Returns:
+            False if the row was dropped (queue full or writer closed)
+        """
+        columns = tuple(row)
+        key = (table, columns, tuple(c for c in json_columns if c in row))
+        values = tuple(row[column] for column in columns)
+
+        if not self.enabled:
+            self._write(key, [values])
+            return True
+        if self._stop.is_set():
+            self._stats["dropped"] += 1
+            return False
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((key, values))
+        except queue.Full:
+            self._stats["dropped"] += 1
+            if self._stats["dropped"] % 1000 == 1:
+                logger.warning(f"⚠️ Analytics queue full ({self.max_queue}), dropped {self._stats['dropped']} events so far")
+            return False
+        self._stats["enqueued"] += 1
+        return True
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.flush_interval_seconds
+            batch = []
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+
+    def _drain(self) -> List[Tuple[_BatchKey, tuple]]:
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _write_batch(self, items: List[Tuple[_BatchKey, tuple]]):
+        grouped: Dict[_BatchKey, List[tuple]] = {}
+        for key, values in items:
+            grouped.setdefault(key, []).append(values)
+        with self._write_lock:
+            for key, rows in grouped.items():
+                for i in range(0, len(rows), self.batch_size):
+                    self._write(key, rows[i:i + self.batch_size])
+
+    def _write(self, key: _BatchKey, rows: List[tuple]):
+        table, columns, json_columns = key
+        if json_columns:
+            json_indexes = [columns.index(column) for column in json_columns]
+            rows = [
+                tuple(json.dumps(value, default=str) if i in json_indexes and value is not None else value
+                      for i, value in enumerate(row))
+                for row in rows
+            ]
+
+        row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([row_sql] * len(rows))
+        params = tuple(value for row in rows for value in row)
+        try:
+            db.execute_update(query, params)
+            self._stats["written"] += len(rows)
+            self._stats["batches"] += 1
+        except Exception as e:
+            if len(rows) == 1:
+                self._stats["write_errors"] += 1
+                logger.warning(f"Failed to write {table} row: {str(e)}")
+                return
+            # One bad row must not cost the whole batch: retry row by row
+            logger.warning(f"Batch insert of {len(rows)} {table} rows failed, retrying individually: {str(e)}")
+            for row in rows:
+                self._write((table, columns, ()), [row])
+
+    def flush(self) -> int:
+        """
+        Write everything currently queued.
+
+        Returns:
+            Number of rows taken off the queue
+        """
+        items = self._drain()
+        if items:
+            self._write_batch(items)
+        return len(items)
+
+    def close(self, timeout: float = 5.0) -> int:
+        """Stop the writer thread and flush the remaining queue (app shutdown)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        flushed = self.flush()
+        if flushed:
+            logger.info(f"💾 Flushed {flushed} queued analytics rows on shutdown")
+        return flushed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and write counters for health endpoints"""
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "flush_interval_seconds": self.flush_interval_seconds,
+            "batch_size": self.batch_size,
+            "running": self._thread is not None and self._thread.is_alive(),
+            **self._stats
+        }
+
+
+# Singleton instance
+analytics_writer = AnalyticsWriter(
+    max_queue=int(os.getenv("ANALYTICS_QUEUE_MAX", "10000")),
+    flush_interval_seconds=float(os.getenv("ANALYTICS_FLUSH_INTERVAL_MS", "500")) / 1000,
+    batch_size=int(os.getenv("ANALYTICS_BATCH_SIZE", "200")),
+    enabled=os.getenv("ANALYTICS_BUFFERED", "true").lower() == "true"
+)
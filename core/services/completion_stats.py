@@ -0,0 +1,184 @@
+"""
+Prescreening Completion Statistics
+
+Rolling 45-day completion counts per trial, used by MultiTrialCompletionSelector
+to pick between trials at the same location. The database keeps daily counts
+per (trial, condition, location) current through a trigger on
+prescreening_sessions (database_migrations/add_trial_completion_stats.sql);
+this module holds an in-memory rollup of those counts, grouped by trial, so
+scoring k candidate trials is a dictionary lookup per trial rather than an
+aggregate query in the middle of a chat turn.
+
+The rollup is reloaded synchronously by the first read after the refresh
+interval; while that request thread reloads, other readers keep using the
+previous rollup. A failed load keeps the previous rollup (empty on a cold
+start) until the next interval. Before the migration is applied the rollup is
+built from prescreening_sessions directly.
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+
+from core.database import db
+
+logger = logging.getLogger(__name__)
+
+LOOKBACK_DAYS = 45
+
+
+@dataclass(frozen=True)
+class CompletionCounts:
+    """Session counts of one trial for one (condition, location) pair"""
+    condition: str   # lowercase, '' when unknown
+    location: str    # lowercase, '' when unknown
+    total_sessions: int
+    completed_sessions: int
+    abandoned_sessions: int
+
+
+class CompletionStats:
+    """In-memory rollup: trial_id -> [CompletionCounts, ...]"""
+
+    def __init__(self, refresh_seconds: int = 60, lookback_days: int = LOOKBACK_DAYS):
+        self.refresh_seconds = refresh_seconds
+        self.lookback_days = lookback_days
+        self._rollup: Optional[Dict[int, Tuple[CompletionCounts, ...]]] = None
+        self._loaded_at = 0.0
+        self._load_lock = threading.Lock()
+        self._use_daily_table = True
+        self._stats = {"loads": 0, "load_errors": 0, "last_load_ms": 0.0}
+
+    def _current(self) -> Dict[int, Tuple[CompletionCounts, ...]]:
+        rollup = self._rollup
+        if rollup is not None and time.time() - self._loaded_at < self.refresh_seconds:
+            return rollup
+
+        # Only one thread reloads; others keep using the previous rollup
+        if not self._load_lock.acquire(blocking=rollup is None):
+            return rollup
+        try:
+            if self._rollup is not rollup and self._rollup is not None:
+                return self._rollup
+            return self._load() or rollup or {}
+        finally:
+            self._load_lock.release()
+
+    def _load(self) -> Optional[Dict[int, Tuple[CompletionCounts, ...]]]:
+        start = time.time()
+        try:
+            rows = self._query()
+        except Exception as e:
+            self._stats["load_errors"] += 1
+            # Keep serving the previous (or an empty) rollup and retry after the
+            # refresh interval instead of on every call
+            if self._rollup is None:
+                self._rollup = {}
+            self._loaded_at = time.time()
+            logger.error(f"Failed to load completion stats: {e}")
+            return None
+
+        rollup: Dict[int, List[CompletionCounts]] = {}
+        for row in rows or []:
+            rollup.setdefault(row['trial_id'], []).append(CompletionCounts(
+                condition=row['condition_key'] or '',
+                location=row['location_key'] or '',
+                total_sessions=int(row['total_sessions'] or 0),
+                completed_sessions=int(row['completed_sessions'] or 0),
+                abandoned_sessions=int(row['abandoned_sessions'] or 0)
+            ))
+        self._rollup = {trial_id: tuple(counts) for trial_id, counts in rollup.items()}
+        self._loaded_at = time.time()
+
+        elapsed_ms = (time.time() - start) * 1000
+        self._stats["loads"] += 1
+        self._stats["last_load_ms"] = round(elapsed_ms, 1)
+        logger.info(f"Loaded completion stats for {len(self._rollup)} trials in {elapsed_ms:.0f}ms")
+        return self._rollup
+
+    def _query(self) -> List[Dict[str, Any]]:
+        try:
+            rows = db.execute_query("""
+                SELECT trial_id, condition_key, location_key,
+                       SUM(total_sessions) AS total_sessions,
+                       SUM(completed_sessions) AS completed_sessions,
+                       SUM(abandoned_sessions) AS abandoned_sessions
+                FROM trial_completion_daily
+                WHERE day >= CURRENT_DATE - %s
+                GROUP BY trial_id, condition_key, location_key
+                HAVING SUM(total_sessions) > 0
+            """, (self.lookback_days,))
+            self._use_daily_table = True
+            return rows
+        except Exception as e:
+            if self._use_daily_table:
+                logger.warning(f"trial_completion_daily unavailable, aggregating prescreening_sessions: {e}")
+            self._use_daily_table = False
+
+        return db.execute_query("""
+            SELECT trial_id,
+                   COALESCE(LOWER(condition), '') AS condition_key,
+                   COALESCE(LOWER(location), '') AS location_key,
+                   COUNT(*) AS total_sessions,
+                   COUNT(*) FILTER (WHERE status = 'completed') AS completed_sessions,
+                   COUNT(*) FILTER (WHERE status = 'abandoned') AS abandoned_sessions
+            FROM prescreening_sessions
+            WHERE trial_id IS NOT NULL
+              AND started_at >= NOW() - %s * INTERVAL '1 day'
+            GROUP BY 1, 2, 3
+        """, (self.lookback_days,))
+
+    def completion_rates(self, trial_ids: List[int], condition: Optional[str] = None,
+                         location: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Completion figures for each trial that has sessions.
+
+        Sessions count when their condition contains condition and their
+        location is unknown or contains location (case-insensitive), as in the
+        original prescreening_sessions query.
+
+        Returns:
+            trial_id -> {total_sessions, completed_sessions, abandoned_sessions, completion_rate}
+        """
+        rollup = self._current()
+        condition = (condition or '').lower()
+        location = (location or '').lower()
+
+        results = {}
+        for trial_id in trial_ids:
+            total = completed = abandoned = 0
+            for counts in rollup.get(trial_id, ()):
+                if condition not in counts.condition:
+                    continue
+                if counts.location and location not in counts.location:
+                    continue
+                total += counts.total_sessions
+                completed += counts.completed_sessions
+                abandoned += counts.abandoned_sessions
+            if total > 0:
+                results[trial_id] = {
+                    'trial_id': trial_id,
+                    'total_sessions': total,
+                    'completed_sessions': completed,
+                    'abandoned_sessions': abandoned,
+                    'completion_rate': round(completed / total * 100, 1)
+                }
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        rollup = self._rollup
+        return {
+            "trials": len(rollup) if rollup is not None else 0,
+            "age_seconds": round(time.time() - self._loaded_at, 1) if rollup is not None else None,
+            "source": "trial_completion_daily" if self._use_daily_table else "prescreening_sessions",
+            **self._stats
+        }
+
+
+# Singleton instance
+completion_stats = CompletionStats(
+    refresh_seconds=int(os.getenv("COMPLETION_STATS_REFRESH_SECONDS", "60"))
+)
@@ -0,0 +1,212 @@
+"""
+Multi-pattern condition matcher.
+
+Compiles every known condition name - the trial conditions from
+ConditionRegistry.get_all_conditions() plus the abbreviation and synonym maps of
+ConditionNormalizer - into one Aho-Corasick automaton, so all condition
+mentions in a message are found in a single pass over its characters instead
+of one substring scan per known condition.
+
+The automaton is built lazily and rebuilt after ConditionRegistry.refresh_cache().
+"""
+
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Match kinds, in order of preference when the same text is several kinds
+KIND_CONDITION = "condition"      # trial condition (or registry variant) from the database
+KIND_SYNONYM = "synonym"          # synonym / canonical name from ConditionNormalizer
+KIND_ABBREVIATION = "abbreviation"  # abbreviation from ConditionNormalizer
+KIND_PRIORITY = {KIND_CONDITION: 0, KIND_SYNONYM: 1, KIND_ABBREVIATION: 2}
+
+
+@dataclass(frozen=True)
+class ConditionMatch:
+    """A condition mention; start/end index into text.lower()"""
+    canonical: str
+    matched: str
+    start: int
+    end: int
+    kind: str
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over lowercase strings"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, object]]):
+        # Node i: transitions[i] (char -> node), fail[i], outputs[i] [(length, payload)]
+        self._transitions: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, object]]] = [[]]
+        self._size = 0
+
+        for pattern, payload in patterns:
+            if pattern:
+                self._add(pattern, payload)
+        self._link()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _add(self, pattern: str, payload: object):
+        node = 0
+        for char in pattern:
+            next_node = self._transitions[node].get(char)
+            if next_node is None:
+                next_node = len(self._transitions)
+                self._transitions[node][char] = next_node
+                self._transitions.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append((len(pattern), payload))
+        self._size += 1
+
+    def _link(self):
+        """Breadth-first failure links; outputs are merged along them"""
+        queue = deque(self._transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._transitions[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._transitions[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._transitions[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def iter_matches(self, text: str):
+        """Yield (start, end, payload) for every pattern occurrence, in end order"""
+        transitions, fail, outputs = self._transitions, self._fail, self._outputs
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in transitions[node]:
+                node = fail[node]
+            node = transitions[node].get(char, 0)
+            for length, payload in outputs[node]:
+                yield index + 1 - length, index + 1, payload
+
+
+def _is_boundary(text: str, start: int, end: int) -> bool:
+    """Whether text[start:end] is not embedded in a longer word"""
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not before.isalnum() and not after.isalnum()
+
+
+class ConditionMatcher:
+    """Shared condition automaton used by the registry and the entity extractors"""
+
+    def __init__(self):
+        # (automaton, registry conditions joined by newlines), swapped as one reference
+        self._compiled: Optional[Tuple[AhoCorasick, str]] = None
+        self._lock = threading.Lock()
+
+    def _ensure_built(self) -> Tuple[AhoCorasick, str]:
+        compiled = self._compiled
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = self._build()
+            return self._compiled
+
+    def _build(self) -> Tuple[AhoCorasick, str]:
+        from core.services.condition_registry import condition_registry
+        from core.services.condition_normalizer import condition_normalizer
+
+        # pattern -> (canonical, kind); the first (most authoritative) kind wins
+        entries: Dict[str, Tuple[str, str]] = {}
+
+        conditions = condition_registry.get_all_conditions()
+        for condition in conditions:
+            entries.setdefault(condition, (condition, KIND_CONDITION))
+
+        for canonical, synonyms in condition_normalizer.condition_synonyms.items():
+            entries.setdefault(canonical.lower(), (canonical, KIND_SYNONYM))
+            for synonym in synonyms:
+                synonym = synonym.lower()
+                kind = KIND_ABBREVIATION if synonym in condition_normalizer.abbreviation_map else KIND_SYNONYM
+                entries.setdefault(synonym, (canonical, kind))
+
+        for abbreviation, expanded in condition_normalizer.abbreviation_map.items():
+            canonical = condition_normalizer.synonym_to_canonical.get(expanded, expanded)
+            entries.setdefault(abbreviation, (canonical, KIND_ABBREVIATION))
+            entries.setdefault(expanded, (canonical, KIND_SYNONYM))
+
+        automaton = AhoCorasick(
+            (pattern, (pattern, canonical, kind)) for pattern, (canonical, kind) in entries.items()
+        )
+        logger.info(f"Built condition matcher with {len(automaton)} patterns")
+        return automaton, "\n".join(sorted(conditions))
+
+    def invalidate(self):
+        """Drop the automaton so the next lookup rebuilds it from current data"""
+        with self._lock:
+            self._compiled = None
+
+    def find_all(self, text: str, whole_words: bool = True,
+                 kinds: Optional[Tuple[str, ...]] = None) -> List[ConditionMatch]:
+        """
+        Every condition mention in text, in order of position.
+
+        Args:
+            text: Message text
+            whole_words: Ignore matches embedded in a longer word ("ra" in "brain")
+            kinds: Restrict to these match kinds (default: all)
+        """
+        if not text:
+            return []
+        automaton, _ = self._ensure_built()
+        text_lower = text.lower()
+
+        matches = []
+        for start, end, (pattern, canonical, kind) in automaton.iter_matches(text_lower):
+            if kinds is not None and kind not in kinds:
+                continue
+            if whole_words and not _is_boundary(text_lower, start, end):
+                continue
+            matches.append(ConditionMatch(canonical, pattern, start, end, kind))
+        matches.sort(key=lambda m: (m.start, -(m.end - m.start)))
+        return matches
+
+    def find_longest(self, text: str, whole_words: bool = True,
+                     kinds: Optional[Tuple[str, ...]] = None) -> List[ConditionMatch]:
+        """Non-overlapping mentions, preferring the longest at each position"""
+        selected = []
+        last_end = -1
+        for match in self.find_all(text, whole_words, kinds):
+            if match.start >= last_end:
+                selected.append(match)
+                last_end = match.end
+        return selected
+
+    def best_match(self, text: str, whole_words: bool = True,
+                   kinds: Optional[Tuple[str, ...]] = None) -> Optional[ConditionMatch]:
+        """Longest mention in text (database conditions win ties), or None"""
+        matches = self.find_all(text, whole_words, kinds)
+        if not matches:
+            return None
+        return min(matches, key=lambda m: (-(m.end - m.start), KIND_PRIORITY[m.kind], m.start))
+
+    def contains_condition(self, text: str, whole_words: bool = True,
+                           kinds: Optional[Tuple[str, ...]] = None) -> bool:
+        """Whether text mentions any known condition"""
+        return self.best_match(text, whole_words, kinds) is not None
+
+    def is_part_of_condition(self, text: str) -> bool:
+        """Whether text occurs inside some database condition name"""
+        if not text or "\n" in text:
+            return False
+        _, corpus = self._ensure_built()
+        return text.lower() in corpus
+
+
+# Shared by ConditionRegistry, EntityExtractor and AnswerParser
+condition_matcher = ConditionMatcher()
@@ -82,10 +82,13 @@ class ConditionRegistry:
         if text_lower in all_conditions:
             return True
         
-        # Check if any known condition is contained in the text
-        for condition in all_conditions:
-            if condition in text_lower or text_lower in condition:
-                return True
+        # Check if any known condition is contained in the text, or the text in a condition
+        # (one automaton pass / one corpus search instead of a scan per condition)
+        from core.services.condition_matcher import condition_matcher, KIND_CONDITION
+        if condition_matcher.contains_condition(text_lower, whole_words=False, kinds=(KIND_CONDITION,)):
+            return True
+        if condition_matcher.is_part_of_condition(text_lower):
+            return True
         
         # Check for medical-sounding patterns
         medical_patterns = [
@@ -174,6 +177,8 @@ class ConditionRegistry:
         """Force refresh of the conditions cache"""
         self.get_all_conditions.cache_clear()
         self._normalized_cache.clear()
+        from core.services.condition_matcher import condition_matcher
+        condition_matcher.invalidate()
         logger.info("Condition registry cache refreshed")
 
 
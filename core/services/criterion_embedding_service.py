@@ -55,6 +55,51 @@ class CriterionEmbeddingService:
             logger.error(f"Error generating embedding for criterion {criterion_id}: {e}")
             return False
 
+    async def generate_and_store_embeddings(self, criteria: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Generate and store embeddings for many criteria using batched embedding calls
+
+        criteria: [{'id': ..., 'criterion_text': ...}, ...]
+        Returns: {'generated': n, 'errors': {criterion_id: message}}
+        """
+        if not criteria:
+            return {"generated": 0, "errors": {}}
+
+        result = await gemini_service.generate_embeddings_batch(
+            [c['criterion_text'] or '' for c in criteria]
+        )
+
+        errors = {criteria[index]['id']: message for index, message in result["errors"].items()}
+        rows = [
+            (criterion['id'], embedding)
+            for criterion, embedding in zip(criteria, result["embeddings"])
+            if embedding is not None
+        ]
+
+        # One UPDATE per chunk instead of one round-trip per criterion
+        stored = 0
+        chunk_size = 100
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            values_sql = ", ".join(["(%s, %s)"] * len(chunk))
+            params = tuple(value for row in chunk for value in row)
+            try:
+                stored += db.execute_update(f"""
+                    UPDATE trial_criteria tc
+                    SET semantic_embedding = v.embedding::vector,
+                        embedding_generated_at = CURRENT_TIMESTAMP,
+                        embedding_version = 'text-embedding-004'
+                    FROM (VALUES {values_sql}) AS v(id, embedding)
+                    WHERE tc.id = v.id
+                """, params)
+            except Exception as e:
+                logger.error(f"Error storing embedding chunk: {e}")
+                for criterion_id, _ in chunk:
+                    errors[criterion_id] = f"store failed: {e}"
+
+        logger.info(f"✅ Generated {stored}/{len(criteria)} criterion embeddings ({len(errors)} errors)")
+        return {"generated": stored, "errors": errors}
+
     async def generate_embeddings_for_trial(self, trial_id: int) -> Dict[str, Any]:
         """Generate embeddings for all criteria in a trial"""
         try:
@@ -69,14 +114,8 @@ class CriterionEmbeddingService:
             if not criteria:
                 return {"success": True, "message": "All criteria already have embeddings", "count": 0}
 
-            success_count = 0
-            for criterion in criteria:
-                success = await self.generate_and_store_embedding(
-                    criterion['id'],
-                    criterion['criterion_text']
-                )
-                if success:
-                    success_count += 1
+            batch_result = await self.generate_and_store_embeddings(criteria)
+            success_count = batch_result["generated"]
 
             return {
                 "success": True,
@@ -0,0 +1,85 @@
+"""
+Data Versions
+
+In-process caches of trial data (TrialCatalog snapshots, TrialSearchService
+results, prescreening plans) are invalidated locally by the writer, but every
+other worker and Cloud Run instance keeps serving its own copy. The
+data_versions table (database_migrations/add_data_versions.sql) holds one
+counter per scope, bumped by statement triggers on the tables behind it
+whenever a statement changes rows or columns the caches read:
+
+- trial_catalog:       clinical_trials, trial_investigators, protocol_metadata
+- prescreening_plans:  clinical_trials, trial_criteria
+
+Caches compare the counter of their scope with the one they were built
+under. The table is read at most once every check_seconds per process (one
+tiny query for all scopes), so a change made anywhere reaches every worker
+within that window. Before the migration is applied every scope reads as 0
+and caches fall back to their TTLs.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any
+
+from core.database import db
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SCOPE = "trial_catalog"
+PRESCREENING_PLANS_SCOPE = "prescreening_plans"
+
+
+class DataVersions:
+    """Cached view of the data_versions counters"""
+
+    def __init__(self, check_seconds: float = 5.0, retry_seconds: float = 300.0, enabled: bool = True):
+        self.check_seconds = check_seconds
+        self.retry_seconds = retry_seconds
+        self.enabled = enabled
+        self._versions: Dict[str, int] = {}
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"checks": 0, "check_errors": 0}
+
+    def get(self, scope: str) -> int:
+        """Latest known version of a scope (0 when untracked), re-read when the check is due"""
+        if not self.enabled:
+            return 0
+        # One thread re-reads; others use the versions from the previous check
+        if time.time() >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                if time.time() >= self._next_check:
+                    self._refresh()
+            finally:
+                self._lock.release()
+        return self._versions.get(scope, 0)
+
+    def _refresh(self):
+        self._stats["checks"] += 1
+        try:
+            rows = db.execute_query("SELECT scope, version FROM data_versions")
+            self._versions = {row["scope"]: row["version"] for row in rows}
+            self._next_check = time.time() + self.check_seconds
+        except Exception as e:
+            # Most likely the migration is not applied yet; caches fall back to TTLs
+            self._stats["check_errors"] += 1
+            self._next_check = time.time() + self.retry_seconds
+            logger.warning(f"Could not read data_versions, retrying in {self.retry_seconds:.0f}s: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "check_seconds": self.check_seconds,
+            "versions": dict(self._versions),
+            **self._stats
+        }
+
+
+# Singleton instance
+data_versions = DataVersions(
+    check_seconds=float(os.getenv("DATA_VERSION_CHECK_SECONDS", "5")),
+    enabled=os.getenv("DATA_VERSIONS_ENABLED", "true").lower() == "true"
+)
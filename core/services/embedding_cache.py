@@ -0,0 +1,162 @@
+"""
+Embedding Cache
+
+Two-tier cache for text embeddings so identical strings (condition names,
+"Medical condition: ..." prompts, trial texts, criteria) are embedded once:
+
+- Tier 1: in-process LRU (per worker, zero latency)
+- Tier 2: Postgres ``embedding_cache`` table (shared across workers and deploys)
+
+Entries are keyed by (model, task type, SHA-256 of the normalized text).
+GeminiService consults it transparently from generate_embeddings_batch.
+"""
+
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any
+
+from core.async_database import async_db
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """In-process LRU in front of a Postgres table of embedding vectors"""
+
+    def __init__(self, max_entries: int = 5000):
+        self._max_entries = max_entries
+        self._lru: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        # Back off from the DB tier after an error (e.g. table not migrated yet)
+        self._db_retry_after = 0.0
+        self._db_backoff_seconds = 300
+        self._stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "db_writes": 0,
+            "db_errors": 0
+        }
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize text so trivially different strings share an entry"""
+        return " ".join(text.lower().split())
+
+    @classmethod
+    def text_hash(cls, text: str) -> str:
+        """SHA-256 of the normalized text"""
+        return hashlib.sha256(cls.normalize_text(text).encode("utf-8")).hexdigest()
+
+    def _db_available(self) -> bool:
+        return time.time() >= self._db_retry_after
+
+    def _db_failed(self, action: str, error: Exception):
+        self._stats["db_errors"] += 1
+        self._db_retry_after = time.time() + self._db_backoff_seconds
+        logger.warning(f"Embedding cache DB {action} failed, using memory tier only for {self._db_backoff_seconds}s: {error}")
+
+    def _remember(self, key: tuple, embedding: List[float]):
+        self._lru[key] = embedding
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._max_entries:
+            self._lru.popitem(last=False)
+
+    async def get_many(self, model: str, task_type: str, texts: List[str]) -> Dict[int, List[float]]:
+        """
+        Look up embeddings for texts.
+
+        Returns: {input_index: embedding} for every text found in either tier
+        """
+        found: Dict[int, List[float]] = {}
+        db_lookups: Dict[str, List[int]] = {}
+
+        for index, text in enumerate(texts):
+            digest = self.text_hash(text)
+            key = (model, task_type, digest)
+            embedding = self._lru.get(key)
+            if embedding is not None:
+                self._lru.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                found[index] = embedding
+            else:
+                db_lookups.setdefault(digest, []).append(index)
+
+        if db_lookups and self._db_available():
+            try:
+                rows = await async_db.execute_query("""
+                    SELECT text_hash, embedding::text AS embedding
+                    FROM embedding_cache
+                    WHERE model = %s AND task_type = %s AND text_hash = ANY(%s)
+                """, (model, task_type, list(db_lookups.keys())))
+
+                for row in rows:
+                    embedding = row['embedding']
+                    if isinstance(embedding, str):
+                        embedding = json.loads(embedding)
+                    self._remember((model, task_type, row['text_hash']), embedding)
+                    for index in db_lookups.pop(row['text_hash'], []):
+                        self._stats["db_hits"] += 1
+                        found[index] = embedding
+            except Exception as e:
+                self._db_failed("read", e)
+
+        self._stats["misses"] += sum(len(indices) for indices in db_lookups.values())
+        return found
+
+    async def put_many(self, model: str, task_type: str, items: List[tuple]):
+        """
+        Store embeddings in both tiers.
+
+        items: [(text, embedding), ...]
+        """
+        rows = {}
+        for text, embedding in items:
+            digest = self.text_hash(text)
+            self._remember((model, task_type, digest), embedding)
+            rows[digest] = embedding
+
+        if not rows or not self._db_available():
+            return
+
+        try:
+            entries = list(rows.items())
+            chunk_size = 100
+            for i in range(0, len(entries), chunk_size):
+                chunk = entries[i:i + chunk_size]
+                values_sql = ", ".join(["(%s, %s, %s, %s::vector)"] * len(chunk))
+                params = tuple(
+                    value
+                    for digest, embedding in chunk
+                    for value in (model, task_type, digest, embedding)
+                )
+                await async_db.execute_update(f"""
+                    INSERT INTO embedding_cache (model, task_type, text_hash, embedding)
+                    VALUES {values_sql}
+                    ON CONFLICT (model, task_type, text_hash) DO NOTHING
+                """, params)
+                self._stats["db_writes"] += len(chunk)
+        except Exception as e:
+            self._db_failed("write", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for health endpoints"""
+        lookups = self._stats["memory_hits"] + self._stats["db_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["db_hits"]
+        return {
+            "entries": len(self._lru),
+            "max_entries": self._max_entries,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "db_tier_available": self._db_available(),
+            **self._stats
+        }
+
+    def clear(self):
+        """Clear the in-process tier (the DB tier is left intact)"""
+        self._lru.clear()
+
+
+# Singleton instance
+embedding_cache = EmbeddingCache()
@@ -1,11 +1,14 @@
 import os
 import json
 import asyncio
-import hashlib
-import time
 import logging
+import threading
 import aiohttp
-from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import List, Dict, Optional, Tuple
+
+from core.services.embedding_cache import embedding_cache
+from core.services.llm_response_cache import llm_response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -25,33 +28,116 @@ class GeminiService:
         ]
         
         # Performance optimizations
-        self._cache = {}  # Simple in-memory cache
-        self._cache_ttl = 300  # 5 minutes cache TTL
+        self._response_cache = llm_response_cache  # LRU + TTL, single-flight, per-namespace TTLs
         self._request_timeout = 15  # 15 second timeout for chat
         self._protocol_timeout = 120  # 2 minute timeout for protocol processing
         self._max_retries = 2
 
-    def _get_cache_key(self, prompt: str, max_tokens: int) -> str:
-        """Generate cache key for prompt"""
-        content = f"{prompt}:{max_tokens}"
-        return hashlib.md5(content.encode()).hexdigest()
-    
-    def _is_cache_valid(self, timestamp: float) -> bool:
-        """Check if cache entry is still valid"""
-        return time.time() - timestamp < self._cache_ttl
-    
-    async def generate_text(self, prompt: str, max_tokens: int = 1000) -> str:
-        """Generate text using Gemini 1.5 Pro via direct REST API with caching and timeout"""
-        # Check cache first
-        cache_key = self._get_cache_key(prompt, max_tokens)
-        if cache_key in self._cache:
-            cached_data, timestamp = self._cache[cache_key]
-            if self._is_cache_valid(timestamp):
-                return cached_data
+        # Embedding configuration
+        self._embedding_model = "text-embedding-004"
+        self._embedding_dimension = 768
+        self._embedding_batch_limit = 100  # batchEmbedContents max requests per call
+        self._embedding_concurrency = 4  # Concurrent batch requests
+        self._embedding_cache = embedding_cache
+
+        # Shared connection-pooled HTTP client (created on startup or first use)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+        self._pool_limit = 100  # Total concurrent connections
+        self._pool_limit_per_host = 32  # All traffic goes to generativelanguage.googleapis.com
+        self._keepalive_timeout = 60  # Keep idle TLS connections warm for a minute
+        self._pool_stats = {
+            "requests": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "sessions_created": 0,
+            "ephemeral_sessions": 0
+        }
+        # Worker threads (SyncGeminiResponder) update the counters too
+        self._pool_stats_lock = threading.Lock()
+        self._session_lock = threading.Lock()
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create a keep-alive ClientSession with a bounded connection pool"""
+        connector = aiohttp.TCPConnector(
+            limit=self._pool_limit,
+            limit_per_host=self._pool_limit_per_host,
+            keepalive_timeout=self._keepalive_timeout,
+            ttl_dns_cache=300
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers={"Content-Type": "application/json"}
+        )
+
+    async def startup(self) -> None:
+        """Create the shared HTTP client on the app event loop (called from main.py only)"""
+        with self._session_lock:
+            if self._session is not None and not self._session.closed:
+                return
+            self._session = self._create_session()
+            self._session_loop = asyncio.get_running_loop()
+        with self._pool_stats_lock:
+            self._pool_stats["sessions_created"] += 1
+        logger.info(f"Gemini HTTP pool started (limit={self._pool_limit}, per_host={self._pool_limit_per_host})")
+
+    async def shutdown(self) -> None:
+        """Close the shared HTTP client (called from main.py)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("Gemini HTTP pool closed")
+        self._session = None
+        self._session_loop = None
+
+    @asynccontextmanager
+    async def _http_session(self):
+        """Yield the pooled session when running on the app loop.
+
+        The pooled session is only ever created by startup() on the app loop and
+        is never rebound here. Callers on any other loop (e.g. SyncGeminiResponder's
+        asyncio.run in a worker thread), or before startup, get a short-lived
+        session that is closed when the request finishes.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._session
+        ephemeral = session is None or session.closed or self._session_loop is not loop
+        with self._pool_stats_lock:
+            self._pool_stats["requests"] += 1
+            self._pool_stats["in_flight"] += 1
+            self._pool_stats["peak_in_flight"] = max(self._pool_stats["peak_in_flight"], self._pool_stats["in_flight"])
+            if ephemeral:
+                self._pool_stats["ephemeral_sessions"] += 1
+        try:
+            if not ephemeral:
+                yield session
             else:
-                # Remove expired cache entry
-                del self._cache[cache_key]
-        
+                async with aiohttp.ClientSession() as session:
+                    yield session
+        finally:
+            with self._pool_stats_lock:
+                self._pool_stats["in_flight"] -= 1
+
+    async def generate_text(self, prompt: str, max_tokens: int = 1000,
+                            cache_namespace: str = "default", use_cache: bool = True) -> str:
+        """Generate text using Gemini 1.5 Pro via direct REST API with caching and timeout
+
+        Args:
+            prompt: Prompt text
+            max_tokens: Output token budget
+            cache_namespace: Response cache namespace of the call site (sets TTL and sharing)
+            use_cache: Set False to always call the API
+        """
+        if not use_cache:
+            response, _ = await self._request_text(prompt, max_tokens)
+            return response
+
+        return await self._response_cache.get_or_generate(
+            cache_namespace, prompt, max_tokens,
+            lambda: self._request_text(prompt, max_tokens)
+        )
+
+    async def _request_text(self, prompt: str, max_tokens: int) -> Tuple[str, bool]:
+        """Call the API; returns (text, succeeded) where failures carry a fallback message"""
         # Prepare request payload
         payload = {
             "contents": [{"parts": [{"text": prompt}]}],
@@ -65,7 +151,7 @@ class GeminiService:
         # Attempt generation with retries and timeout
         for attempt in range(self._max_retries + 1):
             try:
-                async with aiohttp.ClientSession() as session:
+                async with self._http_session() as session:
                     url = f"{self.base_url}/models/gemini-2.5-pro:generateContent?key={self.api_key}"
                     
                     async with session.post(
@@ -83,18 +169,7 @@ class GeminiService:
                                 candidate = data["candidates"][0]
                                 if "content" in candidate and "parts" in candidate["content"]:
                                     result = candidate["content"]["parts"][0]["text"]
-                                    
-                                    # Cache successful response
-                                    self._cache[cache_key] = (result, time.time())
-                                    
-                                    # Limit cache size to prevent memory issues
-                                    if len(self._cache) > 100:
-                                        # Remove oldest entries
-                                        oldest_keys = sorted(self._cache.keys(), key=lambda k: self._cache[k][1])[:20]
-                                        for key in oldest_keys:
-                                            del self._cache[key]
-                                    
-                                    return result
+                                    return result, True
                             
                             # If no valid content found
                             print(f"No valid content in Gemini response: {data}")
@@ -106,17 +181,17 @@ class GeminiService:
             except asyncio.TimeoutError:
                 print(f"Gemini API timeout (attempt {attempt + 1}/{self._max_retries + 1})")
                 if attempt == self._max_retries:
-                    return "I apologize, but my response is taking longer than expected. Please try a shorter message or try again in a moment."
+                    return "I apologize, but my response is taking longer than expected. Please try a shorter message or try again in a moment.", False
                     
             except Exception as e:
                 print(f"Gemini text generation error (attempt {attempt + 1}/{self._max_retries + 1}): {e}")
                 if attempt == self._max_retries:
-                    return "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."
+                    return "I apologize, but I'm having trouble processing your request right now. Please try again in a moment.", False
                 
                 # Wait before retry
                 await asyncio.sleep(1)
         
-        return "I apologize, but I'm having trouble processing your request right now."
+        return "I apologize, but I'm having trouble processing your request right now.", False
     
     async def generate_protocol_text(self, prompt: str, max_tokens: int = 8000) -> str:
         """Generate text specifically for protocol processing with extended timeout and no caching"""
@@ -135,7 +210,7 @@ class GeminiService:
                     "safetySettings": self.safety_settings
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with self._http_session() as session:
                     url = f"{self.base_url}/models/gemini-2.5-pro:generateContent?key={self.api_key}"
                     
                     async with session.post(
@@ -192,7 +267,7 @@ class GeminiService:
         """Generate text with configurable timeout for specialized tasks like criteria extraction"""
         for attempt in range(self._max_retries + 1):
             try:
-                async with aiohttp.ClientSession() as session:
+                async with self._http_session() as session:
                     payload = {
                         "contents": [{
                             "parts": [{"text": prompt}]
@@ -242,46 +317,144 @@ class GeminiService:
     async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings using Gemini text-embedding-004 via direct REST API"""
         try:
-            embeddings = []
-            # Create SSL context that doesn't verify certificates for development
-            # In production, SSL verification should be enabled
-            import ssl
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                for text in texts:
-                    url = f"{self.base_url}/models/text-embedding-004:embedContent?key={self.api_key}"
-                    payload = {
-                        "model": "models/text-embedding-004",
-                        "content": {"parts": [{"text": text}]},
-                        "taskType": "RETRIEVAL_DOCUMENT"
-                    }
+            result = await self.generate_embeddings_batch(texts)
+
+            if texts and result["failed"] == len(texts):
+                # Return empty list to trigger proper keyword search fallback
+                # DO NOT return zero vectors as they match with everything!
+                return []
+
+            # Keep positional alignment with the input for partial failures
+            return [
+                embedding if embedding is not None else [0.0] * self._embedding_dimension
+                for embedding in result["embeddings"]
+            ]
+        except Exception as e:
+            print(f"Gemini embedding error: {e}")
+            return []
+
+    async def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        task_type: str = "RETRIEVAL_DOCUMENT",
+        batch_size: int = None,
+        max_concurrency: int = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Generate embeddings with batchEmbedContents, packing up to the API batch
+        limit per request and running a bounded number of batches concurrently.
+        Texts already in the embedding cache (memory LRU, then Postgres) skip the API.
+
+        Returns:
+            Dict with:
+            - embeddings: one vector per input text, in input order (None if it failed)
+            - errors: {input_index: error message} for failed items
+            - succeeded / failed: counts
+        """
+        batch_size = min(batch_size or self._embedding_batch_limit, self._embedding_batch_limit)
+        semaphore = asyncio.Semaphore(max_concurrency or self._embedding_concurrency)
+
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        errors: Dict[int, str] = {}
 
+        # Empty strings are rejected by the API and would fail their whole batch
+        pending = []
+        for index, text in enumerate(texts):
+            if text and text.strip():
+                pending.append(index)
+            else:
+                errors[index] = "empty text"
+
+        if use_cache and pending:
+            cached = await self._embedding_cache.get_many(
+                self._embedding_model, task_type, [texts[i] for i in pending]
+            )
+            for position, embedding in cached.items():
+                embeddings[pending[position]] = embedding
+            pending = [index for position, index in enumerate(pending) if position not in cached]
+
+        async def run_batch(indices: List[int]):
+            async with semaphore:
+                vectors, error = await self._embed_batch([texts[i] for i in indices], task_type)
+            for position, index in enumerate(indices):
+                if error:
+                    errors[index] = error
+                elif position >= len(vectors) or not vectors[position]:
+                    errors[index] = "missing embedding in batch response"
+                else:
+                    embeddings[index] = vectors[position]
+
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        await asyncio.gather(*(run_batch(indices) for indices in batches))
+
+        if use_cache and pending:
+            fresh = [(texts[i], embeddings[i]) for i in pending if embeddings[i] is not None]
+            if fresh:
+                await self._embedding_cache.put_many(self._embedding_model, task_type, fresh)
+
+        failed = len(errors)
+        if failed:
+            logger.warning(f"Embedding batch: {failed}/{len(texts)} texts failed")
+
+        return {
+            "embeddings": embeddings,
+            "errors": errors,
+            "succeeded": len(texts) - failed,
+            "failed": failed
+        }
+
+    async def _embed_batch(self, texts: List[str], task_type: str) -> Tuple[List[List[float]], Optional[str]]:
+        """Embed one batch (<= batch limit) with a single batchEmbedContents call.
+
+        Returns (vectors in request order, error message or None).
+        """
+        model = f"models/{self._embedding_model}"
+        url = f"{self.base_url}/{model}:batchEmbedContents?key={self.api_key}"
+        payload = {
+            "requests": [
+                {"model": model, "content": {"parts": [{"text": text}]}, "taskType": task_type}
+                for text in texts
+            ]
+        }
+
+        last_error = None
+        for attempt in range(self._max_retries + 1):
+            try:
+                async with self._http_session() as session:
                     async with session.post(
                         url,
                         json=payload,
-                        timeout=aiohttp.ClientTimeout(total=30),
+                        timeout=aiohttp.ClientTimeout(total=60),
                         headers={"Content-Type": "application/json"}
                     ) as response:
-                        
+
                         if response.status == 200:
                             data = await response.json()
-                            if "embedding" in data and "values" in data["embedding"]:
-                                embeddings.append(data["embedding"]["values"])
-                            else:
-                                embeddings.append([0.0] * 768)
-                        else:
-                            embeddings.append([0.0] * 768)
-                            
-            return embeddings
-        except Exception as e:
-            print(f"Gemini embedding error: {e}")
-            # Return empty list to trigger proper keyword search fallback
-            # DO NOT return zero vectors as they match with everything!
-            return []
+                            vectors = [item.get("values") for item in data.get("embeddings", [])]
+                            return vectors, None
+
+                        error_text = await response.text()
+                        last_error = f"HTTP {response.status}: {error_text[:200]}"
+
+                        if response.status == 429:
+                            # Rate limit - back off before retry
+                            await asyncio.sleep(2 ** attempt)
+                            continue
+                        if 400 <= response.status < 500:
+                            # Bad request won't succeed on retry
+                            break
+
+            except asyncio.TimeoutError:
+                last_error = "timeout"
+            except Exception as e:
+                last_error = str(e)
+
+            logger.warning(f"Embedding batch of {len(texts)} failed (attempt {attempt + 1}/{self._max_retries + 1}): {last_error}")
+            if attempt < self._max_retries:
+                await asyncio.sleep(1)
+
+        return [], last_error or "unknown error"
 
     async def extract_json(self, prompt: str, text: str, timeout_seconds: int = 15) -> Dict:
         """Extract structured JSON from text using Gemini with configurable timeout"""
@@ -451,16 +624,34 @@ class GeminiService:
     
     def get_cache_stats(self) -> Dict:
         """Get cache performance statistics"""
+        response_stats = self._response_cache.get_stats()
         return {
-            "cache_size": len(self._cache),
-            "cache_ttl": self._cache_ttl,
+            "cache_size": response_stats["entries"],
+            "cache_ttl": self._response_cache.namespace_config("default")[0],
+            "cache_hit_rate": response_stats["hit_rate"],
             "request_timeout": self._request_timeout,
-            "max_retries": self._max_retries
+            "max_retries": self._max_retries,
+            "response_cache": response_stats,
+            "embedding_cache": self._embedding_cache.get_stats()
         }
     
+    def get_pool_stats(self) -> Dict:
+        """Get HTTP connection pool utilisation statistics"""
+        connector = self._session.connector if self._session is not None and not self._session.closed else None
+        with self._pool_stats_lock:
+            pool_stats = dict(self._pool_stats)
+        return {
+            "pool_open": connector is not None,
+            "pool_limit": self._pool_limit,
+            "pool_limit_per_host": self._pool_limit_per_host,
+            "keepalive_timeout": self._keepalive_timeout,
+            "utilisation": round(pool_stats["in_flight"] / self._pool_limit, 3),
+            **pool_stats
+        }
+
     def clear_cache(self) -> None:
         """Clear the response cache"""
-        self._cache.clear()
+        self._response_cache.clear()
 
 # Global instance
 gemini_service = GeminiService()
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+Offline Geo Locator
+
+Resolves free-text locations ("Tulsa, OK", "70115", "st louis mo") to
+coordinates using a bundled table of ZIP3 and city centroids
+(data/geo_centroids.csv), and answers radius / nearest-neighbour queries over
+sites with haversine distances on a coarse lat/lon grid. No network geocoder
+is involved, so lookups are effectively free and always available.
+"""
+
+import os
+import re
+import csv
+import math
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_MILES = 3958.8
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "data", "geo_centroids.csv")
+
+STATE_ABBREVIATIONS = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
+    'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'florida': 'FL', 'georgia': 'GA',
+    'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL', 'indiana': 'IN', 'iowa': 'IA',
+    'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
+    'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN', 'mississippi': 'MS',
+    'missouri': 'MO', 'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV', 'new hampshire': 'NH',
+    'new jersey': 'NJ', 'new mexico': 'NM', 'new york': 'NY', 'north carolina': 'NC',
+    'north dakota': 'ND', 'ohio': 'OH', 'oklahoma': 'OK', 'oregon': 'OR', 'pennsylvania': 'PA',
+    'rhode island': 'RI', 'south carolina': 'SC', 'south dakota': 'SD', 'tennessee': 'TN',
+    'texas': 'TX', 'utah': 'UT', 'vermont': 'VT', 'virginia': 'VA', 'washington': 'WA',
+    'west virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY', 'district of columbia': 'DC'
+}
+STATE_CODES = set(STATE_ABBREVIATIONS.values())
+
+
+@dataclass(frozen=True)
+class GeoPoint:
+    """A resolved location"""
+    name: str
+    state: str
+    lat: float
+    lon: float
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in miles"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def normalize_place(text: str) -> str:
+    """Lowercase and canonicalize a place string ("St. Louis, MO" -> "st louis mo")"""
+    text = text.lower().replace("&", " and ")
+    text = re.sub(r"[^a-z0-9 ]", " ", text)
+    words = text.split()
+    for i, word in enumerate(words):
+        if word == "saint":
+            words[i] = "st"
+        elif word == "mt" and i < len(words) - 1:  # a trailing "mt" is Montana
+            words[i] = "mount"
+    return " ".join(words)
+
+
+class SpatialGrid:
+    """Points bucketed into lat/lon cells for radius and k-nearest queries"""
+
+    def __init__(self, cell_degrees: float = 1.0):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, Any]]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees)))
+
+    def insert(self, lat: float, lon: float, item: Any):
+        self._cells.setdefault(self._cell(lat, lon), []).append((lat, lon, item))
+        self._size += 1
+
+    def within(self, lat: float, lon: float, radius_miles: float) -> List[Tuple[float, Any]]:
+        """(distance_miles, item) for every point within radius, nearest first"""
+        lat_span = radius_miles / 69.0
+        lon_span = radius_miles / max(69.0 * math.cos(math.radians(lat)), 1e-6)
+        min_lat, min_lon = self._cell(lat - lat_span, lon - lon_span)
+        max_lat, max_lon = self._cell(lat + lat_span, lon + lon_span)
+
+        found = []
+        for cell_lat in range(min_lat, max_lat + 1):
+            for cell_lon in range(min_lon, max_lon + 1):
+                for point_lat, point_lon, item in self._cells.get((cell_lat, cell_lon), ()):
+                    distance = haversine_miles(lat, lon, point_lat, point_lon)
+                    if distance <= radius_miles:
+                        found.append((distance, item))
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+    def nearest(self, lat: float, lon: float, k: int = 1,
+                max_radius_miles: float = 500) -> List[Tuple[float, Any]]:
+        """k nearest points, widening the search ring up to max_radius_miles"""
+        radius = 25.0
+        while True:
+            found = self.within(lat, lon, min(radius, max_radius_miles))
+            if len(found) >= k or radius >= max_radius_miles:
+                return found[:k]
+            radius *= 2
+
+
+class GeoLocator:
+    """Resolves locations against the bundled centroid table"""
+
+    def __init__(self, data_file: str = DATA_FILE):
+        self.data_file = data_file
+        self._zip3: Dict[str, GeoPoint] = {}
+        self._cities: Dict[str, List[GeoPoint]] = {}
+        self._city_keys: List[str] = []
+        self._resolved: Dict[str, Optional[GeoPoint]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.data_file, newline="") as f:
+                    for row in csv.DictReader(f):
+                        point = GeoPoint(row["name"], row["state"], float(row["lat"]), float(row["lon"]))
+                        if row["kind"] == "zip3":
+                            self._zip3[row["key"]] = point
+                        else:
+                            self._cities.setdefault(normalize_place(row["key"]), []).append(point)
+            except Exception as e:
+                logger.error(f"Failed to load geo centroid table {self.data_file}: {e}")
+            # Longest names first so "north charleston" wins over "charleston"
+            self._city_keys = sorted(self._cities, key=len, reverse=True)
+            self._loaded = True
+
+    def resolve(self, location: str) -> Optional[GeoPoint]:
+        """Resolve a ZIP code or "city[, state]" string to a centroid"""
+        if not location:
+            return None
+        self._ensure_loaded()
+
+        key = location.strip().lower()
+        if key in self._resolved:
+            return self._resolved[key]
+
+        point = self._resolve(location)
+        if len(self._resolved) < 10000:
+            self._resolved[key] = point
+        return point
+
+    def _resolve(self, location: str) -> Optional[GeoPoint]:
+        zip_match = re.search(r"\b(\d{5})(?:-\d{4})?\b", location)
+        if zip_match:
+            point = self._zip3.get(zip_match.group(1)[:3])
+            if point:
+                return point
+
+        text = normalize_place(location)
+        padded = f" {text} "
+
+        for city_key in self._city_keys:
+            if f" {city_key} " in padded:
+                candidates = self._cities[city_key]
+                # Look for the state outside the city name ("kansas city" is not Kansas)
+                state = self._extract_state(padded.replace(f" {city_key} ", " ", 1).strip())
+                if state:
+                    # e.g. "Springfield, IL" must not resolve to Springfield, MO
+                    return next((c for c in candidates if c.state == state), None)
+                return candidates[0]
+        return None
+
+    @staticmethod
+    def _extract_state(text: str) -> Optional[str]:
+        words = text.split()
+        if words and words[-1].upper() in STATE_CODES:
+            return words[-1].upper()
+        for name, code in STATE_ABBREVIATIONS.items():
+            if f" {name} " in f" {text} ":
+                return code
+        return None
+
+    def city_names(self) -> List[Tuple[str, GeoPoint]]:
+        """(normalized city name, centroid) for every city in the table"""
+        self._ensure_loaded()
+        return [(key, point) for key, points in self._cities.items() for point in points]
+
+    def zip_to_city(self, zip_code: str) -> Optional[str]:
+        """City name for a ZIP code's 3-digit prefix"""
+        self._ensure_loaded()
+        point = self._zip3.get((zip_code or "")[:3])
+        return point.name if point else None
+
+    def distance_miles(self, from_location: str, to_location: str) -> Optional[float]:
+        """Distance between two locations, or None if either cannot be resolved"""
+        a, b = self.resolve(from_location), self.resolve(to_location)
+        if not a or not b:
+            return None
+        return haversine_miles(a.lat, a.lon, b.lat, b.lon)
+
+    def build_index(self, items: Iterable[Tuple[str, Any]]) -> SpatialGrid:
+        """
+        Index items by their resolved location.
+
+        items: [(location_text, payload), ...]; unresolvable locations are skipped
+        """
+        grid = SpatialGrid()
+        for location, payload in items:
+            point = self.resolve(location)
+            if point:
+                grid.insert(point.lat, point.lon, payload)
+        return grid
+
+
+# Singleton instance
+geo_locator = GeoLocator()
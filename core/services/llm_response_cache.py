@@ -0,0 +1,254 @@
+"""
+LLM Response Cache
+
+Cache for GeminiService.generate_text responses so identical prompts (trial
+summaries, criteria explanations, common first messages) are paid for once:
+
+- Tier 1: in-process LRU with per-entry expiry (per worker, zero latency)
+- Tier 2: optional Postgres ``llm_response_cache`` table shared across workers,
+  used only by namespaces marked shared
+
+Each call site picks a namespace, which sets its TTL and whether it may use
+the shared tier. Identical requests that arrive while one is already in
+flight wait for that request instead of issuing their own API call.
+
+Entries are keyed by (namespace, SHA-256 of the normalized prompt + max_tokens).
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+from core.async_database import async_db
+
+logger = logging.getLogger(__name__)
+
+# namespace -> (ttl_seconds, use_shared_tier)
+NAMESPACES: Dict[str, Tuple[int, bool]] = {
+    "default": (300, False),
+    "chat": (300, False),
+    "intent": (600, False),
+    "communication_analysis": (300, False),
+    "criteria_explanation": (3600, True),
+    "protocol_extraction": (86400, True),
+}
+
+
+class LLMResponseCache:
+    """LRU + TTL response cache with single-flight loading and an optional DB tier"""
+
+    def __init__(self, max_entries: int = 1000, shared_tier: bool = False):
+        self._max_entries = max_entries
+        self.shared_tier = shared_tier
+        # key -> (response, expires_at)
+        self._lru: "OrderedDict[tuple, Tuple[str, float]]" = OrderedDict()
+        # key -> (loop, future) of the request currently generating that response
+        self._inflight: Dict[tuple, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+        # Back off from the DB tier after an error (e.g. table not migrated yet)
+        self._db_retry_after = 0.0
+        self._db_backoff_seconds = 300
+        self._stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "coalesced": 0,
+            "misses": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "db_writes": 0,
+            "db_errors": 0
+        }
+        self._namespace_stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Collapse whitespace so re-indented prompt templates share an entry"""
+        return " ".join(prompt.split())
+
+    @classmethod
+    def prompt_hash(cls, prompt: str, max_tokens: int) -> str:
+        """SHA-256 of the normalized prompt and output budget"""
+        content = f"{cls.normalize_prompt(prompt)}:{max_tokens}"
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def namespace_config(namespace: str) -> Tuple[int, bool]:
+        """(ttl_seconds, use_shared_tier) for a namespace, falling back to default"""
+        return NAMESPACES.get(namespace, NAMESPACES["default"])
+
+    def _count(self, namespace: str, stat: str):
+        self._stats[stat] += 1
+        counters = self._namespace_stats.setdefault(namespace, {"hits": 0, "misses": 0})
+        counters["misses" if stat == "misses" else "hits"] += 1
+
+    def _db_available(self) -> bool:
+        return self.shared_tier and time.time() >= self._db_retry_after
+
+    def _db_failed(self, action: str, error: Exception):
+        self._stats["db_errors"] += 1
+        self._db_retry_after = time.time() + self._db_backoff_seconds
+        logger.warning(f"LLM response cache DB {action} failed, using memory tier only for {self._db_backoff_seconds}s: {error}")
+
+    def get(self, namespace: str, digest: str) -> Optional[str]:
+        """Fresh response from the memory tier, or None"""
+        key = (namespace, digest)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            response, expires_at = entry
+            if time.time() >= expires_at:
+                del self._lru[key]
+                self._stats["expirations"] += 1
+                return None
+            self._lru.move_to_end(key)
+            return response
+
+    def put(self, namespace: str, digest: str, response: str, ttl_seconds: Optional[int] = None):
+        """Store a response in the memory tier"""
+        if ttl_seconds is None:
+            ttl_seconds = self.namespace_config(namespace)[0]
+        key = (namespace, digest)
+        with self._lock:
+            self._lru[key] = (response, time.time() + ttl_seconds)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self._max_entries:
+                self._lru.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    async def get_or_generate(
+        self,
+        namespace: str,
+        prompt: str,
+        max_tokens: int,
+        generate: Callable[[], Awaitable[Tuple[str, bool]]],
+        ttl_seconds: Optional[int] = None
+    ) -> str:
+        """
+        Return a cached response or generate it once.
+
+        Args:
+            namespace: Call-site namespace (see NAMESPACES)
+            prompt: Prompt text (part of the cache key)
+            max_tokens: Output budget (part of the cache key)
+            generate: Coroutine factory returning (response, cacheable); fallback
+                responses from failed API calls are returned but not cached
+            ttl_seconds: Override the namespace TTL
+        """
+        default_ttl, shared = self.namespace_config(namespace)
+        ttl_seconds = default_ttl if ttl_seconds is None else ttl_seconds
+        digest = self.prompt_hash(prompt, max_tokens)
+        key = (namespace, digest)
+
+        cached = self.get(namespace, digest)
+        if cached is not None:
+            self._count(namespace, "memory_hits")
+            return cached
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            inflight = self._inflight.get(key)
+            # Futures are bound to their loop; callers on another loop generate their own
+            leader = inflight is None or inflight[0] is not loop
+            if leader:
+                future = loop.create_future()
+                self._inflight[key] = (loop, future)
+
+        if not leader:
+            self._count(namespace, "coalesced")
+            try:
+                return await asyncio.shield(inflight[1])
+            except asyncio.CancelledError:
+                if not inflight[1].cancelled():
+                    raise
+                # The leading request was cancelled, not us: try again
+                return await self.get_or_generate(namespace, prompt, max_tokens, generate, ttl_seconds)
+
+        try:
+            response = None
+            if shared and self._db_available():
+                response = await self._db_get(namespace, digest)
+                if response is not None:
+                    self._count(namespace, "db_hits")
+                    self.put(namespace, digest, response, ttl_seconds)
+
+            if response is None:
+                self._count(namespace, "misses")
+                response, cacheable = await generate()
+                if cacheable:
+                    self.put(namespace, digest, response, ttl_seconds)
+                    if shared and self._db_available():
+                        await self._db_put(namespace, digest, response, ttl_seconds)
+
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Followers see the error; mark it retrieved so an unwaited future doesn't warn
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key, (None, None))[1] is future:
+                    del self._inflight[key]
+
+    async def _db_get(self, namespace: str, digest: str) -> Optional[str]:
+        try:
+            rows = await async_db.execute_query("""
+                SELECT response
+                FROM llm_response_cache
+                WHERE namespace = %s AND prompt_hash = %s AND expires_at > NOW()
+            """, (namespace, digest))
+            return rows[0]['response'] if rows else None
+        except Exception as e:
+            self._db_failed("read", e)
+            return None
+
+    async def _db_put(self, namespace: str, digest: str, response: str, ttl_seconds: int):
+        try:
+            await async_db.execute_update("""
+                INSERT INTO llm_response_cache (namespace, prompt_hash, response, expires_at)
+                VALUES (%s, %s, %s, NOW() + %s * INTERVAL '1 second')
+                ON CONFLICT (namespace, prompt_hash)
+                DO UPDATE SET response = EXCLUDED.response,
+                              expires_at = EXCLUDED.expires_at,
+                              created_at = CURRENT_TIMESTAMP
+            """, (namespace, digest, response, ttl_seconds))
+            self._stats["db_writes"] += 1
+        except Exception as e:
+            self._db_failed("write", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for health endpoints"""
+        hits = self._stats["memory_hits"] + self._stats["db_hits"] + self._stats["coalesced"]
+        lookups = hits + self._stats["misses"]
+        return {
+            "entries": len(self._lru),
+            "max_entries": self._max_entries,
+            "in_flight": len(self._inflight),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "shared_tier": self.shared_tier,
+            "db_tier_available": self._db_available(),
+            "namespaces": {name: dict(counters) for name, counters in self._namespace_stats.items()},
+            **self._stats
+        }
+
+    def clear(self):
+        """Clear the in-process tier (the DB tier is left intact)"""
+        with self._lock:
+            self._lru.clear()
+
+
+# Singleton instance
+llm_response_cache = LLMResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+    shared_tier=os.getenv("LLM_CACHE_SHARED_TIER", "false").lower() == "true"
+)
@@ -0,0 +1,272 @@
+"""
+Location Resolver
+
+One precompiled resolver for free-text locations, shared by trial search, the
+NLU entity extractors and the CRIO site mapper so they all agree on what
+"stl", "Charleston sc 29485" or "springfield mo.my zip is 65804" means.
+
+A word-level trie holds every site-city alias, known city name (from the
+bundled geo centroid table), state name and state abbreviation; a ZIP-prefix
+table maps ZIP codes to cities. resolve() walks the trie once over the input
+and returns a structured ResolvedLocation (city, state, ZIP, site codes),
+memoized per input string.
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from core.services.geo_locator import geo_locator, normalize_place, STATE_ABBREVIATIONS, STATE_CODES
+
+logger = logging.getLogger(__name__)
+
+# CRIO site cities: code -> (city, state, aliases)
+SITE_CITIES: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    'ATL': ('Atlanta', 'GA', ('atlanta', 'atl')),
+    'NO': ('New Orleans', 'LA', ('new orleans', 'nola', 'no', 'n.o.')),
+    'BR': ('Baton Rouge', 'LA', ('baton rouge', 'br', 'baton')),
+    'BET': ('Bethesda', 'MD', ('bethesda', 'bet')),
+    'CHS': ('Charleston', 'SC', ('charleston', 'chs')),
+    'CIN': ('Cincinnati', 'OH', ('cincinnati', 'cincy', 'cin')),
+    'CLT': ('Charlotte', 'NC', ('charlotte', 'clt')),
+    'DAL': ('Dallas', 'TX', ('dallas', 'dal', 'dfw')),
+    'GU': ('Gulfport', 'MS', ('gulfport', 'gu', 'gulf port')),
+    'HMA': ('Houma', 'LA', ('houma', 'hma')),
+    'IND': ('Indianapolis', 'IN', ('indianapolis', 'indy', 'ind')),
+    'LOU': ('Louisville', 'KY', ('louisville', 'lou')),
+    'NAS': ('Nashville', 'TN', ('nashville', 'nas', 'nash')),
+    'NS': ('Norfolk', 'VA', ('norfolk', 'ns')),
+    'OVP': ('Overland Park', 'KS', ('overland park', 'ovp')),
+    'SLC': ('Salt Lake City', 'UT', ('salt lake city', 'slc', 'salt lake')),
+    'SPR': ('Springfield', 'MO', ('springfield', 'spr')),
+    'STE': ('Steubenville', 'OH', ('steubenville', 'ste')),
+    'STL': ('St. Louis', 'MO', ('st louis', 'saint louis', 'stl', 'st. louis')),
+    'TUL': ('Tulsa', 'OK', ('tulsa', 'tul')),
+}
+
+# Short site codes ("no", "br", "stl") and state codes ("ok", "in") are only
+# trusted when they cannot be ordinary words of a reply (see resolve())
+SHORT_ALIAS_MAX_LENGTH = 3
+
+# Short codes that are also everyday words; never accepted as a whole reply
+AMBIGUOUS_CODES = frozenset({
+    'no', 'bet', 'in', 'me', 'ok', 'or', 'oh', 'hi', 'id', 'ma', 'pa', 'de', 'ne', 'al'
+})
+
+# Whole-input abbreviations for cities without a site
+CITY_ABBREVIATIONS = {
+    'ny': 'New York',
+    'nyc': 'New York City',
+    'la': 'Los Angeles',
+    'sf': 'San Francisco',
+    'dc': 'Washington DC',
+}
+
+# Fallback ZIP prefix -> city for prefixes missing from the geo centroid table
+ZIP_PREFIX_CITIES = {
+    '30': 'Atlanta', '29': 'Charleston',
+    '700': 'New Orleans', '701': 'Baton Rouge',
+    '630': 'St. Louis', '631': 'St. Louis', '640': 'Kansas City', '641': 'Kansas City', '658': 'Springfield',
+    '74': 'Tulsa', '37': 'Nashville', '38': 'Memphis',
+    '750': 'Dallas', '751': 'Dallas', '752': 'Dallas', '76': 'Fort Worth',
+    '28': 'Charlotte', '45': 'Cincinnati',
+}
+
+STATE_NAMES = {code: name.title() for name, code in STATE_ABBREVIATIONS.items()}
+
+_ZIP_PATTERN = re.compile(r'\b(\d{5})(?:-\d{4})?\b')
+_ZIP_PHRASE_PATTERN = re.compile(r'\.?\s*my\s*zip\s*(?:code)?\s*is\s*', re.IGNORECASE)
+
+# Trie entry kinds
+_SITE = "site"
+_CITY = "city"
+_STATE = "state"
+
+
+@dataclass(frozen=True)
+class ResolvedLocation:
+    """Structured form of a user-provided location"""
+    raw: str
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zip_code: Optional[str] = None
+    site_codes: Tuple[str, ...] = ()
+
+    @property
+    def site_code(self) -> Optional[str]:
+        return self.site_codes[0] if self.site_codes else None
+
+    @property
+    def search_term(self) -> str:
+        """Text to match against trial site_location (e.g. "st. louis", "Charleston")"""
+        if self.site_codes:
+            return SITE_CITIES[self.site_codes[0]][0].lower()
+        return self.city or self.raw.strip()
+
+    @property
+    def display(self) -> str:
+        """Human-readable form ("Springfield, MO", "Tulsa", "Texas")"""
+        if self.city and self.state:
+            return f"{self.city}, {self.state}"
+        if self.city:
+            return self.city
+        if self.state:
+            return STATE_NAMES.get(self.state, self.state)
+        return " ".join(word.capitalize() for word in self.raw.split())
+
+
+class LocationResolver:
+    """Word-trie resolver over site aliases, city names and states"""
+
+    def __init__(self):
+        self._trie: Optional[dict] = None
+
+    def _build_trie(self) -> dict:
+        """node: {word: child, ..., None: [(kind, value, short_alias), ...]}"""
+        trie: dict = {}
+
+        def add(phrase: str, entry: tuple):
+            node = trie
+            for word in normalize_place(phrase).split():
+                node = node.setdefault(word, {})
+            node.setdefault(None, []).append(entry)
+
+        for code, (_, _, aliases) in SITE_CITIES.items():
+            for alias in aliases:
+                add(alias, (_SITE, code, len(alias) <= SHORT_ALIAS_MAX_LENGTH))
+        for name, point in geo_locator.city_names():
+            add(name, (_CITY, (point.name, point.state), False))
+        for name, code in STATE_ABBREVIATIONS.items():
+            add(name, (_STATE, code, False))
+        for code in STATE_CODES:
+            add(code, (_STATE, code, True))
+        return trie
+
+    def _scan(self, words: List[str]) -> List[Tuple[int, int, List[tuple]]]:
+        """Longest trie match starting at each position, left to right, non-overlapping"""
+        if self._trie is None:
+            self._trie = self._build_trie()
+
+        spans = []
+        i = 0
+        while i < len(words):
+            node, best = self._trie, None
+            for j in range(i, len(words)):
+                node = node.get(words[j])
+                if node is None:
+                    break
+                if None in node:
+                    best = (i, j + 1, node[None])
+            if best:
+                spans.append(best)
+                i = best[1]
+            else:
+                i += 1
+        return spans
+
+    @lru_cache(maxsize=4096)
+    def resolve(self, location: str) -> ResolvedLocation:
+        """Resolve a location string (memoized per input)"""
+        if not location or not location.strip():
+            return ResolvedLocation(raw=location or "")
+
+        text = _ZIP_PHRASE_PATTERN.sub(' ', location)
+        zip_match = _ZIP_PATTERN.search(text)
+        zip_code = zip_match.group(1) if zip_match else None
+        words = normalize_place(_ZIP_PATTERN.sub(' ', text)).split()
+
+        if len(words) == 1 and words[0] in CITY_ABBREVIATIONS:
+            return ResolvedLocation(raw=location, city=CITY_ABBREVIATIONS[words[0]], zip_code=zip_code)
+
+        city = state = None
+        site_codes: List[str] = []
+        city_end = None
+        consumed = set()
+
+        spans = self._scan(words)
+        for index, (start, end, entries) in enumerate(spans):
+            # A short code is trusted only as the whole reply (and not an
+            # everyday word), with a ZIP, or - for states - right after a city;
+            # "no thanks", "ok" and "near me" stay the user's own words
+            whole_code = start == 0 and end == len(words) and " ".join(words) not in AMBIGUOUS_CODES
+            for kind, value, short in entries:
+                if kind == _SITE and city is None and (
+                    not short or whole_code or zip_code is not None or
+                    (start == 0 and self._followed_by_state(spans, index, len(words), SITE_CITIES[value][1]))
+                ):
+                    site_codes.append(value)
+                    city = SITE_CITIES[value][0]
+                    city_end = end
+                elif kind == _CITY and city is None:
+                    city = value[0]
+                    city_end = end
+                elif kind == _STATE and state is None and (
+                    not short or whole_code or start == city_end or zip_code is not None
+                ):
+                    state = value
+                else:
+                    continue
+                consumed.update(range(start, end))
+                break
+
+        if city is None and zip_code:
+            city = geo_locator.zip_to_city(zip_code) or self._zip_prefix_city(zip_code)
+            point = geo_locator.resolve(zip_code)
+            if state is None and point:
+                state = point.state
+
+        if city is None:
+            # Unknown city: whatever is left once the state and ZIP are taken out
+            remainder = [word for index, word in enumerate(words) if index not in consumed]
+            if remainder and len(remainder) <= 4:
+                city = " ".join(remainder).title()
+
+        if city and not site_codes:
+            site_codes = [code for code, (site_city, _, _) in SITE_CITIES.items() if site_city == city]
+        if state:
+            # "Springfield, IL" is not the Springfield, MO site
+            site_codes = [code for code in site_codes if SITE_CITIES[code][1] == state]
+
+        return ResolvedLocation(
+            raw=location,
+            city=city,
+            state=state,
+            zip_code=zip_code,
+            site_codes=tuple(site_codes)
+        )
+
+    @staticmethod
+    def _followed_by_state(spans: List[Tuple[int, int, List[tuple]]], index: int,
+                           word_count: int, state: str) -> bool:
+        """Whether spans[index] is followed only by the given state ("stl mo")"""
+        if index + 1 != len(spans) - 1:
+            return False
+        start, end, entries = spans[index + 1]
+        return (start == spans[index][1] and end == word_count and
+                any(kind == _STATE and value == state for kind, value, _ in entries))
+
+    @staticmethod
+    def _zip_prefix_city(zip_code: str) -> Optional[str]:
+        return ZIP_PREFIX_CITIES.get(zip_code[:3]) or ZIP_PREFIX_CITIES.get(zip_code[:2])
+
+    def zip_to_city(self, zip_code: str) -> Optional[str]:
+        """City for a ZIP code (centroid table first, then the prefix table)"""
+        if not zip_code:
+            return None
+        return geo_locator.zip_to_city(zip_code) or self._zip_prefix_city(zip_code)
+
+    @staticmethod
+    def state_code(state: str) -> Optional[str]:
+        """"Missouri" / "mo" / "MO" -> "MO" (None if not a state)"""
+        if not state:
+            return None
+        cleaned = " ".join(state.lower().replace(".", "").split())
+        if cleaned.upper() in STATE_CODES:
+            return cleaned.upper()
+        return STATE_ABBREVIATIONS.get(cleaned)
+
+
+# Shared by TrialSearchService, the entity extractors and LocationSiteMapper
+location_resolver = LocationResolver()
@@ -5,8 +5,11 @@ Uses database-driven mappings with intelligent matching
 """
 
 from core.database import db
+from core.services.geo_locator import geo_locator, SpatialGrid
+from core.services.location_resolver import location_resolver
 from typing import Optional, Dict, List
 import logging
+import time
 import re
 
 logger = logging.getLogger(__name__)
@@ -18,30 +21,6 @@ class LocationSiteMapper:
     Handles fuzzy matching, specialty alignment, and multi-site cities
     """
 
-    # City name variations for fuzzy matching
-    CITY_ALIASES = {
-        'ATL': ['atlanta', 'atl'],
-        'NO': ['new orleans', 'nola', 'no', 'n.o.', 'new orleans'],
-        'BR': ['baton rouge', 'br', 'baton'],
-        'BET': ['bethesda', 'bet'],
-        'CHS': ['charleston', 'chs'],
-        'CIN': ['cincinnati', 'cincy', 'cin'],
-        'CLT': ['charlotte', 'clt'],
-        'DAL': ['dallas', 'dal', 'dfw'],
-        'GU': ['gulfport', 'gu', 'gulf port'],
-        'HMA': ['houma', 'hma'],
-        'IND': ['indianapolis', 'indy', 'ind'],
-        'LOU': ['louisville', 'lou'],
-        'NAS': ['nashville', 'nas', 'nash'],
-        'NS': ['norfolk', 'ns'],
-        'OVP': ['overland park', 'ovp'],
-        'SLC': ['salt lake city', 'slc', 'salt lake'],
-        'SPR': ['springfield', 'spr'],
-        'STE': ['steubenville', 'ste'],
-        'STL': ['st louis', 'saint louis', 'stl', 'st. louis'],
-        'TUL': ['tulsa', 'tul']
-    }
-
     # Specialty keywords for condition matching
     SPECIALTY_KEYWORDS = {
         'dermatology': ['acne', 'eczema', 'psoriasis', 'skin', 'rash', 'dermat', 'atopic'],
@@ -54,6 +33,14 @@ class LocationSiteMapper:
         'general medicine': ['diabetes', 'hypertension', 'cholesterol', 'covid', 'general']
     }
 
+    # Nearest-site fallback for locations that match no alias or mapping
+    NEAREST_SITE_MAX_MILES = 100
+    SITE_INDEX_TTL_SECONDS = 600
+
+    def __init__(self):
+        self._site_index: Optional[SpatialGrid] = None
+        self._site_index_built_at = 0.0
+
     def get_site_for_location(
         self,
         focus_location: str,
@@ -85,6 +72,9 @@ class LocationSiteMapper:
             logger.warning(f"Could not normalize location: {focus_location}")
             # Try direct database lookup without normalization
             sites = self._get_sites_by_location_name(focus_location)
+            if not sites:
+                # Last resort: the geographically nearest site
+                sites = self._get_sites_near(focus_location)
             if not sites:
                 return None
         else:
@@ -115,22 +105,11 @@ class LocationSiteMapper:
         if not location:
             return None
 
-        location_lower = location.lower().strip()
-
-        # Check aliases
-        for city_code, aliases in self.CITY_ALIASES.items():
-            if location_lower in aliases:
-                logger.debug(f"Normalized '{location}' → '{city_code}'")
-                return city_code
-
-        # Try extracting first word (e.g., "New Orleans, LA" → "new")
-        first_word = location_lower.split()[0] if location_lower else ''
-        for city_code, aliases in self.CITY_ALIASES.items():
-            if first_word in aliases:
-                logger.debug(f"Normalized '{location}' → '{city_code}' (first word match)")
-                return city_code
-
-        return None
+        # Site city aliases live in the shared resolver (location_resolver.SITE_CITIES)
+        city_code = location_resolver.resolve(location).site_code
+        if city_code:
+            logger.debug(f"Normalized '{location}' → '{city_code}'")
+        return city_code
 
     def _get_sites_for_city(self, city_code: str) -> List[Dict]:
         """Get all sites for a city code from database"""
@@ -180,6 +159,62 @@ class LocationSiteMapper:
         results = db.execute_query(query, (f"%{location}%",))
         return results
 
+    def _get_sites_near(self, location: str) -> List[Dict]:
+        """Sites in the city of the nearest active site within NEAREST_SITE_MAX_MILES"""
+        origin = geo_locator.resolve(location)
+        if not origin:
+            return []
+
+        found = self._get_site_index().nearest(
+            origin.lat, origin.lon, k=1, max_radius_miles=self.NEAREST_SITE_MAX_MILES
+        )
+        if not found:
+            return []
+
+        distance, site = found[0]
+        logger.info(f"Nearest site to '{location}': {site['site_name']} ({distance:.0f} miles)")
+        if site.get('city_code'):
+            sites = self._get_sites_for_city(site['city_code'])
+            if sites:
+                return sites
+        return [site]
+
+    def _get_site_index(self) -> SpatialGrid:
+        """Spatial index of active sites by their address centroid (cached)"""
+        if self._site_index is not None and time.time() - self._site_index_built_at < self.SITE_INDEX_TTL_SECONDS:
+            return self._site_index
+
+        rows = db.execute_query("""
+            SELECT
+                sc.site_id,
+                sc.site_name,
+                sc.coordinator_email,
+                sc.coordinator_user_key,
+                sc.city,
+                sc.state,
+                sc.zip_code,
+                COALESCE(lsm.specialty, 'General Medicine') as specialty,
+                COALESCE(lsm.is_default, false) as is_default,
+                COALESCE(lsm.priority, 0) as priority,
+                lsm.city_code
+            FROM site_coordinators sc
+            LEFT JOIN location_site_mappings lsm ON sc.site_id = lsm.site_id
+            WHERE sc.is_active = TRUE
+        """)
+
+        index = SpatialGrid()
+        for row in rows or []:
+            point = geo_locator.resolve(f"{row.get('city') or ''} {row.get('state') or ''}".strip())
+            if not point:
+                point = geo_locator.resolve(row.get('zip_code') or '')
+            if point:
+                index.insert(point.lat, point.lon, row)
+
+        self._site_index = index
+        self._site_index_built_at = time.time()
+        logger.info(f"Indexed {len(index)} sites for nearest-site lookup")
+        return index
+
     def _rank_by_specialty(self, sites: List[Dict], condition: str) -> List[Dict]:
         """Rank sites by specialty match to condition"""
         if not condition:
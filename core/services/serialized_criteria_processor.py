@@ -158,7 +158,11 @@ Extract ALL inclusion criteria. Be comprehensive and thorough."""
             try:
                 logger.info(f"  Inclusion attempt {attempt + 1}/{self.retry_attempts}...")
                 
-                response = await gemini_service.generate_text(prompt, max_tokens=3000)
+                # Retries must reach the API rather than replay a cached bad response
+                response = await gemini_service.generate_text(
+                    prompt, max_tokens=3000,
+                    cache_namespace="protocol_extraction", use_cache=attempt == 0
+                )
                 latency = time.time() - start_time
                 
                 if not response:
@@ -261,7 +265,11 @@ Extract ALL exclusion criteria. Be comprehensive and thorough."""
             try:
                 logger.info(f"  Exclusion attempt {attempt + 1}/{self.retry_attempts}...")
                 
-                response = await gemini_service.generate_text(prompt, max_tokens=3000)
+                # Retries must reach the API rather than replay a cached bad response
+                response = await gemini_service.generate_text(
+                    prompt, max_tokens=3000,
+                    cache_namespace="protocol_extraction", use_cache=attempt == 0
+                )
                 latency = time.time() - start_time
                 
                 if not response:
@@ -410,7 +418,9 @@ Categories: demographics, laboratory, disease_specific, medical_history, medicat
         }
         
         try:
-            response = await gemini_service.generate_text(prompt, max_tokens=5000)
+            response = await gemini_service.generate_text(
+                prompt, max_tokens=5000, cache_namespace="protocol_extraction"
+            )
             latency = time.time() - start_time
             
             if response:
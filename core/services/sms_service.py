@@ -10,9 +10,10 @@ from typing import Optional, Dict
 import logging
 import os
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 
 from core.database import db
+from core.services.analytics_writer import analytics_writer
 
 logger = logging.getLogger(__name__)
 
@@ -165,9 +166,36 @@ class SMSService:
         twilio_message_sid: Optional[str] = None,
         status: str = 'sent',
         error_message: Optional[str] = None,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        buffered: bool = True
     ):
-        """Log SMS message to database"""
+        """
+        Log SMS message to database
+
+        Buffered logs go through the background analytics writer; pass
+        buffered=False when the caller reads or updates the row right after.
+        Outbound messages are always written synchronously, since
+        check_rate_limit counts them as soon as the next send is attempted.
+        """
+
+        row = {
+            'session_id': session_id,
+            'phone_number': phone_number,
+            'direction': direction,
+            'message_text': message_text,
+            'twilio_message_sid': twilio_message_sid,
+            'status': status,
+            'error_message': error_message,
+            # JSONB column
+            'metadata': metadata or None
+        }
+
+        if buffered and direction != 'outbound':
+            # Stamp the row now so history order doesn't depend on when the writer flushes
+            row['created_at'] = datetime.now(timezone.utc)
+            analytics_writer.enqueue('sms_conversations', row, json_columns=('metadata',))
+            logger.debug(f"💾 SMS log queued | Direction: {direction} | Phone: {phone_number}")
+            return
 
         try:
             query = """
@@ -179,23 +207,10 @@ class SMSService:
 
             # Convert metadata dict to proper JSON string for JSONB column
             import json
-            metadata_json = None
-            if metadata:
-                metadata_json = json.dumps(metadata)
-
-            db.execute_update(
-                query,
-                (
-                    session_id,
-                    phone_number,
-                    direction,
-                    message_text,
-                    twilio_message_sid,
-                    status,
-                    error_message,
-                    metadata_json
-                )
-            )
+            if row['metadata']:
+                row['metadata'] = json.dumps(row['metadata'])
+
+            db.execute_update(query, tuple(row.values()))
 
             logger.debug(f"💾 SMS logged to database | Direction: {direction} | Phone: {phone_number}")
 
@@ -0,0 +1,298 @@
+"""
+Trial Catalog Snapshot
+
+The active trial catalog (trials x investigator sites + latest protocol summary,
+read from the trial_site_summary table) is small and changes rarely, so instead
+of running LIKE '%x%' joins per search it is loaded once into an immutable,
+versioned snapshot with inverted indexes:
+
+- token index:    condition word -> rows
+- n-gram index:   trigram of conditions / site_location -> rows
+- location index: normalized site_location -> rows
+
+Substring filters are answered by intersecting trigram posting lists and
+verifying the candidates, which matches the SQL LIKE semantics exactly.
+Refreshes build a new snapshot and swap the reference atomically, so readers
+never see a half-built catalog.
+
+Writers of trial data call invalidate(), which also bumps the catalog
+generation; caches derived from the catalog (e.g. TrialSearchService's search
+cache) tag entries with the generation they were built under and drop them as
+soon as it changes. Changes made by other workers reach this one through the
+trial_catalog data version (core/services/data_versions.py), which bumps the
+generation the same way.
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, FrozenSet, Tuple
+
+from core.database import db
+from core.services.data_versions import data_versions, CATALOG_SCOPE
+from core.services.trial_site_summary import trial_site_summary
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZE = 3
+
+# Columns returned by TrialSearchService.search_trials / get_trials_by_location
+SEARCH_COLUMNS = ("id", "trial_name", "conditions", "description", "investigator_name",
+                  "site_location", "protocol_summary", "total_sites")
+LOCATION_COLUMNS = ("id", "trial_name", "conditions", "investigator_name",
+                    "site_location", "protocol_summary", "total_sites")
+
+
+def _ngrams(text: str) -> set:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def _tokens(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", text))
+
+
+def _normalize_site_location(location: str) -> str:
+    return " ".join(location.lower().replace(",", " ").split())
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable view of the trial catalog at one point in time"""
+    version: int
+    loaded_at: float
+    rows: Tuple[Dict[str, Any], ...]
+    condition_tokens: Dict[str, FrozenSet[int]]
+    condition_ngrams: Dict[str, FrozenSet[int]]
+    location_ngrams: Dict[str, FrozenSet[int]]
+    locations: Dict[str, FrozenSet[int]]
+
+    @classmethod
+    def build(cls, version: int, rows: List[Dict[str, Any]]) -> "CatalogSnapshot":
+        """Build a snapshot and its indexes from catalog rows"""
+        # Match the ORDER BY ct.conditions, ct.trial_name of the SQL path
+        ordered = sorted(rows, key=lambda r: ((r.get("conditions") or ""), (r.get("trial_name") or "")))
+
+        condition_tokens: Dict[str, set] = {}
+        condition_ngrams: Dict[str, set] = {}
+        location_ngrams: Dict[str, set] = {}
+        locations: Dict[str, set] = {}
+
+        frozen_rows = []
+        for index, row in enumerate(ordered):
+            row = dict(row)
+            row["_conditions_lower"] = (row.get("conditions") or "").lower()
+            row["_location_lower"] = (row.get("site_location") or "").lower()
+            frozen_rows.append(row)
+
+            for token in _tokens(row["_conditions_lower"]):
+                condition_tokens.setdefault(token, set()).add(index)
+            for gram in _ngrams(row["_conditions_lower"]):
+                condition_ngrams.setdefault(gram, set()).add(index)
+            for gram in _ngrams(row["_location_lower"]):
+                location_ngrams.setdefault(gram, set()).add(index)
+            if row["_location_lower"]:
+                locations.setdefault(_normalize_site_location(row["_location_lower"]), set()).add(index)
+
+        def freeze(index: Dict[str, set]) -> Dict[str, FrozenSet[int]]:
+            return {key: frozenset(value) for key, value in index.items()}
+
+        return cls(
+            version=version,
+            loaded_at=time.time(),
+            rows=tuple(frozen_rows),
+            condition_tokens=freeze(condition_tokens),
+            condition_ngrams=freeze(condition_ngrams),
+            location_ngrams=freeze(location_ngrams),
+            locations=freeze(locations)
+        )
+
+    def _substring_matches(self, needle: str, field: str,
+                           ngram_index: Dict[str, FrozenSet[int]]) -> Optional[set]:
+        """Rows whose field contains needle (None means no filter)"""
+        if not needle:
+            return None
+        needle = needle.lower()
+        grams = _ngrams(needle)
+        if not grams:
+            # Too short for the n-gram index; the catalog is small enough to scan
+            return {i for i, row in enumerate(self.rows) if needle in row[field]}
+
+        postings = sorted((ngram_index.get(gram, frozenset()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        return {i for i in candidates if needle in self.rows[i][field]}
+
+    def search(self, condition: Optional[str] = None, location: Optional[str] = None,
+               require_site: bool = True, columns: Tuple[str, ...] = SEARCH_COLUMNS) -> List[Dict[str, Any]]:
+        """
+        Equivalent of the LIKE-filtered catalog query.
+
+        Args:
+            condition: Substring that must appear in the trial's conditions
+            location: Substring that must appear in the site location
+            require_site: Only rows with a site_id (bookable sites)
+            columns: Columns to return (fresh dicts, safe for callers to mutate)
+        """
+        matches = None
+        for needle, field, index in ((condition, "_conditions_lower", self.condition_ngrams),
+                                     (location, "_location_lower", self.location_ngrams)):
+            found = self._substring_matches(needle, field, index)
+            if found is not None:
+                matches = found if matches is None else matches & found
+
+        indices = range(len(self.rows)) if matches is None else sorted(matches)
+
+        results = []
+        seen = set()
+        for i in indices:
+            row = self.rows[i]
+            if require_site and row.get("site_id") is None:
+                continue
+            result = tuple(row.get(column) for column in columns)
+            if result in seen:  # SELECT DISTINCT
+                continue
+            seen.add(result)
+            results.append(dict(zip(columns, result)))
+        return results
+
+    def count_trials(self, location: Optional[str] = None) -> int:
+        """Distinct trials with a site matching location"""
+        found = self._substring_matches(location, "_location_lower", self.location_ngrams)
+        indices = range(len(self.rows)) if found is None else found
+        return len({self.rows[i]["id"] for i in indices})
+
+    def trials_for_token(self, token: str) -> List[int]:
+        """Trial ids whose conditions contain the exact word"""
+        return sorted({self.rows[i]["id"] for i in self.condition_tokens.get(token.lower(), ())})
+
+    def rows_at_location(self, location: str) -> List[Dict[str, Any]]:
+        """Rows whose normalized site location equals location (e.g. "tulsa ok")"""
+        indices = self.locations.get(_normalize_site_location(location), ())
+        return [self.rows[i] for i in sorted(indices)]
+
+
+class TrialCatalog:
+    """
+    Holds the current CatalogSnapshot and refreshes it in the background of reads.
+
+    Readers call snapshot(); a stale or invalidated snapshot is rebuilt by one
+    thread while others keep using the previous one.
+    """
+
+    def __init__(self, refresh_seconds: int = 300, enabled: bool = True):
+        self.refresh_seconds = refresh_seconds
+        self.enabled = enabled
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        self._generation = 0
+        self._data_version: Optional[int] = None
+        self._stale = True
+        self._load_lock = threading.Lock()
+        self._generation_lock = threading.Lock()
+        self._stats = {"loads": 0, "load_errors": 0, "last_load_ms": 0.0}
+
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Current snapshot, loading or refreshing it when needed (None if unavailable)"""
+        if not self.enabled:
+            return None
+
+        self._sync_data_version()
+        current = self._snapshot
+        if current is not None and not self._stale and time.time() - current.loaded_at < self.refresh_seconds:
+            return current
+
+        # Only one thread reloads; others keep serving the previous snapshot
+        blocking = current is None
+        if not self._load_lock.acquire(blocking=blocking):
+            return current
+        try:
+            if self._snapshot is not current and self._snapshot is not None:
+                return self._snapshot
+            return self._load() or current
+        finally:
+            self._load_lock.release()
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped on every invalidate(); results built under an older one are stale"""
+        self._sync_data_version()
+        return self._generation
+
+    def invalidate(self):
+        """Trial data changed: mark the snapshot stale and start a new generation"""
+        with self._generation_lock:
+            self._generation += 1
+        self._stale = True
+
+    def _sync_data_version(self):
+        """Invalidate when another worker changed trial data (data_versions counter moved)"""
+        version = data_versions.get(CATALOG_SCOPE)
+        if version == self._data_version:
+            return
+        with self._generation_lock:
+            if version == self._data_version:
+                return
+            self._data_version = version
+            self._generation += 1
+        self._stale = True
+
+    def _load(self) -> Optional[CatalogSnapshot]:
+        start = time.time()
+        # Cleared before querying so an invalidate() during the load still sticks
+        self._stale = False
+        try:
+            rows = db.execute_query(f"""
+                SELECT
+                    ts.trial_id AS id,
+                    ts.trial_name,
+                    ts.conditions,
+                    ts.description,
+                    ts.investigator_name,
+                    ts.site_location,
+                    ts.site_id,
+                    ts.protocol_summary,
+                    ts.total_sites
+                FROM {trial_site_summary.relation()} ts
+            """)
+        except Exception as e:
+            self._stale = True
+            self._stats["load_errors"] += 1
+            logger.error(f"Failed to load trial catalog snapshot: {e}")
+            return None
+
+        self._version += 1
+        snapshot = CatalogSnapshot.build(self._version, rows or [])
+        self._snapshot = snapshot  # atomic reference swap
+
+        elapsed_ms = (time.time() - start) * 1000
+        self._stats["loads"] += 1
+        self._stats["last_load_ms"] = round(elapsed_ms, 1)
+        logger.info(f"Loaded trial catalog v{snapshot.version}: {len(snapshot.rows)} trial-site rows in {elapsed_ms:.0f}ms")
+        return snapshot
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot version, size and load counters"""
+        current = self._snapshot
+        return {
+            "enabled": self.enabled,
+            "version": current.version if current else None,
+            "generation": self._generation,
+            "data_version": self._data_version,
+            "rows": len(current.rows) if current else 0,
+            "age_seconds": round(time.time() - current.loaded_at, 1) if current else None,
+            "stale": self._stale,
+            **self._stats
+        }
+
+
+# Singleton instance
+trial_catalog = TrialCatalog(
+    refresh_seconds=int(os.getenv("TRIAL_CATALOG_REFRESH_SECONDS", "300")),
+    enabled=os.getenv("TRIAL_CATALOG_ENABLED", "true").lower() == "true"
+)
@@ -1,10 +1,21 @@
 """Trial search service for location-based queries"""
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Callable
 from core.database import db
+from core.async_database import async_db
+from core.services.trial_catalog import trial_catalog, LOCATION_COLUMNS
+from core.services.geo_locator import geo_locator, haversine_miles
+from core.services.location_resolver import location_resolver
+from core.services.trial_site_summary import trial_site_summary
+from core.services.analytics_writer import analytics_writer
+from core.services.completion_stats import completion_stats
+import asyncio
 import logging
+import threading
 import time
 import json
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -12,86 +23,135 @@ logger = logging.getLogger(__name__)
 class TrialSearchService:
     """Service for searching and formatting trial information"""
 
+    # Reciprocal-rank fusion constant (score = sum of 1 / (RRF_K + rank))
+    RRF_K = 60
+
     def __init__(self):
         """Initialize with cache"""
-        # Cache: {(condition, location): (results, timestamp)}
-        self._search_cache: Dict[Tuple[str, str], Tuple[List[Dict[str, Any]], datetime]] = {}
+        # Cache: {(scope, condition, location): (results, stored_at, catalog generation)}, LRU order
+        self._search_cache: "OrderedDict[Tuple[str, str, str], Tuple[List[Dict[str, Any]], float, int]]" = OrderedDict()
         self._cache_ttl = timedelta(minutes=5)  # 5 minute cache
+        self._empty_cache_ttl = timedelta(seconds=30)  # "no trials" answers go stale quickly
         self._max_cache_size = 100
+        self._cache_lock = threading.Lock()
+        # Loads currently running, so concurrent misses on one key share a single query
+        self._inflight: Dict[Tuple[str, str, str], Future] = {}
 
-    def _get_cache_key(self, condition: str = None, location: str = None) -> Tuple[str, str]:
+    def _get_cache_key(self, condition: str = None, location: str = None,
+                       scope: str = "search") -> Tuple[str, str, str]:
         """Generate cache key from condition and location"""
         return (
+            scope,
             (condition or "").lower().strip(),
             (location or "").lower().strip()
         )
 
-    def _get_from_cache(self, condition: str = None, location: str = None):
-        """Get results from cache if not expired"""
-        cache_key = self._get_cache_key(condition, location)
+    def _get_from_cache(self, condition: str = None, location: str = None, scope: str = "search"):
+        """Get results from cache if not expired or invalidated by a trial data change"""
+        cache_key = self._get_cache_key(condition, location, scope)
 
-        if cache_key in self._search_cache:
-            results, timestamp = self._search_cache[cache_key]
+        with self._cache_lock:
+            entry = self._search_cache.get(cache_key)
+            if entry is None:
+                return None
 
-            # Check if cache is still fresh
-            if datetime.now() - timestamp < self._cache_ttl:
-                logger.info(f"Cache hit for search: condition={condition}, location={location}")
-                return results
-            else:
-                # Expired, remove it
+            results, stored_at, generation = entry
+            ttl = self._cache_ttl if results else self._empty_cache_ttl
+
+            # Check if cache is still fresh and no trial data changed since it was built
+            if generation != trial_catalog.generation or time.time() - stored_at >= ttl.total_seconds():
                 del self._search_cache[cache_key]
+                return None
 
-        return None
+            self._search_cache.move_to_end(cache_key)
 
-    def _save_to_cache(self, results: List[Dict[str, Any]], condition: str = None, location: str = None):
-        """Save results to cache"""
-        cache_key = self._get_cache_key(condition, location)
+        logger.info(f"Cache hit for search: condition={condition}, location={location}")
+        return results
+
+    def _save_to_cache(self, results: List[Dict[str, Any]], condition: str = None, location: str = None,
+                       scope: str = "search", generation: Optional[int] = None):
+        """
+        Save results to cache.
+
+        generation is the catalog generation read before the results were
+        loaded; if trial data changed during the load they are not cached.
+        """
+        if generation is None:
+            generation = trial_catalog.generation
+        if generation != trial_catalog.generation:
+            return
 
-        # Simple LRU: if cache is full, remove oldest entry
-        if len(self._search_cache) >= self._max_cache_size:
-            oldest_key = min(self._search_cache.keys(), key=lambda k: self._search_cache[k][1])
-            del self._search_cache[oldest_key]
+        cache_key = self._get_cache_key(condition, location, scope)
+
+        with self._cache_lock:
+            self._search_cache[cache_key] = (results, time.time(), generation)
+            self._search_cache.move_to_end(cache_key)
+            while len(self._search_cache) > self._max_cache_size:
+                self._search_cache.popitem(last=False)
 
-        self._search_cache[cache_key] = (results, datetime.now())
         logger.info(f"Cached search results: condition={condition}, location={location}, count={len(results)}")
 
+    def _load_once(self, cache_key: Tuple[str, str, str], loader: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Run loader, or wait for the identical load another thread already started"""
+        with self._cache_lock:
+            pending = self._inflight.get(cache_key)
+            if pending is None:
+                future = Future()
+                self._inflight[cache_key] = future
+
+        if pending is not None:
+            return pending.result()
+
+        try:
+            results = loader()
+            future.set_result(results)
+            return results
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._cache_lock:
+                self._inflight.pop(cache_key, None)
+
     def get_trials_by_location(self, location: str) -> List[Dict[str, Any]]:
         """Get all trials available in a specific location"""
 
         # Check cache first
-        cached_results = self._get_from_cache(condition=None, location=location)
+        cached_results = self._get_from_cache(location=location, scope="location")
         if cached_results is not None:
             return cached_results
 
-        trials = db.execute_query("""
+        return self._load_once(
+            self._get_cache_key(location=location, scope="location"),
+            lambda: self._load_trials_by_location(location)
+        )
+
+    def _load_trials_by_location(self, location: str) -> List[Dict[str, Any]]:
+        """Uncached body of get_trials_by_location"""
+        generation = trial_catalog.generation
+
+        catalog = trial_catalog.snapshot()
+        if catalog is not None:
+            trials = catalog.search(location=location, require_site=False, columns=LOCATION_COLUMNS)
+            self._save_to_cache(trials, location=location, scope="location", generation=generation)
+            return trials
+
+        trials = db.execute_query(f"""
             SELECT DISTINCT
-                ct.id,
-                ct.trial_name,
-                ct.conditions,
-                ti.investigator_name,
-                ti.site_location,
-                pm.protocol_summary,
-                site_counts.total_sites
-            FROM clinical_trials ct
-            JOIN trial_investigators ti ON ct.id = ti.trial_id
-            LEFT JOIN (
-                SELECT DISTINCT ON (trial_id) 
-                trial_id, protocol_summary 
-                FROM protocol_metadata 
-                ORDER BY trial_id, created_at DESC
-            ) pm ON ct.id = pm.trial_id
-            LEFT JOIN (
-                SELECT trial_id, COUNT(*) as total_sites
-                FROM trial_investigators
-                GROUP BY trial_id
-            ) site_counts ON ct.id = site_counts.trial_id
-            WHERE ct.id IS NOT NULL
-            AND LOWER(ti.site_location) LIKE LOWER(%s)
-            ORDER BY ct.conditions, ct.trial_name
+                ts.trial_id AS id,
+                ts.trial_name,
+                ts.conditions,
+                ts.investigator_name,
+                ts.site_location,
+                ts.protocol_summary,
+                ts.total_sites
+            FROM {trial_site_summary.relation()} ts
+            WHERE LOWER(ts.site_location) LIKE LOWER(%s)
+            ORDER BY ts.conditions, ts.trial_name
         """, (f"%{location}%",))
 
         # Save to cache
-        self._save_to_cache(trials, condition=None, location=location)
+        self._save_to_cache(trials, location=location, scope="location", generation=generation)
 
         return trials
     
@@ -149,6 +209,9 @@ class TrialSearchService:
     
     def get_trial_count_by_location(self, location: str) -> int:
         """Get count of trials in a location"""
+        catalog = trial_catalog.snapshot()
+        if catalog is not None:
+            return catalog.count_trials(location=location)
         
         result = db.execute_query("""
             SELECT COUNT(DISTINCT ct.id) as count
@@ -186,59 +249,70 @@ class TrialSearchService:
         if cached_results is not None:
             return cached_results
 
+        return self._load_once(
+            self._get_cache_key(condition, location),
+            lambda: self._search_trials_uncached(condition, location, session_id)
+        )
+
+    def _search_trials_uncached(self, condition: str = None, location: str = None,
+                                session_id: str = None) -> List[Dict[str, Any]]:
+        """Uncached body of search_trials"""
         # Start timing for analytics
         start_time = time.time()
+        generation = trial_catalog.generation
+
+        # Normalize for better matching (handle plurals, common variations)
+        normalized_condition = self._normalize_condition(condition) if condition else None
+        normalized_location = self._normalize_location(location) if location else None
+
+        # Answer from the in-memory catalog snapshot when it is available
+        catalog = trial_catalog.snapshot()
+        if catalog is not None:
+            trials = catalog.search(condition=normalized_condition, location=normalized_location)
+            logger.info(f"Found {len(trials)} trials matching search criteria (catalog v{catalog.version})")
+            if session_id:
+                self._log_search_analytics(
+                    session_id=session_id,
+                    condition=condition,
+                    location=location,
+                    trials=trials,
+                    start_time=start_time,
+                    search_type='keyword'
+                )
+            self._save_to_cache(trials, condition=condition, location=location, generation=generation)
+            return trials
         
         # Build dynamic query based on provided parameters
-        base_query = """
+        base_query = f"""
             SELECT DISTINCT
-                ct.id,
-                ct.trial_name,
-                ct.conditions,
-                ct.description,
-                ti.investigator_name,
-                ti.site_location,
-                pm.protocol_summary,
-                site_counts.total_sites
-            FROM clinical_trials ct
-            JOIN trial_investigators ti ON ct.id = ti.trial_id
-            LEFT JOIN (
-                SELECT DISTINCT ON (trial_id) 
-                trial_id, protocol_summary 
-                FROM protocol_metadata 
-                ORDER BY trial_id, created_at DESC
-            ) pm ON ct.id = pm.trial_id
-            LEFT JOIN (
-                SELECT trial_id, COUNT(*) as total_sites
-                FROM trial_investigators
-                GROUP BY trial_id
-            ) site_counts ON ct.id = site_counts.trial_id
+                ts.trial_id AS id,
+                ts.trial_name,
+                ts.conditions,
+                ts.description,
+                ts.investigator_name,
+                ts.site_location,
+                ts.protocol_summary,
+                ts.total_sites
+            FROM {trial_site_summary.relation()} ts
         """
         
         conditions = []
         params = []
 
-        # Always add a basic WHERE clause for data consistency
-        conditions.append("ct.id IS NOT NULL")
-
         # Exclude orphaned trials (trials without proper site assignment)
         # These have site_location text but no site_id, can't be booked
-        conditions.append("ti.site_id IS NOT NULL")
+        conditions.append("ts.site_id IS NOT NULL")
         
         if condition:
-            # Normalize condition for better matching (handle plurals, common variations)
-            normalized_condition = self._normalize_condition(condition)
-            conditions.append("LOWER(ct.conditions) LIKE LOWER(%s)")
+            conditions.append("LOWER(ts.conditions) LIKE LOWER(%s)")
             params.append(f"%{normalized_condition}%")
         
         if location:
-            # Normalize location for better matching
-            normalized_location = self._normalize_location(location)
-            conditions.append("LOWER(ti.site_location) LIKE LOWER(%s)")
+            conditions.append("LOWER(ts.site_location) LIKE LOWER(%s)")
             params.append(f"%{normalized_location}%")
         
         base_query += " WHERE " + " AND ".join(conditions)
-        base_query += " ORDER BY ct.conditions, ct.trial_name"
+        base_query += " ORDER BY ts.conditions, ts.trial_name"
         
         logger.info(f"Searching trials with condition='{condition}', location='{location}'")
         
@@ -258,7 +332,7 @@ class TrialSearchService:
                 )
 
             # Save to cache
-            self._save_to_cache(trials, condition=condition, location=location)
+            self._save_to_cache(trials, condition=condition, location=location, generation=generation)
 
             return trials
         except Exception as e:
@@ -270,7 +344,9 @@ class TrialSearchService:
         condition: str = None,
         location: str = None,
         session_id: str = None,
-        similarity_threshold: float = 0.70
+        similarity_threshold: float = 0.70,
+        validate: bool = True,
+        cache_results: bool = True
     ) -> List[Dict[str, Any]]:
         """
         Search trials using semantic embeddings for condition matching.
@@ -281,6 +357,8 @@ class TrialSearchService:
             location: Geographic location to filter by
             session_id: Session ID for analytics tracking
             similarity_threshold: Minimum cosine similarity (default: 0.70)
+            validate: Drop results that fail the keyword sanity check
+            cache_results: Save results to the search cache
 
         Returns:
             List of trials ranked by semantic similarity
@@ -292,6 +370,7 @@ class TrialSearchService:
             return []
 
         start_time = time.time()
+        generation = trial_catalog.generation
 
         try:
             # Generate query embedding
@@ -305,33 +384,21 @@ class TrialSearchService:
             # Build query with hybrid approach:
             # 1. Filter by location (keyword - fast and precise)
             # 2. Rank by semantic similarity (vector - catches variations)
-            query = """
+            relation = await async_db.run_sync(trial_site_summary.relation)
+            query = f"""
                 SELECT DISTINCT
-                    ct.id,
-                    ct.trial_name,
-                    ct.conditions,
-                    ct.description,
-                    ti.investigator_name,
-                    ti.site_location,
-                    pm.protocol_summary,
-                    site_counts.total_sites,
-                    (1 - (ct.semantic_embedding <=> %s::vector)) as similarity_score
-                FROM clinical_trials ct
-                JOIN trial_investigators ti ON ct.id = ti.trial_id
-                LEFT JOIN (
-                    SELECT DISTINCT ON (trial_id)
-                    trial_id, protocol_summary
-                    FROM protocol_metadata
-                    ORDER BY trial_id, created_at DESC
-                ) pm ON ct.id = pm.trial_id
-                LEFT JOIN (
-                    SELECT trial_id, COUNT(*) as total_sites
-                    FROM trial_investigators
-                    GROUP BY trial_id
-                ) site_counts ON ct.id = site_counts.trial_id
-                WHERE ct.id IS NOT NULL
-                  AND ti.site_id IS NOT NULL
-                  AND ct.semantic_embedding IS NOT NULL
+                    ts.trial_id AS id,
+                    ts.trial_name,
+                    ts.conditions,
+                    ts.description,
+                    ts.investigator_name,
+                    ts.site_location,
+                    ts.protocol_summary,
+                    ts.total_sites,
+                    (1 - (ts.semantic_embedding <=> %s::vector)) as similarity_score
+                FROM {relation} ts
+                WHERE ts.site_id IS NOT NULL
+                  AND ts.semantic_embedding IS NOT NULL
             """
 
             params = [condition_embedding[0]]
@@ -339,39 +406,28 @@ class TrialSearchService:
             # Add location filter if provided
             if location:
                 normalized_location = self._normalize_location(location)
-                query += " AND LOWER(ti.site_location) LIKE LOWER(%s)"
+                query += " AND LOWER(ts.site_location) LIKE LOWER(%s)"
                 params.append(f"%{normalized_location}%")
 
             # Filter by similarity threshold and order by relevance
             query += """
-                AND (1 - (ct.semantic_embedding <=> %s::vector)) > %s
+                AND (1 - (ts.semantic_embedding <=> %s::vector)) > %s
                 ORDER BY similarity_score DESC
                 LIMIT 20
             """
             params.extend([condition_embedding[0], similarity_threshold])
 
-            trials = db.execute_query(query, tuple(params))
+            trials = await async_db.execute_query(query, tuple(params))
 
             logger.info(f"Semantic search found {len(trials)} trials (threshold: {similarity_threshold})")
 
             # CRITICAL VALIDATION: Filter out trials that don't actually match the condition
             # Semantic search can return false positives, so validate with keyword matching
-            if trials and condition:
+            if trials and condition and validate:
                 validated_trials = []
-                condition_lower = condition.lower()
-                condition_words = set(word for word in condition_lower.split() if len(word) > 3)
 
                 for trial in trials:
-                    trial_conditions = trial.get('conditions', '').lower()
-
-                    # Check if there's a reasonable keyword match
-                    is_valid = (
-                        condition_lower in trial_conditions or
-                        trial_conditions in condition_lower or
-                        any(word in trial_conditions for word in condition_words)
-                    )
-
-                    if is_valid:
+                    if self._matches_condition(condition, trial):
                         validated_trials.append(trial)
                     else:
                         logger.warning(f"⚠️  Semantic search returned Trial {trial['id']} ({trial['conditions']}) for '{condition}' - filtering out as irrelevant")
@@ -391,7 +447,8 @@ class TrialSearchService:
                 )
 
             # Save to cache
-            self._save_to_cache(trials, condition=condition, location=location)
+            if cache_results:
+                self._save_to_cache(trials, condition=condition, location=location, generation=generation)
 
             return trials
 
@@ -399,90 +456,237 @@ class TrialSearchService:
             logger.error(f"Error in semantic search: {str(e)}")
             return []
 
+    @staticmethod
+    def _matches_condition(condition: str, trial: Dict[str, Any]) -> bool:
+        """Keyword sanity check for semantic hits (filters vector false positives)"""
+        condition_lower = condition.lower()
+        trial_conditions = (trial.get('conditions') or '').lower()
+        condition_words = set(word for word in condition_lower.split() if len(word) > 3)
+        return (
+            condition_lower in trial_conditions or
+            trial_conditions in condition_lower or
+            any(word in trial_conditions for word in condition_words)
+        )
+
     async def search_trials_hybrid(
         self,
         condition: str = None,
         location: str = None,
-        session_id: str = None
+        session_id: str = None,
+        expand_metro: bool = True
     ) -> List[Dict[str, Any]]:
         """
-        Hybrid search: Try semantic first, fallback to keyword if needed.
-        Best of both worlds - semantic catches variations, keyword is reliable fallback.
+        Hybrid search: keyword and vector retrieval run concurrently and are
+        merged with reciprocal-rank fusion, so latency is the slower of the two
+        rather than their sum. If nothing matches and the location is a known
+        metro area, the surrounding cities are searched concurrently as well.
 
         Args:
             condition: Medical condition to search for
             location: Geographic location
             session_id: Session ID for analytics
+            expand_metro: Search the metro area when the location itself has no trials
 
         Returns:
-            List of matching trials
+            List of matching trials, best fused rank first
         """
-        # Try semantic search first
-        semantic_results = await self.search_trials_semantic(
-            condition=condition,
-            location=location,
-            session_id=session_id,
-            similarity_threshold=0.70
-        )
+        start_time = time.time()
+        trials = await self._search_hybrid_location(condition, location)
 
-        # If semantic found results, use them
-        if semantic_results and len(semantic_results) > 0:
-            logger.info(f"✓ Semantic search successful: {len(semantic_results)} trials found")
-            return semantic_results
-
-        # Fallback to keyword search
-        logger.info("Semantic search found nothing - falling back to keyword search")
-        keyword_results = self.search_trials(
-            condition=condition,
-            location=location,
-            session_id=session_id
+        if not trials and location and expand_metro:
+            # This allows "St. Louis" to find trials in Wildwood, Town and Country, etc.
+            metro_locations = [
+                metro_location for metro_location in self._get_metro_area_locations(location)
+                if metro_location.lower() != location.lower().strip()
+            ]
+            if metro_locations:
+                metro_results = await asyncio.gather(*(
+                    self._search_hybrid_location(condition, metro_location)
+                    for metro_location in metro_locations
+                ))
+                seen = set()
+                for metro_location, results in zip(metro_locations, metro_results):
+                    for trial in results:
+                        key = (trial['id'], trial.get('investigator_name'), trial.get('site_location'))
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        trials.append(dict(trial, found_in_metro_location=metro_location))
+                if trials:
+                    logger.info(f"Metro expansion found {len(trials)} trials for {condition} near {location}")
+
+        if session_id:
+            await async_db.run_sync(
+                self._log_search_analytics,
+                session_id=session_id,
+                condition=condition,
+                location=location,
+                trials=trials,
+                start_time=start_time,
+                search_type='hybrid_rrf'
+            )
+
+        return trials
+
+    async def _search_hybrid_location(self, condition: str = None,
+                                      location: str = None) -> List[Dict[str, Any]]:
+        """Run keyword and semantic search for one location concurrently and fuse them"""
+        keyword_search = async_db.run_sync(self.search_trials, condition=condition, location=location)
+        if not condition:
+            return list(await keyword_search)
+
+        semantic_results, keyword_results = await asyncio.gather(
+            self.search_trials_semantic(
+                condition=condition,
+                location=location,
+                similarity_threshold=0.70,
+                validate=False,
+                cache_results=False
+            ),
+            keyword_search,
+            return_exceptions=True
         )
+        if isinstance(semantic_results, Exception):
+            logger.error(f"Semantic search failed in hybrid search: {semantic_results}")
+            semantic_results = []
+        if isinstance(keyword_results, Exception):
+            logger.error(f"Keyword search failed in hybrid search: {keyword_results}")
+            keyword_results = []
 
-        return keyword_results
+        return self._fuse_results(condition, semantic_results, keyword_results)
+
+    def _fuse_results(self, condition: str, semantic_results: List[Dict[str, Any]],
+                      keyword_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Reciprocal-rank fusion of semantic and keyword result lists.
+
+        Trials are ranked by their first row in each list; semantic hits failing
+        the keyword sanity check are dropped in the same pass. All site rows of a
+        surviving trial are returned, grouped under the trial's fused rank.
+        """
+        scores: Dict[int, float] = {}
+        rows_by_trial: Dict[int, List[Dict[str, Any]]] = {}
+        seen_rows = set()
+        rejected = set()
+
+        for results, validate in ((semantic_results, True), (keyword_results, False)):
+            rank = 0
+            ranked = set()
+            for trial in results:
+                trial_id = trial['id']
+                if validate and (trial_id in rejected or not self._matches_condition(condition, trial)):
+                    if trial_id not in rejected:
+                        rejected.add(trial_id)
+                        logger.warning(f"⚠️  Semantic search returned Trial {trial_id} ({trial['conditions']}) for '{condition}' - filtering out as irrelevant")
+                    continue
+
+                if trial_id not in ranked:
+                    ranked.add(trial_id)
+                    rank += 1
+                    scores[trial_id] = scores.get(trial_id, 0.0) + 1.0 / (self.RRF_K + rank)
+
+                row_key = (trial_id, trial.get('investigator_name'), trial.get('site_location'))
+                if row_key not in seen_rows:
+                    seen_rows.add(row_key)
+                    rows_by_trial.setdefault(trial_id, []).append(dict(trial))
+
+        fused = []
+        for trial_id in sorted(scores, key=lambda t: scores[t], reverse=True):
+            for row in rows_by_trial[trial_id]:
+                row['rrf_score'] = round(scores[trial_id], 6)
+                fused.append(row)
+
+        logger.info(f"Hybrid search fused {len(semantic_results)} semantic + {len(keyword_results)} keyword rows into {len(fused)} ({len(scores)} trials)")
+        return fused
+
+    @staticmethod
+    def _trial_embedding_text(trial: Dict[str, Any]) -> str:
+        """Text embedded for clinical_trials.semantic_embedding"""
+        return f"Clinical trial: {trial.get('conditions', '')} {trial.get('trial_name', '')}"
+
+    async def get_trial_embeddings(self, trials: List[Dict[str, Any]]) -> Dict[int, List[float]]:
+        """
+        Get stored semantic embeddings for the given trials, keyed by trial id.
+
+        Reads clinical_trials.semantic_embedding in one query. Missing vectors
+        are embedded for this request with a single batched call but not
+        stored: writing clinical_trials from a search would fire the
+        trial_site_summary and data_versions triggers. backfill_trial_embeddings
+        (backfill_trial_embeddings.py) stores them offline.
+        """
+        from core.services.gemini_service import gemini_service
+
+        trials_by_id = {}
+        for trial in trials:
+            if trial.get('id') is not None:
+                trials_by_id.setdefault(trial['id'], trial)
+        if not trials_by_id:
+            return {}
+
+        rows = await async_db.execute_query("""
+            SELECT id, semantic_embedding::text AS embedding
+            FROM clinical_trials
+            WHERE id = ANY(%s)
+        """, (list(trials_by_id.keys()),))
+
+        embeddings = {}
+        for row in rows:
+            if row['embedding']:
+                embeddings[row['id']] = json.loads(row['embedding'])
+
+        missing_ids = [trial_id for trial_id in trials_by_id if trial_id not in embeddings]
+        if missing_ids:
+            logger.info(f"Embedding {len(missing_ids)} trials without a stored semantic embedding")
+            result = await gemini_service.generate_embeddings_batch(
+                [self._trial_embedding_text(trials_by_id[trial_id]) for trial_id in missing_ids]
+            )
+            for trial_id, embedding in zip(missing_ids, result["embeddings"]):
+                if embedding is not None:
+                    embeddings[trial_id] = embedding
+
+        return embeddings
+
+    async def backfill_trial_embeddings(self, batch_size: int = 100) -> int:
+        """
+        Store semantic embeddings for every trial that has none (offline job).
+
+        Returns:
+            Number of trials updated
+        """
+        from core.services.gemini_service import gemini_service
+
+        trials = await async_db.execute_query("""
+            SELECT id, trial_name, conditions
+            FROM clinical_trials
+            WHERE semantic_embedding IS NULL
+            ORDER BY id
+        """)
+
+        updated = 0
+        for i in range(0, len(trials), batch_size):
+            batch = trials[i:i + batch_size]
+            result = await gemini_service.generate_embeddings_batch(
+                [self._trial_embedding_text(trial) for trial in batch]
+            )
+            values = [
+                (trial['id'], str(embedding))
+                for trial, embedding in zip(batch, result["embeddings"])
+                if embedding is not None
+            ]
+            if not values:
+                continue
+            # One statement per batch, so the summary/version triggers fire once
+            values_sql = ", ".join(["(%s, %s)"] * len(values))
+            updated += await async_db.execute_update(f"""
+                UPDATE clinical_trials ct
+                SET semantic_embedding = v.embedding::vector
+                FROM (VALUES {values_sql}) AS v(id, embedding)
+                WHERE ct.id = v.id AND ct.semantic_embedding IS NULL
+            """, tuple(value for row in values for value in row))
+            logger.info(f"Backfilled semantic embeddings for {updated}/{len(trials)} trials")
+
+        return updated
 
-    def _normalize_location(self, location: str) -> str:
-        """Normalize location strings for better matching"""
-        if not location:
-            return location
-            
-        # Convert common state name variations to abbreviations
-        state_mapping = {
-            'louisiana': 'LA',
-            'texas': 'TX', 
-            'georgia': 'GA',
-            'tennessee': 'TN',
-            'north carolina': 'NC',
-            'south carolina': 'SC',
-            'mississippi': 'MS',
-            'kentucky': 'KY',
-            'kansas': 'KS',
-            'ohio': 'OH',
-            'indiana': 'IN',
-            'maryland': 'MD',
-            'missouri': 'MO',
-            'oklahoma': 'OK'
-        }
-        
-        location_lower = location.lower()
-        
-        # Check for state name replacements
-        for state_name, state_abbr in state_mapping.items():
-            if state_name in location_lower:
-                location = location_lower.replace(state_name, state_abbr)
-                break
-        
-        # Remove common separators and extra spaces
-        location = location.replace(',', '').strip()
-        
-        # If it ends with just the state abbreviation, try just the city
-        parts = location.split()
-        if len(parts) >= 2 and parts[-1].upper() in state_mapping.values():
-            # Try both full location and just city name
-            city_only = ' '.join(parts[:-1])
-            return city_only
-        
-        return location
-    
     def _log_search_analytics(self, session_id: str, condition: str, location: str, 
                              trials: List[Dict[str, Any]], start_time: float, 
                              search_type: str = 'keyword'):
@@ -508,24 +712,19 @@ class TrialSearchService:
                     'relevance': similarity
                 })
             
-            # Insert search analytics
-            db.execute_update("""
-                INSERT INTO search_analytics 
-                (session_id, search_type, query_condition, query_location, 
-                 similarity_scores, matched_trials, search_duration_ms, results_count)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                session_id,
-                search_type,
-                condition or '',
-                location or '',
-                json.dumps(similarity_scores),
-                json.dumps(matched_trials),
-                search_duration,
-                len(trials)
-            ))
+            # Queued for the background analytics writer; JSON is encoded off the request path
+            analytics_writer.enqueue('search_analytics', {
+                'session_id': session_id,
+                'search_type': search_type,
+                'query_condition': condition or '',
+                'query_location': location or '',
+                'similarity_scores': similarity_scores,
+                'matched_trials': matched_trials,
+                'search_duration_ms': search_duration,
+                'results_count': len(trials)
+            }, json_columns=('similarity_scores', 'matched_trials'))
             
-            logger.info(f"Logged search analytics: {len(trials)} results in {search_duration}ms")
+            logger.info(f"Queued search analytics: {len(trials)} results in {search_duration}ms")
             
         except Exception as e:
             logger.warning(f"Failed to log search analytics: {str(e)}")
@@ -751,208 +950,25 @@ class TrialSearchService:
     
     def _normalize_location(self, location: str) -> str:
         """
-        Normalize location for better matching.
+        Normalize location for better matching against site_location.
 
-        Handles:
+        Handles (via the shared location resolver):
         - ZIP codes: "30297" → "Atlanta"
         - City+State+ZIP: "Charleston sc 29485" → "Charleston"
-        - City+State: "Springfield Missouri" → "Springfield, MO"
+        - City+State: "Springfield Missouri" → "springfield"
         - Common abbreviations: "atl" → "atlanta"
         - Typos: "tulsa o" → "tulsa"
         """
         if not location:
             return location
 
-        original_location = location
-        normalized = location.strip()
-
-        logger.info(f"📍 NORMALIZING LOCATION: '{original_location}'")
-
-        # Step 1: Extract city from complex formats FIRST
-        normalized = self._extract_city_from_complex_location(normalized)
-        if normalized != original_location:
-            logger.info(f"   → Complex format extracted: '{normalized}'")
-
-        # Step 2: Handle common location variations and typos
-        location_mappings = {
-            'new orleans': 'new orleans',
-            'nola': 'new orleans',
-            'atlanta': 'atlanta',
-            'atl': 'atlanta',
-            'baton rouge': 'baton rouge',
-            'br': 'baton rouge',
-            'tulsa': 'tulsa',
-            'tul': 'tulsa',
-            'st louis': 'st. louis',
-            'st. louis': 'st. louis',
-            'saint louis': 'st. louis',
-        }
-
-        normalized_lower = normalized.lower().strip()
-
-        # Exact match
-        if normalized_lower in location_mappings:
-            result = location_mappings[normalized_lower]
-            logger.info(f"   → Mapped: '{result}'")
-            return result
-
-        # Handle partial matches and typos (e.g., "tulsa o" → "tulsa")
-        # Remove trailing single letters that might be typos or incomplete words
-        if len(normalized_lower) > 3 and normalized_lower[-2] == ' ' and normalized_lower[-1].isalpha():
-            without_last = normalized_lower[:-2].strip()
-            if without_last in location_mappings:
-                result = location_mappings[without_last]
-                logger.info(f"   → Typo corrected: '{result}'")
-                return result
-
-        # Check if it starts with a known location (e.g., "tulsa ok" → "tulsa")
-        for key in location_mappings:
-            if normalized_lower.startswith(key + ' '):
-                result = location_mappings[key]
-                logger.info(f"   → Prefix matched: '{result}'")
-                return result
-
-        logger.info(f"   → No normalization applied, using: '{normalized}'")
+        resolved = location_resolver.resolve(location)
+        normalized = resolved.search_term
+        if normalized != location:
+            logger.info(f"📍 Normalized location '{location}' → '{normalized}' "
+                        f"(city={resolved.city}, state={resolved.state}, zip={resolved.zip_code}, sites={list(resolved.site_codes)})")
         return normalized
 
-    def _extract_city_from_complex_location(self, location: str) -> str:
-        """
-        Extract clean city name from complex location formats.
-
-        Patterns handled:
-        - "Charleston sc 29485" → "Charleston"
-        - "St Louis Missouri 63116" → "St Louis"
-        - "springfield mo.myzip is 65804" → "Springfield"
-        - "30297" → "Atlanta" (ZIP only)
-        - "Atlanta GA" → "Atlanta"
-        """
-        import re
-
-        # Remove extra text like "myzip is" or "my zip is"
-        location = re.sub(r'\.?my\s*zip\s*(code)?\s*is\s*', ' ', location, flags=re.IGNORECASE)
-        location = location.strip()
-
-        logger.debug(f"   🔍 Extracting from: '{location}'")
-
-        # Pattern 1: ZIP code only (5 digits)
-        zip_only = re.match(r'^(\d{5})$', location)
-        if zip_only:
-            zip_code = zip_only.group(1)
-            city = self._zip_to_city(zip_code)
-            if city:
-                logger.info(f"   ✅ ZIP→City: '{zip_code}' → '{city}'")
-                return city
-            logger.warning(f"   ⚠️  ZIP code '{zip_code}' not recognized")
-            return location
-
-        # Pattern 2: City State ZIP (e.g., "Charleston sc 29485", "St Louis Missouri 63116")
-        match = re.match(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+([A-Z]{2}|[A-Za-z]+)\s+(\d{5})', location, re.IGNORECASE)
-        if match:
-            city, state, zip_code = match.groups()
-            result = f"{city.title()}"
-            logger.info(f"   ✅ City+State+ZIP extracted: '{result}'")
-            return result
-
-        # Pattern 3: City State (no ZIP) (e.g., "Springfield Missouri", "Atlanta GA")
-        match = re.match(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+([A-Z]{2}|[A-Za-z]+)$', location, re.IGNORECASE)
-        if match:
-            city, state = match.groups()
-            result = f"{city.title()}"
-            logger.info(f"   ✅ City+State extracted: '{result}'")
-            return result
-
-        # No pattern matched - return as-is
-        return location
-
-    def _zip_to_city(self, zip_code: str) -> Optional[str]:
-        """
-        Convert ZIP code to city name.
-
-        Uses ZIP code prefix mapping based on DelRicht site locations.
-        """
-        # ZIP code to city mapping (based on US ZIP code prefixes)
-        zip_mappings = {
-            # Georgia (30xxx)
-            '30': 'Atlanta',
-
-            # South Carolina (29xxx)
-            '29': 'Charleston',
-
-            # Louisiana (70xxx)
-            '700': 'New Orleans',  # 700xx specific to New Orleans
-            '701': 'Baton Rouge',  # 701xx specific to Baton Rouge
-
-            # Missouri (63xxx, 64xxx, 65xxx)
-            '630': 'St. Louis',
-            '631': 'St. Louis',
-            '640': 'Kansas City',
-            '641': 'Kansas City',
-            '658': 'Springfield',
-
-            # Oklahoma (74xxx)
-            '74': 'Tulsa',
-
-            # Tennessee (37xxx, 38xxx)
-            '37': 'Nashville',
-            '38': 'Memphis',
-
-            # Texas (75xxx, 76xxx)
-            '750': 'Dallas',
-            '751': 'Dallas',
-            '752': 'Dallas',
-            '76': 'Fort Worth',
-
-            # North Carolina (28xxx)
-            '28': 'Charlotte',
-
-            # Ohio (45xxx)
-            '45': 'Cincinnati',
-        }
-
-        # Try 3-digit prefix first (more specific)
-        if zip_code[:3] in zip_mappings:
-            return zip_mappings[zip_code[:3]]
-
-        # Try 2-digit prefix
-        if zip_code[:2] in zip_mappings:
-            return zip_mappings[zip_code[:2]]
-
-        return None
-
-    def _normalize_state_name(self, state: str) -> str:
-        """
-        Convert state name to standard abbreviation.
-
-        Examples:
-            "Missouri" → "MO"
-            "mo" → "MO"
-            "MO" → "MO"
-        """
-        state_upper = state.upper().strip()
-
-        # Already an abbreviation
-        if len(state_upper) == 2:
-            return state_upper
-
-        # State name → abbreviation mapping
-        state_name_map = {
-            'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR',
-            'CALIFORNIA': 'CA', 'COLORADO': 'CO', 'CONNECTICUT': 'CT', 'DELAWARE': 'DE',
-            'FLORIDA': 'FL', 'GEORGIA': 'GA', 'HAWAII': 'HI', 'IDAHO': 'ID',
-            'ILLINOIS': 'IL', 'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS',
-            'KENTUCKY': 'KY', 'LOUISIANA': 'LA', 'MAINE': 'ME', 'MARYLAND': 'MD',
-            'MASSACHUSETTS': 'MA', 'MICHIGAN': 'MI', 'MINNESOTA': 'MN', 'MISSISSIPPI': 'MS',
-            'MISSOURI': 'MO', 'MONTANA': 'MT', 'NEBRASKA': 'NE', 'NEVADA': 'NV',
-            'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ', 'NEW MEXICO': 'NM', 'NEW YORK': 'NY',
-            'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK',
-            'OREGON': 'OR', 'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC',
-            'SOUTH DAKOTA': 'SD', 'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT',
-            'VERMONT': 'VT', 'VIRGINIA': 'VA', 'WASHINGTON': 'WA', 'WEST VIRGINIA': 'WV',
-            'WISCONSIN': 'WI', 'WYOMING': 'WY'
-        }
-
-        return state_name_map.get(state_upper, state_upper)
-
     def _get_metro_area_locations(self, location: str) -> List[str]:
         """Get all cities/locations in a metro area for expanded search.
 
@@ -1031,7 +1047,7 @@ class TrialSearchService:
         """
         try:
             # Get all locations that have trials for this condition
-            locations_with_trials = db.execute_query("""
+            locations_with_trials = await async_db.execute_query("""
                 SELECT DISTINCT
                     ti.site_location,
                     ti.site_id,
@@ -1047,8 +1063,31 @@ class TrialSearchService:
             if not locations_with_trials:
                 return None
 
-            # Simple distance heuristic: Check nearby cities
-            # For production, you'd use actual geocoding/distance calculation
+            # Rank sites by real distance when both ends resolve to a centroid
+            origin = geo_locator.resolve(requested_location)
+            if origin:
+                best = None
+                for loc in locations_with_trials:
+                    site = geo_locator.resolve(loc['site_location'] or '')
+                    if not site:
+                        continue
+                    distance = haversine_miles(origin.lat, origin.lon, site.lat, site.lon)
+                    if best is None or distance < best[0]:
+                        best = (distance, loc)
+
+                if best is not None:
+                    distance, loc = best
+                    if distance > max_distance_miles:
+                        logger.info(f"Nearest {condition} site to {requested_location} is {distance:.0f} miles away (limit {max_distance_miles})")
+                        return None
+                    return {
+                        'nearest_location': loc['site_location'],
+                        'distance_miles': round(distance),
+                        'trial_count': loc['trial_count'],
+                        'condition': condition
+                    }
+
+            # Locations outside the centroid table: fall back to the nearby-city heuristics
             nearby_cities = self._get_nearby_cities(requested_location)
 
             for nearby in nearby_cities:
@@ -1143,27 +1182,7 @@ class TrialSearchService:
 
     def _extract_state(self, location: str) -> Optional[str]:
         """Extract state abbreviation from location string"""
-        import re
-
-        # Check for state abbreviations
-        state_pattern = r'\b([A-Z]{2})\b'
-        match = re.search(state_pattern, location.upper())
-        if match:
-            return match.group(1)
-
-        # Check for full state names
-        state_names = {
-            'kansas': 'KS', 'missouri': 'MO', 'louisiana': 'LA',
-            'georgia': 'GA', 'texas': 'TX', 'oklahoma': 'OK',
-            'tennessee': 'TN', 'north carolina': 'NC', 'south carolina': 'SC'
-        }
-
-        location_lower = location.lower()
-        for name, abbr in state_names.items():
-            if name in location_lower:
-                return abbr
-
-        return None
+        return location_resolver.resolve(location).state
 
     def search_trials_with_metro_expansion(self, condition: str = None, location: str = None,
                                           session_id: str = None) -> List[Dict[str, Any]]:
@@ -1219,17 +1238,14 @@ class MultiTrialCompletionSelector:
         if len(trials) <= 1:
             raise ValueError("This method should only be called with multiple trials")
 
-        # Get completion rates for these specific trials
+        # Precomputed completion rates for these specific trials (no query per turn)
         trial_ids = [t['id'] for t in trials]
-        completion_data = self._get_completion_rates_for_trials(trial_ids, condition, location)
+        completion_data = completion_stats.completion_rates(trial_ids, condition, location)
 
         # Merge completion data with trial info
         enhanced_trials = []
         for trial in trials:
-            completion_info = next(
-                (cd for cd in completion_data if cd['trial_id'] == trial['id']),
-                None
-            )
+            completion_info = completion_data.get(trial['id'])
 
             enhanced_trial = dict(trial)
             if completion_info:
@@ -1258,45 +1274,6 @@ class MultiTrialCompletionSelector:
             'selection_reasoning': self._generate_selection_reasoning(selected_trial, enhanced_trials)
         }
 
-    def _get_completion_rates_for_trials(self, trial_ids: List[int], condition: str, 
-                                       location: str) -> List[Dict]:
-        """Get completion rates specifically for the provided trial IDs"""
-
-        # Get completion data for these specific trials
-        results = db.execute_query("""
-            WITH trial_completion_stats AS (
-                SELECT 
-                    ps.trial_id,
-                    COUNT(*) as total_sessions,
-                    COUNT(*) FILTER (WHERE ps.status = 'completed') as completed_sessions,
-                    COUNT(*) FILTER (WHERE ps.status = 'abandoned') as abandoned_sessions,
-                    AVG(ps.answered_questions::DECIMAL / NULLIF(ps.total_questions, 0) * 100) as avg_progress_rate,
-                    AVG(EXTRACT(EPOCH FROM (COALESCE(ps.completed_at, ps.created_at) - ps.started_at))/60.0) as avg_session_minutes
-                FROM prescreening_sessions ps
-                WHERE ps.trial_id = ANY(%s)
-                  AND ps.started_at >= NOW() - INTERVAL '45 days'  -- 45 day lookback
-                  AND LOWER(ps.condition) LIKE LOWER(%s)
-                  AND (ps.location IS NULL OR LOWER(ps.location) LIKE LOWER(%s))
-                GROUP BY ps.trial_id
-            )
-            SELECT 
-                trial_id,
-                total_sessions,
-                completed_sessions,
-                abandoned_sessions,
-                ROUND(
-                    CASE WHEN total_sessions > 0 
-                         THEN (completed_sessions::DECIMAL / total_sessions) * 100 
-                         ELSE 0 
-                    END, 1
-                ) as completion_rate,
-                ROUND(avg_progress_rate, 1) as avg_progress_rate,
-                ROUND(avg_session_minutes, 1) as avg_session_minutes
-            FROM trial_completion_stats
-        """, (trial_ids, f"%{condition}%", f"%{location}%"))
-
-        return results
-
     def _select_optimal_trial(self, enhanced_trials: List[Dict]) -> Dict:
         """Select the optimal trial using weighted scoring"""
 
@@ -0,0 +1,138 @@
+"""
+Trial-Site Summary
+
+Search and catalog queries read trial sites from the ``trial_site_summary``
+table (database_migrations/add_trial_site_summary.sql): one row per
+trial_investigators row with the trial's latest protocol summary, site count,
+normalized city/state and embedding. Triggers on clinical_trials,
+trial_investigators and protocol_metadata refresh only the affected trial's
+rows, so the DISTINCT ON / GROUP BY subqueries are no longer recomputed on
+every search.
+
+relation() returns the table when it exists and otherwise an equivalent
+derived query over the base tables, so the queries keep working before the
+migration is applied. Both expose the same columns:
+
+    investigator_id, trial_id, trial_name, conditions, description,
+    investigator_name, site_location, site_id, site_city, site_state,
+    protocol_summary, total_sites, semantic_embedding
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+from core.database import db
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TABLE = "trial_site_summary"
+
+# Same columns computed from the base tables (pre-migration fallback)
+LIVE_RELATION = """(
+    SELECT
+        ti.id AS investigator_id,
+        ct.id AS trial_id,
+        ct.trial_name,
+        ct.conditions,
+        ct.description,
+        ti.investigator_name,
+        ti.site_location,
+        ti.site_id,
+        NULLIF(TRIM(SPLIT_PART(ti.site_location, ',', 1)), '') AS site_city,
+        NULLIF(UPPER(TRIM(SPLIT_PART(ti.site_location, ',', 2))), '') AS site_state,
+        pm.protocol_summary,
+        site_counts.total_sites,
+        ct.semantic_embedding
+    FROM clinical_trials ct
+    JOIN trial_investigators ti ON ct.id = ti.trial_id
+    LEFT JOIN (
+        SELECT DISTINCT ON (trial_id)
+        trial_id, protocol_summary
+        FROM protocol_metadata
+        ORDER BY trial_id, created_at DESC
+    ) pm ON ct.id = pm.trial_id
+    LEFT JOIN (
+        SELECT trial_id, COUNT(*) as total_sites
+        FROM trial_investigators
+        GROUP BY trial_id
+    ) site_counts ON ct.id = site_counts.trial_id
+)"""
+
+
+class TrialSiteSummary:
+    """Chooses between the maintained summary table and the live derived query"""
+
+    def __init__(self, enabled: bool = True, recheck_seconds: int = 300):
+        self.enabled = enabled
+        self.recheck_seconds = recheck_seconds
+        self._available: Optional[bool] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"checks": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def available(self) -> bool:
+        """Whether the summary table exists (checked once, re-checked while missing)"""
+        if not self.enabled:
+            return False
+        if self._available or (
+            self._available is False and time.time() - self._checked_at < self.recheck_seconds
+        ):
+            return self._available
+
+        with self._lock:
+            if self._available:
+                return True
+            try:
+                rows = db.execute_query(
+                    "SELECT to_regclass(%s) IS NOT NULL AS present", (SUMMARY_TABLE,)
+                )
+                self._available = bool(rows and rows[0]['present'])
+            except Exception as e:
+                logger.warning(f"Could not check for {SUMMARY_TABLE}: {e}")
+                self._available = False
+            self._checked_at = time.time()
+            self._stats["checks"] += 1
+            if not self._available:
+                logger.info(f"{SUMMARY_TABLE} not found, trial queries use the live joins")
+            return self._available
+
+    def relation(self) -> str:
+        """FROM-clause relation for trial-site rows (alias it at the call site)"""
+        return SUMMARY_TABLE if self.available() else LIVE_RELATION
+
+    def refresh(self, trial_id: Optional[int] = None) -> bool:
+        """
+        Rebuild summary rows (one trial, or all when trial_id is None).
+
+        The triggers already do this on every change; this is for repairs and
+        bulk loads that bypassed them.
+        """
+        if not self.available():
+            return False
+        try:
+            if trial_id is None:
+                db.execute_query("SELECT refresh_trial_site_summary(id) FROM clinical_trials")
+            else:
+                db.execute_query("SELECT refresh_trial_site_summary(%s)", (trial_id,))
+            self._stats["refreshes"] += 1
+            return True
+        except Exception as e:
+            self._stats["refresh_errors"] += 1
+            logger.error(f"Failed to refresh {SUMMARY_TABLE}: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "available": self._available,
+            **self._stats
+        }
+
+
+# Singleton instance
+trial_site_summary = TrialSiteSummary(
+    enabled=os.getenv("TRIAL_SITE_SUMMARY_ENABLED", "true").lower() == "true"
+)
@@ -140,7 +140,9 @@ Categories: demographics, laboratory, disease_specific, medical_history, medicat
 
 Return ONLY valid JSON, no markdown."""
 
-            response = await gemini_service.generate_text(prompt, max_tokens=3000)
+            response = await gemini_service.generate_text(
+                prompt, max_tokens=3000, cache_namespace="protocol_extraction"
+            )
             
             # Clean and parse response
             response = response.strip()
@@ -0,0 +1,171 @@
+-- Migration: Data version stamps
+-- Purpose: One counter per cached data scope, bumped by statement triggers on the
+-- tables behind it, so every worker notices trial and criteria changes made by
+-- any other worker or instance; see core/services/data_versions.py
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO data_versions (scope, version) VALUES
+    ('trial_catalog', 1),
+    ('prescreening_plans', 1)
+ON CONFLICT (scope) DO NOTHING;
+
+-- ============================================================================
+-- Bump a scope's counter
+-- ============================================================================
+CREATE OR REPLACE FUNCTION bump_data_version(p_scope VARCHAR)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO data_versions (scope, version, updated_at)
+    VALUES (p_scope, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (scope) DO UPDATE
+    SET version = data_versions.version + 1,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- Triggers: bump only for statements that changed rows, and for updates only
+-- when a column the caches read changed (e.g. not semantic_embedding backfills)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION data_versions_on_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed BOOLEAN;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changed := EXISTS (SELECT 1 FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        changed := EXISTS (SELECT 1 FROM old_rows);
+    ELSIF TG_TABLE_NAME = 'clinical_trials' THEN
+        changed := EXISTS (
+            SELECT 1 FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.trial_name, n.conditions, n.description)
+                IS DISTINCT FROM (o.trial_name, o.conditions, o.description)
+        );
+    ELSIF TG_TABLE_NAME = 'trial_investigators' THEN
+        changed := EXISTS (
+            SELECT 1 FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.trial_id, n.investigator_name, n.site_location, n.site_id)
+                IS DISTINCT FROM (o.trial_id, o.investigator_name, o.site_location, o.site_id)
+        );
+    ELSIF TG_TABLE_NAME = 'protocol_metadata' THEN
+        changed := EXISTS (
+            SELECT 1 FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.trial_id, n.protocol_summary, n.created_at)
+                IS DISTINCT FROM (o.trial_id, o.protocol_summary, o.created_at)
+        );
+    ELSE
+        -- trial_criteria: everything PrescreeningPlan compiles from
+        changed := EXISTS (
+            SELECT 1 FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.trial_id, n.criterion_type, n.criterion_text, n.category,
+                   n.parsed_json, n.is_required, n.sort_order)
+                IS DISTINCT FROM (o.trial_id, o.criterion_type, o.criterion_text, o.category,
+                                  o.parsed_json, o.is_required, o.sort_order)
+        );
+    END IF;
+
+    IF NOT changed THEN
+        RETURN NULL;
+    END IF;
+
+    -- trial_catalog: everything read through trial_site_summary
+    IF TG_TABLE_NAME IN ('clinical_trials', 'trial_investigators', 'protocol_metadata') THEN
+        PERFORM bump_data_version('trial_catalog');
+    END IF;
+    -- prescreening_plans: trial info and criteria compiled into plans
+    IF TG_TABLE_NAME IN ('clinical_trials', 'trial_criteria') THEN
+        PERFORM bump_data_version('prescreening_plans');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Unfiltered triggers of earlier versions of this migration
+DROP TRIGGER IF EXISTS trg_data_version_catalog_trials ON clinical_trials;
+DROP TRIGGER IF EXISTS trg_data_version_catalog_investigators ON trial_investigators;
+DROP TRIGGER IF EXISTS trg_data_version_catalog_protocols ON protocol_metadata;
+DROP TRIGGER IF EXISTS trg_data_version_plans_trials ON clinical_trials;
+DROP TRIGGER IF EXISTS trg_data_version_plans_criteria ON trial_criteria;
+DROP FUNCTION IF EXISTS bump_data_version();
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS trg_data_version_trials_insert ON clinical_trials;
+CREATE TRIGGER trg_data_version_trials_insert
+    AFTER INSERT ON clinical_trials
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_trials_update ON clinical_trials;
+CREATE TRIGGER trg_data_version_trials_update
+    AFTER UPDATE ON clinical_trials
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_trials_delete ON clinical_trials;
+CREATE TRIGGER trg_data_version_trials_delete
+    AFTER DELETE ON clinical_trials
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_investigators_insert ON trial_investigators;
+CREATE TRIGGER trg_data_version_investigators_insert
+    AFTER INSERT ON trial_investigators
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_investigators_update ON trial_investigators;
+CREATE TRIGGER trg_data_version_investigators_update
+    AFTER UPDATE ON trial_investigators
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_investigators_delete ON trial_investigators;
+CREATE TRIGGER trg_data_version_investigators_delete
+    AFTER DELETE ON trial_investigators
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_protocols_insert ON protocol_metadata;
+CREATE TRIGGER trg_data_version_protocols_insert
+    AFTER INSERT ON protocol_metadata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_protocols_update ON protocol_metadata;
+CREATE TRIGGER trg_data_version_protocols_update
+    AFTER UPDATE ON protocol_metadata
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_protocols_delete ON protocol_metadata;
+CREATE TRIGGER trg_data_version_protocols_delete
+    AFTER DELETE ON protocol_metadata
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_criteria_insert ON trial_criteria;
+CREATE TRIGGER trg_data_version_criteria_insert
+    AFTER INSERT ON trial_criteria
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_criteria_update ON trial_criteria;
+CREATE TRIGGER trg_data_version_criteria_update
+    AFTER UPDATE ON trial_criteria
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+DROP TRIGGER IF EXISTS trg_data_version_criteria_delete ON trial_criteria;
+CREATE TRIGGER trg_data_version_criteria_delete
+    AFTER DELETE ON trial_criteria
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_on_change();
+
+COMMENT ON TABLE data_versions IS
+'Per-scope change counters maintained by statement triggers; polled by DataVersions to invalidate in-process trial catalog, search and prescreening plan caches across workers.';
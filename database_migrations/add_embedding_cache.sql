@@ -0,0 +1,19 @@
+-- Migration: Persistent embedding cache shared by all workers
+-- Purpose: Avoid re-embedding identical strings (condition names, trial texts, criteria)
+-- Keyed by model + task type + SHA-256 of the normalized text (see core/services/embedding_cache.py)
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model VARCHAR(100) NOT NULL,
+    task_type VARCHAR(50) NOT NULL DEFAULT 'RETRIEVAL_DOCUMENT',
+    text_hash CHAR(64) NOT NULL,
+    embedding vector(768) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (model, task_type, text_hash)
+);
+
+-- Housekeeping: find stale rows when the embedding model changes
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_created_at ON embedding_cache(created_at);
+
+COMMENT ON TABLE embedding_cache IS 'Second-tier embedding cache; first tier is the in-process LRU in EmbeddingCache';
@@ -0,0 +1,18 @@
+-- Migration: Shared LLM response cache
+-- Purpose: Let workers reuse Gemini responses for identical prompts in shared namespaces
+-- (criteria explanations, protocol extraction); see core/services/llm_response_cache.py
+-- Only used when LLM_CACHE_SHARED_TIER=true
+
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    namespace VARCHAR(50) NOT NULL,
+    prompt_hash CHAR(64) NOT NULL,
+    response TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (namespace, prompt_hash)
+);
+
+-- Housekeeping: DELETE FROM llm_response_cache WHERE expires_at < NOW()
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at ON llm_response_cache(expires_at);
+
+COMMENT ON TABLE llm_response_cache IS 'Second-tier LLM response cache; first tier is the in-process LRU in LLMResponseCache';
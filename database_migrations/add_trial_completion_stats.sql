@@ -0,0 +1,107 @@
+-- Migration: Rolling prescreening completion statistics
+-- Purpose: Keep per-trial, per-condition/location daily session counts current as
+-- prescreening sessions start, complete or are abandoned, so multi-trial selection
+-- no longer aggregates prescreening_sessions during a chat turn; see
+-- core/services/completion_stats.py (which reads the last 45 days)
+
+CREATE TABLE IF NOT EXISTS trial_completion_daily (
+    trial_id INTEGER NOT NULL,
+    condition_key TEXT NOT NULL DEFAULT '',   -- LOWER(condition), '' when NULL
+    location_key TEXT NOT NULL DEFAULT '',    -- LOWER(location), '' when NULL
+    day DATE NOT NULL,                        -- started_at date
+    total_sessions INTEGER NOT NULL DEFAULT 0,
+    completed_sessions INTEGER NOT NULL DEFAULT 0,
+    abandoned_sessions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (trial_id, condition_key, location_key, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_trial_completion_daily_day ON trial_completion_daily(day);
+
+-- ============================================================================
+-- Add (delta = 1) or remove (delta = -1) one session from its bucket
+-- ============================================================================
+CREATE OR REPLACE FUNCTION trial_completion_bump(
+    p_trial_id INTEGER,
+    p_condition TEXT,
+    p_location TEXT,
+    p_started_at TIMESTAMP,
+    p_status TEXT,
+    p_delta INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+    IF p_trial_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO trial_completion_daily (
+        trial_id, condition_key, location_key, day,
+        total_sessions, completed_sessions, abandoned_sessions
+    )
+    VALUES (
+        p_trial_id,
+        COALESCE(LOWER(p_condition), ''),
+        COALESCE(LOWER(p_location), ''),
+        COALESCE(p_started_at, CURRENT_TIMESTAMP)::DATE,
+        p_delta,
+        CASE WHEN p_status = 'completed' THEN p_delta ELSE 0 END,
+        CASE WHEN p_status = 'abandoned' THEN p_delta ELSE 0 END
+    )
+    ON CONFLICT (trial_id, condition_key, location_key, day)
+    DO UPDATE SET
+        total_sessions = trial_completion_daily.total_sessions + EXCLUDED.total_sessions,
+        completed_sessions = trial_completion_daily.completed_sessions + EXCLUDED.completed_sessions,
+        abandoned_sessions = trial_completion_daily.abandoned_sessions + EXCLUDED.abandoned_sessions;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trial_completion_on_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+       (OLD.trial_id, OLD.condition, OLD.location, OLD.status, OLD.started_at)
+       IS NOT DISTINCT FROM
+       (NEW.trial_id, NEW.condition, NEW.location, NEW.status, NEW.started_at) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM trial_completion_bump(OLD.trial_id, OLD.condition, OLD.location,
+                                      COALESCE(OLD.started_at, OLD.created_at), OLD.status, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM trial_completion_bump(NEW.trial_id, NEW.condition, NEW.location,
+                                      COALESCE(NEW.started_at, NEW.created_at), NEW.status, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_trial_completion_stats ON prescreening_sessions;
+CREATE TRIGGER trg_trial_completion_stats
+    AFTER INSERT OR UPDATE OR DELETE ON prescreening_sessions
+    FOR EACH ROW EXECUTE FUNCTION trial_completion_on_change();
+
+-- ============================================================================
+-- Backfill
+-- ============================================================================
+TRUNCATE trial_completion_daily;
+INSERT INTO trial_completion_daily (
+    trial_id, condition_key, location_key, day,
+    total_sessions, completed_sessions, abandoned_sessions
+)
+SELECT
+    trial_id,
+    COALESCE(LOWER(condition), ''),
+    COALESCE(LOWER(location), ''),
+    COALESCE(started_at, created_at, CURRENT_TIMESTAMP)::DATE,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE status = 'completed'),
+    COUNT(*) FILTER (WHERE status = 'abandoned')
+FROM prescreening_sessions
+WHERE trial_id IS NOT NULL
+GROUP BY 1, 2, 3, 4;
+
+-- Housekeeping: DELETE FROM trial_completion_daily WHERE day < CURRENT_DATE - 90
+COMMENT ON TABLE trial_completion_daily IS
+'Daily prescreening session counts per trial/condition/location, maintained by a trigger on prescreening_sessions. Rolled up in memory by CompletionStats for MultiTrialCompletionSelector.';
@@ -0,0 +1,204 @@
+-- Migration: Materialized trial-site summary
+-- Purpose: One row per trial site with the latest protocol summary, site count,
+-- normalized city/state and trial embedding, so trial search no longer recomputes
+-- the DISTINCT ON (protocol_metadata) and COUNT(*) GROUP BY (trial_investigators)
+-- subqueries on every request; see core/services/trial_site_summary.py
+-- Kept current incrementally: statement triggers refresh each affected trial once
+
+CREATE TABLE IF NOT EXISTS trial_site_summary (
+    investigator_id INTEGER PRIMARY KEY,
+    trial_id INTEGER NOT NULL,
+    trial_name TEXT,
+    conditions TEXT,
+    description TEXT,
+    investigator_name TEXT,
+    site_location TEXT,
+    site_id VARCHAR(50),
+    site_city TEXT,
+    site_state TEXT,
+    protocol_summary TEXT,
+    total_sites INTEGER NOT NULL DEFAULT 0,
+    semantic_embedding vector(768),
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Free-text locations ("Charlotte, North Carolina") don't fit a short code column
+ALTER TABLE trial_site_summary ALTER COLUMN site_state TYPE TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_trial_site_summary_trial_id ON trial_site_summary(trial_id);
+CREATE INDEX IF NOT EXISTS idx_trial_site_summary_location ON trial_site_summary(LOWER(site_location));
+CREATE INDEX IF NOT EXISTS idx_trial_site_summary_city_state ON trial_site_summary(LOWER(site_city), site_state);
+
+-- ============================================================================
+-- Rebuild the summary rows of one trial
+-- ============================================================================
+CREATE OR REPLACE FUNCTION refresh_trial_site_summary(p_trial_id INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF p_trial_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Serialize concurrent refreshes of the same trial; otherwise two
+    -- transactions both delete, then both insert the same investigator_id
+    PERFORM pg_advisory_xact_lock(p_trial_id);
+
+    DELETE FROM trial_site_summary WHERE trial_id = p_trial_id;
+
+    INSERT INTO trial_site_summary (
+        investigator_id, trial_id, trial_name, conditions, description,
+        investigator_name, site_location, site_id, site_city, site_state,
+        protocol_summary, total_sites, semantic_embedding, refreshed_at
+    )
+    SELECT
+        ti.id,
+        ct.id,
+        ct.trial_name,
+        ct.conditions,
+        ct.description,
+        ti.investigator_name,
+        ti.site_location,
+        ti.site_id,
+        -- site_location is "City, ST"
+        NULLIF(TRIM(SPLIT_PART(ti.site_location, ',', 1)), ''),
+        NULLIF(UPPER(TRIM(SPLIT_PART(ti.site_location, ',', 2))), ''),
+        (
+            SELECT pm.protocol_summary
+            FROM protocol_metadata pm
+            WHERE pm.trial_id = ct.id
+            ORDER BY pm.created_at DESC
+            LIMIT 1
+        ),
+        COUNT(*) OVER (),
+        ct.semantic_embedding,
+        CURRENT_TIMESTAMP
+    FROM clinical_trials ct
+    JOIN trial_investigators ti ON ct.id = ti.trial_id
+    WHERE ct.id = p_trial_id
+    -- A site moved to this trial may still have a row under its old trial
+    -- until that trial is refreshed
+    ON CONFLICT (investigator_id) DO UPDATE SET
+        trial_id = EXCLUDED.trial_id,
+        trial_name = EXCLUDED.trial_name,
+        conditions = EXCLUDED.conditions,
+        description = EXCLUDED.description,
+        investigator_name = EXCLUDED.investigator_name,
+        site_location = EXCLUDED.site_location,
+        site_id = EXCLUDED.site_id,
+        site_city = EXCLUDED.site_city,
+        site_state = EXCLUDED.site_state,
+        protocol_summary = EXCLUDED.protocol_summary,
+        total_sites = EXCLUDED.total_sites,
+        semantic_embedding = EXCLUDED.semantic_embedding,
+        refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- Triggers: refresh each trial touched by a statement once, whatever the
+-- number of rows it changed (transition tables hold the changed rows)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION trial_site_summary_on_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    trial_ids INTEGER[];
+    changed_trial_id INTEGER;
+BEGIN
+    IF TG_TABLE_NAME = 'clinical_trials' THEN
+        IF TG_OP = 'DELETE' THEN
+            SELECT array_agg(id) INTO trial_ids FROM old_rows;
+        ELSE
+            -- Only the columns copied into the summary
+            SELECT array_agg(n.id) INTO trial_ids
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE (n.trial_name, n.conditions, n.description, n.semantic_embedding)
+                IS DISTINCT FROM (o.trial_name, o.conditions, o.description, o.semantic_embedding);
+        END IF;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT trial_id) INTO trial_ids FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT trial_id) INTO trial_ids FROM old_rows;
+    ELSIF TG_TABLE_NAME = 'protocol_metadata' THEN
+        SELECT array_agg(DISTINCT changed.trial_id) INTO trial_ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES (n.trial_id), (o.trial_id)) AS changed(trial_id)
+        WHERE (n.protocol_summary, n.created_at, n.trial_id)
+            IS DISTINCT FROM (o.protocol_summary, o.created_at, o.trial_id);
+    ELSE
+        SELECT array_agg(DISTINCT trial_id) INTO trial_ids
+        FROM (SELECT trial_id FROM new_rows UNION SELECT trial_id FROM old_rows) changed;
+    END IF;
+
+    -- Ascending order so concurrent statements take the advisory locks in the same order
+    FOR changed_trial_id IN
+        SELECT DISTINCT t FROM unnest(trial_ids) AS t WHERE t IS NOT NULL ORDER BY t
+    LOOP
+        PERFORM refresh_trial_site_summary(changed_trial_id);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Row-level triggers of earlier versions of this migration
+DROP TRIGGER IF EXISTS trg_trial_site_summary_investigators ON trial_investigators;
+DROP TRIGGER IF EXISTS trg_trial_site_summary_protocols ON protocol_metadata;
+DROP TRIGGER IF EXISTS trg_trial_site_summary_trials ON clinical_trials;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS trg_trial_site_summary_investigators_insert ON trial_investigators;
+CREATE TRIGGER trg_trial_site_summary_investigators_insert
+    AFTER INSERT ON trial_investigators
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trial_site_summary_on_change();
+
+DROP TRIGGER IF EXISTS trg_trial_site_summary_investigators_update ON trial_investigators;
+CREATE TRIGGER trg_trial_site_summary_investigators_update
+    AFTER UPDATE ON trial_investigators
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trial_site_summary_on_change();
+
+DROP TRIGGER IF EXISTS trg_trial_site_summary_investigators_delete ON trial_investigators;
+CREATE TRIGGER trg_trial_site_summary_investigators_delete
+    AFTER DELETE ON trial_investigators
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trial_site_summary_on_change();
+
+DROP TRIGGER IF EXISTS trg_trial_site_summary_protocols_insert ON protocol_metadata;
+CREATE TRIGGER trg_trial_site_summary_protocols_insert
+    AFTER INSERT ON protocol_metadata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trial_site_summary_on_change();
+
+DROP TRIGGER IF EXISTS trg_trial_site_summary_protocols_update ON protocol_metadata;
+CREATE TRIGGER trg_trial_site_summary_protocols_update
+    AFTER UPDATE ON protocol_metadata
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trial_site_summary_on_change();
+
+DROP TRIGGER IF EXISTS trg_trial_site_summary_protocols_delete ON protocol_metadata;
+CREATE TRIGGER trg_trial_site_summary_protocols_delete
+    AFTER DELETE ON protocol_metadata
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trial_site_summary_on_change();
+
+DROP TRIGGER IF EXISTS trg_trial_site_summary_trials_update ON clinical_trials;
+CREATE TRIGGER trg_trial_site_summary_trials_update
+    AFTER UPDATE ON clinical_trials
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trial_site_summary_on_change();
+
+DROP TRIGGER IF EXISTS trg_trial_site_summary_trials_delete ON clinical_trials;
+CREATE TRIGGER trg_trial_site_summary_trials_delete
+    AFTER DELETE ON clinical_trials
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trial_site_summary_on_change();
+
+-- ============================================================================
+-- Backfill
+-- ============================================================================
+SELECT refresh_trial_site_summary(id) FROM clinical_trials;
+
+COMMENT ON TABLE trial_site_summary IS
+'One row per trial_investigators row with the latest protocol summary and site count; maintained by triggers on clinical_trials, trial_investigators and protocol_metadata. Read by TrialSearchService and TrialCatalog.';
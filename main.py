@@ -53,6 +53,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Lifecycle hooks for long-lived async resources
+@app.on_event("startup")
+async def startup_event():
+    """Open async resources owned by the app"""
+    from core.async_database import async_db
+    from core.services.gemini_service import gemini_service
+    await gemini_service.startup()
+    try:
+        await async_db.open()
+    except Exception as e:
+        # Queries lazily retry opening the pool, so startup must not fail here
+        logging.getLogger(__name__).error(f"Async database pool unavailable at startup: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close async resources owned by the app"""
+    from core.async_database import async_db
+    from core.services.gemini_service import gemini_service
+    from core.conversation.context import session_context_cache
+    from core.services.analytics_writer import analytics_writer
+    # Write out contexts still pending in write-behind mode
+    await async_db.run_sync(session_context_cache.close)
+    # Write out queued analytics rows
+    await async_db.run_sync(analytics_writer.close)
+    await gemini_service.shutdown()
+    await async_db.close()
+
 # Define API routes first
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Re-score historical prescreening sessions of a trial against its current criteria
+(deterministic rules only, no Gemini) and report sessions whose outcome changed
+"""
+
+from core.database import db
+from core.prescreening.criterion_rules import compile_trial_rules
+from core.prescreening.gemini_prescreening_manager import GeminiPrescreeningManager
+
+
+def rescore_trial(trial_id: int, compile_rules: bool = False):
+    """Re-score every prescreening session of a trial"""
+
+    print(f"RE-SCORING PRESCREENING SESSIONS FOR TRIAL {trial_id}")
+    print("=" * 70)
+
+    if compile_rules:
+        updated = compile_trial_rules(trial_id)
+        print(f"Stored compiled rules for {updated} criteria\n")
+
+    manager = GeminiPrescreeningManager()
+    scores = manager.score_historical_answers(trial_id)
+
+    print(f"Sessions scored: {len(scores)}\n")
+
+    status_counts = {}
+    changed = []
+    for session_id, score in scores.items():
+        status_counts[score['overall_status']] = status_counts.get(score['overall_status'], 0) + 1
+        stored = score['stored_eligibility_result']
+        if stored and stored != 'evaluated' and stored != score['overall_status']:
+            changed.append((session_id, stored, score))
+
+    for status, count in sorted(status_counts.items()):
+        print(f"  {status}: {count}")
+
+    print(f"\nSessions whose stored result differs: {len(changed)}")
+    for session_id, stored, score in changed:
+        print(f"  Session {session_id}: {stored} -> {score['overall_status']} "
+              f"(inclusion {score['inclusion_met']}/{score['inclusion_total']}, "
+              f"exclusion {score['exclusion_met']}/{score['exclusion_total']}, "
+              f"needs review {score['needs_review']})")
+
+
+def compile_all_rules():
+    """Store compiled rules for the criteria of every trial"""
+
+    trials = db.execute_query("SELECT DISTINCT trial_id FROM trial_criteria ORDER BY trial_id")
+    total = 0
+    for trial in trials:
+        total += compile_trial_rules(trial['trial_id'])
+    print(f"✅ Stored compiled rules for {total} criteria across {len(trials)} trials")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--compile-all":
+        compile_all_rules()
+    elif len(sys.argv) > 1 and sys.argv[1].isdigit():
+        rescore_trial(int(sys.argv[1]), compile_rules="--compile" in sys.argv)
+    else:
+        print("Usage:")
+        print("  python3 rescore_prescreening_answers.py <trial_id> [--compile]")
+        print("  python3 rescore_prescreening_answers.py --compile-all")
+        print("\nRe-scoring is read-only; --compile / --compile-all store compiled")
+        print("criterion rules in trial_criteria.parsed_json")